@@ -0,0 +1,85 @@
+# api_client/adaptativo.py
+"""
+Calidad adaptativa de inferencia YOLO según la carga.
+
+Hay niveles de calidad (resolución de entrada y, opcionalmente, un modelo más liviano).
+Por cada request se elige el mejor nivel cuya latencia estimada entra en el objetivo p95
+(YOLO_SLO_P95_S), con la carga actual de la compuerta de visión:
+
+    latencia_estimada(nivel) = servicio(nivel) * (1 + trabajos_por_delante / concurrencia)
+
+Sin carga (nadie más en curso ni esperando) siempre se usa la calidad completa.
+La guarda del p95 mira latencias MEDIDAS de punta a punta (espera en la compuerta + inferencia),
+no la estimación de arriba: así se entera de las violaciones reales del objetivo.
+"""
+from __future__ import annotations
+
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, List, Optional
+
+from utils.metricas import percentil
+
+
+@dataclass(frozen=True)
+class Nivel:
+    nombre: str
+    imgsz: int
+    liviano: bool = False   # usa el modelo liviano (YOLO_WEIGHTS_LIVIANO)
+
+
+def niveles_desde_config(tamanos: List[int], hay_liviano: bool) -> List[Nivel]:
+    nombres = ["completa", "media", "baja"]
+    niveles = [Nivel(nombres[i] if i < len(nombres) else f"nivel{i}", t) for i, t in enumerate(tamanos)]
+    if hay_liviano:
+        niveles.append(Nivel("liviano", tamanos[-1], liviano=True))
+    return niveles
+
+
+class ControladorCalidad:
+    def __init__(self, niveles: List[Nivel], slo_p95_s: float, ventana: int = 100):
+        self.niveles = niveles
+        self.slo = slo_p95_s
+        self._lock = threading.Lock()
+        # tiempo de servicio (sin cola) por nivel: EWMA. Arranca proporcional a los píxeles.
+        base = niveles[0].imgsz
+        self._servicio = [0.3 * (n.imgsz / base) ** 2 for n in niveles]
+        self._medido = [False] * len(niveles)
+        # latencias totales medidas (espera + inferencia) de las últimas requests
+        self._recientes: Deque[float] = deque(maxlen=ventana)
+
+    def elegir(self, en_curso: int, en_espera: int, concurrencia: int) -> int:
+        """Índice del nivel a usar. en_curso incluye a la request actual."""
+        otros = max(0, en_curso - 1) + en_espera
+        carga = otros / max(1, concurrencia)
+        with self._lock:
+            if otros == 0:
+                return 0
+            p95 = percentil(self._recientes, 95)
+            # si venimos violando el objetivo, exigimos margen extra
+            objetivo = self.slo * (0.8 if p95 is not None and p95 > self.slo else 1.0)
+            for i, servicio in enumerate(self._servicio):
+                if servicio * (1 + carga) <= objetivo:
+                    return i
+        return len(self.niveles) - 1
+
+    def registrar(self, nivel: int, servicio_s: float, total_s: Optional[float] = None,
+                  estimar: bool = True) -> None:
+        """
+        servicio_s: duración de la inferencia con el nivel elegido.
+        total_s: latencia de la request desde que llegó a la compuerta (None = solo servicio).
+        estimar: False si la pasada no fue la del nivel (ej. por teselas): cuenta para el p95
+        pero no entra en el tiempo de servicio estimado del nivel.
+        """
+        with self._lock:
+            if estimar and self._medido[nivel]:
+                self._servicio[nivel] = 0.8 * self._servicio[nivel] + 0.2 * servicio_s
+            elif estimar:
+                self._servicio[nivel] = servicio_s
+                self._medido[nivel] = True
+            self._recientes.append(servicio_s if total_s is None else max(total_s, servicio_s))
+
+    def p95(self) -> Optional[float]:
+        with self._lock:
+            return percentil(self._recientes, 95)
@@ -0,0 +1,79 @@
+# api_client/clases.py
+"""
+Vocabulario de clases: alias de nombres de YOLO/carpetas a un nombre canónico y whitelist TIC.
+
+No depende de la app (ni de YOLO ni de utils.config), así lo usa también scripts/build_index.py para
+que las claves de index.json coincidan con las clases normalizadas que busca yolo_client.
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Set
+
+_ALIAS: Dict[str, str] = {
+    "notebook": "laptop",
+    "screen": "monitor",
+    "tv": "monitor",
+    "cell phone": "phone",
+    "mobile": "phone",
+    "cellphone": "phone",
+    "smartphone": "phone",
+    "desktop": "pc_tower",
+    "pc": "pc_tower",
+    "computer": "pc_tower",
+    "servers": "server",
+    "monitors": "monitor",
+    "laptops": "laptop",
+    "routers": "router",
+    "switches": "switch",
+    # ruido común que no queremos como modelo TIC:
+    "dining table": "table",
+    "table": "table",
+    "chair": "chair",
+}
+
+# Clases TIC a mostrar en visor
+TIC_WHITELIST = [
+    "laptop", "router", "monitor", "keyboard", "mouse",
+    "switch", "server", "pc_tower", "printer", "phone",
+    # ampliables:
+    "tablet", "projector", "camera", "firewall", "access_point",
+]
+
+TIC_SET: Set[str] = set(TIC_WHITELIST)
+
+@lru_cache(maxsize=2048)
+def normalize_class(name: str) -> str:
+    n = (name or "").strip().lower()
+    return _ALIAS.get(n, n)
+
+def is_tic_class(cls: str) -> bool:
+    return normalize_class(cls) in TIC_SET
+
+def cargar_alias_extra(path: Path) -> None:
+    """
+    Suma alias y clases TIC desde un YAML opcional (ALIAS_PATH, por defecto config/alias.yaml):
+        alias: {"tv monitor": monitor, "ups": ups}
+        tic: [ups, patch_panel]
+    """
+    if not path.exists():
+        return
+    try:
+        import yaml  # type: ignore
+    except Exception:
+        print(f"⚠ PyYAML no disponible: se ignora {path}")
+        return
+    try:
+        data = yaml.safe_load(path.read_text(encoding="utf-8")) or {}
+        for k, v in (data.get("alias") or {}).items():
+            _ALIAS[str(k).strip().lower()] = str(v).strip().lower()
+        for c in data.get("tic") or []:
+            c = str(c).strip().lower()
+            if c not in TIC_WHITELIST:
+                TIC_WHITELIST.append(c)
+                TIC_SET.add(c)
+        normalize_class.cache_clear()
+        print(f"✔ Alias extra cargados desde {path}")
+    except Exception as e:
+        print(f"⚠ No se pudo leer {path}: {e}")
@@ -1,75 +1,165 @@
 # api_client/mistral_client.py
+import hashlib
+import json
+from typing import Iterator, Optional, Tuple
+
 from groq import Groq, BadRequestError
 from utils.config import settings 
+from api_client.sesiones import AlmacenSesiones, estimar_tokens
+from api_client.recuperacion import IndiceCurriculo, formatear_contexto, leer_temario
+from utils.almacen import Cache
+from utils.metricas import metricas
 
 PREFERRED = settings.llm_model
 FALLBACKS = ["llama-3.1-8b-instant", "llama-3.1-70b-versatile"]
 
-client = Groq(api_key=settings.groq_api_key)
+# BASE_URL apunta al endpoint OpenAI-compatible (".../openai/v1"); el SDK de Groq quiere la raíz.
+# Con BASE_URL=http://127.0.0.1:8089/openai/v1 se usa el simulador local (scripts/mock_groq.py).
+client = Groq(api_key=settings.groq_api_key, base_url=settings.base_url.rstrip("/").removesuffix("/openai/v1"))
+
+# Historial por sesión con presupuesto de tokens (ver api_client/sesiones.py)
+sesiones = AlmacenSesiones(
+    ttl_s=settings.sesiones_ttl_s,
+    max_sesiones=settings.sesiones_max,
+    presupuesto_historial=settings.llm_presupuesto_historial,
+    presupuesto_resumen=settings.llm_presupuesto_resumen,
+    db_path=settings.sesiones_db or None,
+    db_retencion_s=settings.sesiones_db_dias * 86400,
+)
+
+# Respuestas cacheadas (compartidas entre nodos si ALMACEN_URL es Redis). Solo se cachean
+# preguntas sin historial: con contexto de conversación la respuesta depende de la sesión.
+cache_llm = Cache("llm", settings.cache_llm_ttl_s)
+
+# Índice BM25 del temario (scripts/build_curriculo_index.py; si falta, se construye en la primera consulta)
+indice_curriculo = IndiceCurriculo(settings.indice_curriculo_dir, settings.curriculo_dir)
+
+def _mensajes_sistema(mensaje: str) -> list:
+    """
+    Con índice: prompt base fijo + fragmentos del temario relevantes para la pregunta.
+    Sin índice, o si falla al leerlo (ej. una construcción a medias): el prompt completo de siempre.
+    """
+    if not settings.rag_habilitado:
+        return [_MSG_SISTEMA]
+    try:
+        if not indice_curriculo.disponible():
+            return [_MSG_SISTEMA]
+        fragmentos = indice_curriculo.buscar(mensaje, k=settings.rag_top_k)
+    except Exception as e:
+        print(f"⚠ Recuperación del temario falló, se usa el prompt completo: {e}")
+        return [_MSG_SISTEMA]
+    msgs = [_MSG_SISTEMA_BASE]
+    if fragmentos:
+        msgs.append({
+            "role": "system",
+            "content": "Material de referencia del temario:\n\n" + formatear_contexto(fragmentos),
+        })
+    return msgs
+
+def _armar_mensajes(mensaje: str, sesion_id: Optional[str]) -> Tuple[list, Optional[str]]:
+    """Devuelve (messages, clave de caché); la clave es None si hay historial."""
+    # El system prompt va siempre primero y sin cambios: es un prefijo estable que el
+    # proveedor puede cachear. Los fragmentos recuperados y el historial acotado van después.
+    sistema = _mensajes_sistema(mensaje)
+    historial = sesiones.mensajes_historial(sesion_id) if sesion_id else []
+    messages = [*sistema, *historial, {"role": "user", "content": mensaje}]
+    # totales acumulados en /api/metricas (promedio = llm.prompt_tokens / llm.prompts)
+    metricas.incrementar("llm.prompts")
+    metricas.incrementar("llm.prompt_tokens", sum(estimar_tokens(m["content"]) for m in messages))
+    if historial or not cache_llm.habilitada:
+        return messages, None
+    clave = hashlib.sha256(
+        json.dumps([PREFERRED, 0.3, messages], ensure_ascii=False, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    return messages, clave
+
+def responder_mensaje_texto(mensaje: str, sesion_id: Optional[str] = None) -> str:
+    messages, clave = _armar_mensajes(mensaje, sesion_id)
+    texto = cache_llm.obtener(clave) if clave else None
+    if texto is not None:
+        if sesion_id:
+            sesiones.registrar_intercambio(sesion_id, mensaje, texto)
+        return texto
 
-def responder_mensaje_texto(mensaje: str) -> str:
     modelos = [PREFERRED] + [m for m in FALLBACKS if m != PREFERRED]
     ultima_exc = None
     for model in modelos:
         try:
             resp = client.chat.completions.create(
                 model=model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role":"user","content":mensaje}
-                ],
+                messages=messages,
+                temperature=0.3,
+            )
+            texto = resp.choices[0].message.content
+            if sesion_id:
+                sesiones.registrar_intercambio(sesion_id, mensaje, texto or "")
+            if clave and texto:
+                cache_llm.guardar(clave, texto)
+            return texto
+        except BadRequestError as e:
+            ultima_exc = e
+            continue
+    raise ultima_exc or RuntimeError("No se pudo completar la respuesta")
+
+def responder_mensaje_stream(mensaje: str, sesion_id: Optional[str] = None) -> Iterator[str]:
+    """
+    Igual que responder_mensaje_texto pero devuelve los fragmentos de texto a medida que llegan
+    (lo usa el canal WebSocket). Solo se prueba el modelo siguiente si falla antes del primer token.
+    El intercambio se guarda en la sesión al terminar el stream.
+    """
+    messages, clave = _armar_mensajes(mensaje, sesion_id)
+    texto = cache_llm.obtener(clave) if clave else None
+    if texto is not None:
+        yield texto
+        if sesion_id:
+            sesiones.registrar_intercambio(sesion_id, mensaje, texto)
+        return
+
+    modelos = [PREFERRED] + [m for m in FALLBACKS if m != PREFERRED]
+    ultima_exc = None
+    for model in modelos:
+        try:
+            stream = client.chat.completions.create(
+                model=model,
+                messages=messages,
                 temperature=0.3,
+                stream=True,
             )
-            return resp.choices[0].message.content
         except BadRequestError as e:
             ultima_exc = e
             continue
+        partes = []
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                partes.append(delta)
+                yield delta
+        texto = "".join(partes)
+        if sesion_id:
+            sesiones.registrar_intercambio(sesion_id, mensaje, texto)
+        if clave and texto:
+            cache_llm.guardar(clave, texto)
+        return
     raise ultima_exc or RuntimeError("No se pudo completar la respuesta")
 
 PREFERRED = settings.llm_model 
 
-system_prompt = """te llamas SINTAXIA, una Inteligencia Artificial diseñada para enseñar a estudiantes de la carrera de Técnico en Informática de las Comunicaciones (TICs). 
+_IDENTIDAD = """te llamas SINTAXIA, una Inteligencia Artificial diseñada para enseñar a estudiantes de la carrera de Técnico en Informática de las Comunicaciones (TICs). 
 Tu rol es ser un profesor paciente, claro, exigente pero motivador, explicando con lenguaje técnico pero accesible, usando ejemplos reales de laboratorio, analogías cotidianas y casos aplicados en empresas. 
 Debes responder siempre en español, en párrafos ordenados y con títulos cuando la explicación lo amerite. pero solo si el usuario lo pide, sino habla como normalmento lo harias.
 
-Enseñás los siguientes espacios curriculares:
-
-1. Administración de Redes:
-   - Explicá conceptos de redes (IP, máscara, puerta de enlace, DNS, DHCP, Active Directory, firewall, VPN, QoS, ancho de banda, latencia, jitter, retardo).
-   - Mostrá cómo se aplican en entornos reales (ej. una empresa que gestiona 200 PCs, configuración de un servidor de dominio, seguridad con políticas de grupo).
-   - Usá analogías prácticas (ej. la red como una autopista, donde los autos son los datos).
-
-2. Laboratorio de Soporte de Sistemas Informáticos:
-   - Explicá diagnóstico y reparación de hardware y software (formateo, instalación de drivers, virtualización con VirtualBox/VMware, backups).
-   - Mostrá ejemplos de fallas comunes (placa madre, fuente, disco rígido, memorias) y cómo se solucionan.
-   - Relacioná con la atención a usuarios en un entorno laboral (help desk).
-
-3. Laboratorio de Desarrollo de Aplicaciones:
-   - Enseñá desarrollo web (HTML, CSS, JavaScript, React), backend (Node, Python, APIs REST), bases de datos (SQL).
-   - Mostrá ejemplos de proyectos integradores (sistema de turnos médicos, página institucional, portfolio personal).
-   - Explicá buenas prácticas: control de versiones (Git/GitHub), estructura de carpetas, testing, documentación.
-
-4. Proyecto Integrador:
-   - Guiá al estudiante a integrar distintas materias en un proyecto real (ej. sistema de gestión escolar, IoT de monitoreo ambiental).
-   - Explicá metodologías ágiles (Scrum, Kanban) y la importancia del trabajo en equipo.
-   - Enfatizá en documentación y presentación profesional del proyecto.
-
-5. Sistemas Integrales de Información:
-   - Explicá ERP, CRM y software de gestión empresarial.
-   - Mostrá casos reales de cómo se usan en empresas para integrar compras, ventas, stock, contabilidad.
-   - Compará soluciones open source vs comerciales (Odoo, SAP).
+"""
 
-6. Tecnología de Control:
-   - Explicá sensores, actuadores, lazos de control, automatización industrial.
-   - Relacioná con Arduino, PLC, Raspberry Pi, domótica e IoT.
-   - Mostrá casos aplicados: semáforo inteligente, control de temperatura, alarma hogareña.
+# El temario sale de assets/curriculo/*.md (los mismos archivos que indexa la recuperación)
+_TEMARIO = leer_temario(settings.curriculo_dir)
+_MATERIAS = [titulo for titulo, _ in _TEMARIO]
 
-7. Dispositivos Programables:
-   - Explicá microcontroladores, FPGA, PLC.
-   - Mostrá cómo se programan (ej. Arduino IDE, ladder en PLC, VHDL en FPGA).
-   - Relacioná con proyectos escolares (robots móviles, estaciones meteorológicas, sistemas de seguridad).
+_CURRICULO = "Enseñás los siguientes espacios curriculares:\n\n" + "".join(
+    f"{i}. {titulo}:\n" + "".join(f"   - {sec}: {texto}\n" if sec else f"   - {texto}\n" for sec, texto in secciones) + "\n"
+    for i, (titulo, secciones) in enumerate(_TEMARIO, 1)
+)
 
-Tu estilo de enseñanza debe ser:
+_ESTILO = """Tu estilo de enseñanza debe ser:
 - Claro y estructurado, con introducción, desarrollo, ejemplos reales, aplicación laboral y conclusión.
 - Siempre mostrar definiciones técnicas correctas.
 - Incluir preguntas de repaso y trucos de memoria cuando sea útil.
@@ -78,3 +168,18 @@ Tu estilo de enseñanza debe ser:
 
 Recordá: sos un profesor especializado en TICs. Explicás como si dieras clase en un aula técnica, pero con la paciencia de un tutor particular.
 """
+
+# Prompt completo (temario incluido): se usa si no hay índice curricular construido
+system_prompt = _IDENTIDAD + _CURRICULO + _ESTILO
+
+# Prompt base para usar con recuperación: el temario llega como fragmentos relevantes
+system_prompt_base = _IDENTIDAD + (
+    "Enseñás los espacios curriculares de la carrera: "
+    + (", ".join(_MATERIAS[:-1]) + " y " + _MATERIAS[-1] if len(_MATERIAS) > 1 else "".join(_MATERIAS)) + ".\n"
+    "Cuando se incluya material de referencia, basate en él para responder.\n\n"
+) + _ESTILO
+
+
+# Mensajes de sistema armados una sola vez (se reutiliza el mismo objeto en cada llamada)
+_MSG_SISTEMA = {"role": "system", "content": system_prompt}
+_MSG_SISTEMA_BASE = {"role": "system", "content": system_prompt_base}
@@ -0,0 +1,309 @@
+# api_client/recuperacion.py
+"""
+Recuperación local (BM25, 100% offline) sobre el material curricular de assets/curriculo.
+
+En vez de mandar todo el temario en cada llamada al LLM, se inyectan solo los
+fragmentos más relevantes para la pregunta.
+
+Formato en disco (data/indice_curriculo/):
+  actual.json      -> {"version": "v..."}: qué subcarpeta es la vigente
+  v.../            -> una carpeta por construcción (nunca se pisa un archivo que otro proceso
+                      tenga abierto con mmap: en Windows eso falla con PermissionError)
+  v.../manifiesto.json
+                   -> por documento: hash + fragmentos ya tokenizados (rebuild incremental)
+  fragmentos.json  -> texto/título/fuente de cada fragmento (orden = id de fragmento)
+  vocab.json       -> término -> columna
+  indptr.npy, indices.npy, pesos.npy
+                   -> postings por término (CSR): para el término t, los fragmentos
+                      indices[indptr[t]:indptr[t+1]] con peso BM25 pesos[...]
+Los .npy se abren con mmap, así el índice no se copia a memoria en cada proceso.
+
+Reconstrucción: python scripts/build_curriculo_index.py. Si falta actual.json, IndiceCurriculo lo construye
+en la primera consulta (es offline e incremental), así un despliegue nuevo no arranca sin índice.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+K1 = 1.5
+B = 0.75
+
+_TOKEN = re.compile(r"[a-z0-9ñ]+")
+_STOPWORDS = set("""
+a al algo como con cual de del desde donde el ella en entre es esta este esto la las lo los
+mas me mi muy no o para pero por que se si sin sobre su sus te tu un una uno y ya son ser
+the and of to in is for
+""".split())
+
+
+# -----------------------------------------------------------
+# Texto
+# -----------------------------------------------------------
+def _sin_acentos(texto: str) -> str:
+    # conserva la ñ, saca tildes
+    texto = texto.lower().replace("ñ", "\0")
+    texto = unicodedata.normalize("NFKD", texto)
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return texto.replace("\0", "ñ")
+
+def tokenizar(texto: str) -> List[str]:
+    return [t for t in _TOKEN.findall(_sin_acentos(texto)) if len(t) > 1 and t not in _STOPWORDS]
+
+def fragmentar(texto: str, fuente: str, max_palabras: int = 120) -> List[Dict[str, Any]]:
+    """
+    Divide un documento markdown por secciones (## ...) y, si una sección es larga,
+    en bloques de hasta max_palabras. Cada fragmento lleva el título de su sección.
+    """
+    titulo_doc = ""
+    secciones: List[Tuple[str, List[str]]] = []
+    for linea in texto.splitlines():
+        if linea.startswith("# "):
+            titulo_doc = linea[2:].strip()
+        elif linea.startswith("## "):
+            secciones.append((linea[3:].strip(), []))
+        elif linea.strip():
+            if not secciones:
+                secciones.append(("", []))
+            secciones[-1][1].append(linea.strip())
+
+    out: List[Dict[str, Any]] = []
+    for titulo, lineas in secciones:
+        palabras = " ".join(lineas).split()
+        for i in range(0, len(palabras), max_palabras):
+            cuerpo = " ".join(palabras[i:i + max_palabras])
+            encabezado = " — ".join(x for x in (titulo_doc, titulo) if x)
+            out.append({
+                "fuente": fuente,
+                "titulo": encabezado,
+                "texto": cuerpo,
+                "tokens": tokenizar(f"{encabezado} {cuerpo}"),
+            })
+    return out
+
+
+def documentos(docs_dir: Path) -> List[Path]:
+    """Archivos del temario (.md/.txt), en orden de nombre."""
+    return [p for p in sorted(docs_dir.rglob("*")) if p.is_file() and p.suffix.lower() in (".md", ".txt")]
+
+def leer_temario(docs_dir: Path) -> List[Tuple[str, List[Tuple[str, str]]]]:
+    """
+    [(materia, [(sección, texto)])] de cada documento: assets/curriculo es la única fuente del
+    temario, tanto para el índice como para el prompt completo sin índice.
+    """
+    temario = []
+    for path in documentos(docs_dir):
+        titulo = path.stem
+        secciones: List[Tuple[str, List[str]]] = []
+        for linea in path.read_text(encoding="utf-8").splitlines():
+            if linea.startswith("# "):
+                titulo = linea[2:].strip()
+            elif linea.startswith("## "):
+                secciones.append((linea[3:].strip(), []))
+            elif linea.strip():
+                if not secciones:
+                    secciones.append(("", []))
+                secciones[-1][1].append(linea.strip())
+        temario.append((titulo, [(sec, " ".join(lineas)) for sec, lineas in secciones]))
+    return temario
+
+
+# -----------------------------------------------------------
+# Construcción (incremental)
+# -----------------------------------------------------------
+def _sha(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+def _escribir_atomico(path: Path, escribir) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        escribir(f)
+    os.replace(tmp, path)
+
+def version_actual(indice_dir: Path) -> Optional[Path]:
+    """Carpeta de la construcción vigente (o None si todavía no hay índice)."""
+    try:
+        version = json.loads((indice_dir / "actual.json").read_text(encoding="utf-8"))["version"]
+    except (OSError, ValueError, KeyError, TypeError):
+        # índice del formato anterior (archivos sueltos en la raíz) hasta que se reconstruya
+        return indice_dir if (indice_dir / "manifiesto.json").exists() else None
+    return indice_dir / version
+
+def _podar_versiones(indice_dir: Path, conservar: List[str]) -> None:
+    # la anterior se conserva: un proceso puede seguir leyéndola hasta notar el cambio.
+    # Si otra más vieja sigue abierta (Windows), se reintenta en la próxima construcción.
+    for carpeta in indice_dir.glob("v*"):
+        if carpeta.is_dir() and carpeta.name not in conservar:
+            shutil.rmtree(carpeta, ignore_errors=True)
+
+def construir_indice(docs_dir: Path, indice_dir: Path, forzar: bool = False) -> Dict[str, int]:
+    """
+    (Re)construye el índice en una carpeta nueva y recién al final cambia actual.json.
+    Solo se vuelven a fragmentar/tokenizar los documentos cuyo hash cambió; el resto se
+    reutiliza desde el manifiesto de la versión vigente.
+    Devuelve estadísticas {documentos, reprocesados, fragmentos, terminos}.
+    """
+    indice_dir.mkdir(parents=True, exist_ok=True)
+    anterior = version_actual(indice_dir)
+    previo: Dict[str, Any] = {}
+    if anterior is not None and not forzar:
+        try:
+            previo = json.loads((anterior / "manifiesto.json").read_text(encoding="utf-8"))
+        except Exception:
+            previo = {}
+
+    manifiesto: Dict[str, Any] = {}
+    reprocesados = 0
+    for path in documentos(docs_dir):
+        fuente = path.relative_to(docs_dir).as_posix()
+        sha = _sha(path)
+        if fuente in previo and previo[fuente].get("sha") == sha:
+            manifiesto[fuente] = previo[fuente]
+            continue
+        manifiesto[fuente] = {"sha": sha, "fragmentos": fragmentar(path.read_text(encoding="utf-8"), fuente)}
+        reprocesados += 1
+
+    fragmentos = [f for doc in manifiesto.values() for f in doc["fragmentos"]]
+
+    # vocabulario y frecuencias
+    vocab: Dict[str, int] = {}
+    tf_por_frag: List[Dict[int, int]] = []
+    for f in fragmentos:
+        tf: Dict[int, int] = {}
+        for tok in f["tokens"]:
+            col = vocab.setdefault(tok, len(vocab))
+            tf[col] = tf.get(col, 0) + 1
+        tf_por_frag.append(tf)
+
+    n = len(fragmentos)
+    largos = np.array([len(f["tokens"]) for f in fragmentos], dtype=np.float32)
+    promedio = float(largos.mean()) if n else 1.0
+
+    # postings por término
+    postings: List[List[Tuple[int, float]]] = [[] for _ in range(len(vocab))]
+    for i, tf in enumerate(tf_por_frag):
+        norm = K1 * (1 - B + B * largos[i] / promedio)
+        for col, c in tf.items():
+            postings[col].append((i, c * (K1 + 1) / (c + norm)))
+
+    indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+    indices: List[int] = []
+    pesos: List[float] = []
+    for col, lst in enumerate(postings):
+        df = len(lst)
+        idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+        for i, w in lst:
+            indices.append(i)
+            pesos.append(idf * w)
+        indptr[col + 1] = len(indices)
+
+    version = f"v{time.time_ns():x}-{os.getpid():x}"
+    destino = indice_dir / version
+    destino.mkdir()
+    np.save(destino / "indptr.npy", indptr)
+    np.save(destino / "indices.npy", np.array(indices, dtype=np.int32))
+    np.save(destino / "pesos.npy", np.array(pesos, dtype=np.float32))
+    (destino / "vocab.json").write_text(json.dumps(vocab, ensure_ascii=False), encoding="utf-8")
+    meta = [{k: f[k] for k in ("fuente", "titulo", "texto")} for f in fragmentos]
+    (destino / "fragmentos.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+    (destino / "manifiesto.json").write_text(json.dumps(manifiesto, ensure_ascii=False), encoding="utf-8")
+
+    # el puntero va último: los procesos vivos pasan a la versión nueva en la próxima consulta
+    _escribir_atomico(indice_dir / "actual.json", lambda f: f.write(json.dumps({"version": version}).encode("utf-8")))
+    _podar_versiones(indice_dir, [version] + ([anterior.name] if anterior is not None else []))
+
+    return {"documentos": len(manifiesto), "reprocesados": reprocesados, "fragmentos": n, "terminos": len(vocab)}
+
+
+# -----------------------------------------------------------
+# Consulta
+# -----------------------------------------------------------
+class IndiceCurriculo:
+    def __init__(self, indice_dir: Path, docs_dir: Optional[Path] = None):
+        self.dir = Path(indice_dir)
+        self.docs_dir = Path(docs_dir) if docs_dir is not None else None   # para construirlo si falta
+        self._intento_construir = False
+        self._version: Optional[str] = None
+        self._fallida: Optional[str] = None
+        self._lock = threading.Lock()
+        self._vocab: Dict[str, int] = {}
+        self._fragmentos: List[Dict[str, str]] = []
+        self._indptr = self._indices = self._pesos = None
+
+    def _construir_si_falta(self) -> Optional[Path]:
+        # una sola vez por proceso; si falla se sigue sin índice (prompt completo)
+        with self._lock:
+            carpeta = version_actual(self.dir)
+            if carpeta is None and not self._intento_construir:
+                self._intento_construir = True
+                try:
+                    stats = construir_indice(self.docs_dir, self.dir)
+                    print(f"✔ Índice curricular construido en {self.dir} ({stats['fragmentos']} fragmentos)")
+                except Exception as e:
+                    print(f"⚠ No se pudo construir el índice curricular: {e}")
+                carpeta = version_actual(self.dir)
+        return carpeta
+
+    def _cargar_si_cambio(self) -> bool:
+        carpeta = version_actual(self.dir)
+        if carpeta is None and self.docs_dir is not None and not self._intento_construir:
+            carpeta = self._construir_si_falta()
+        if carpeta is None:
+            return self._version is not None
+        version = carpeta.name
+        if version in (self._version, self._fallida):
+            return self._version is not None
+        with self._lock:
+            if version not in (self._version, self._fallida):
+                try:
+                    vocab = json.loads((carpeta / "vocab.json").read_text(encoding="utf-8"))
+                    fragmentos = json.loads((carpeta / "fragmentos.json").read_text(encoding="utf-8"))
+                    indptr = np.load(carpeta / "indptr.npy", mmap_mode="r")
+                    indices = np.load(carpeta / "indices.npy", mmap_mode="r")
+                    pesos = np.load(carpeta / "pesos.npy", mmap_mode="r")
+                except Exception as e:
+                    # se sigue con la versión anterior (si había) y no se reintenta esta
+                    print(f"⚠ Índice curricular inválido en {carpeta}: {e}")
+                    self._fallida = version
+                    return self._version is not None
+                self._vocab, self._fragmentos = vocab, fragmentos
+                self._indptr, self._indices, self._pesos = indptr, indices, pesos
+                self._version = version
+                print(f"✔ Índice curricular cargado ({len(self._fragmentos)} fragmentos, {version})")
+        return True
+
+    def disponible(self) -> bool:
+        return self._cargar_si_cambio() and bool(self._fragmentos)
+
+    def buscar(self, consulta: str, k: int = 3) -> List[Dict[str, Any]]:
+        """Top-k fragmentos por BM25. Lista vacía si no hay índice o nada coincide."""
+        if not self.disponible():
+            return []
+        cols = {self._vocab[t] for t in tokenizar(consulta) if t in self._vocab}
+        if not cols:
+            return []
+        scores = np.zeros(len(self._fragmentos), dtype=np.float32)
+        for col in cols:
+            s, e = int(self._indptr[col]), int(self._indptr[col + 1])
+            # dentro de un término cada fragmento aparece una sola vez
+            scores[self._indices[s:e]] += self._pesos[s:e]
+        k = min(k, int((scores > 0).sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [dict(self._fragmentos[i], score=float(scores[i])) for i in top]
+
+
+def formatear_contexto(fragmentos: List[Dict[str, Any]]) -> str:
+    return "\n\n".join(f"[{f['titulo']}]\n{f['texto']}" for f in fragmentos)
@@ -0,0 +1,182 @@
+# api_client/sesiones.py
+"""
+Sesiones de conversación para el tutor (multi-turno con costo acotado).
+
+- Estado en memoria (OrderedDict con TTL y tope de sesiones), opcionalmente persistido en SQLite.
+- Cada sesión guarda una ventana de turnos recientes que entra en un presupuesto de tokens;
+  los turnos que salen de la ventana se comprimen UNA vez en un resumen corto.
+  Así el prompt de cada turno tiene tamaño acotado aunque la charla sea larga.
+"""
+from __future__ import annotations
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+_ID_VALIDO = re.compile(r"^[A-Za-z0-9_\-]{1,64}$")
+_FIN_ORACION = re.compile(r"(?<=[.!?])\s")
+
+
+def estimar_tokens(texto: str) -> int:
+    """Estimación barata (~4 caracteres por token); alcanza para presupuestar."""
+    return max(1, len(texto or "") // 4)
+
+def id_valido(sesion_id: Optional[str]) -> bool:
+    return bool(sesion_id) and bool(_ID_VALIDO.match(sesion_id))
+
+
+@dataclass
+class Turno:
+    rol: str          # "user" | "assistant"
+    texto: str
+    tokens: int = 0
+
+    def __post_init__(self):
+        if not self.tokens:
+            self.tokens = estimar_tokens(self.texto)
+
+
+@dataclass
+class Sesion:
+    id: str
+    turnos: List[Turno] = field(default_factory=list)
+    resumen: List[str] = field(default_factory=list)
+    ultimo_uso: float = field(default_factory=time.time)
+
+    @property
+    def tokens_turnos(self) -> int:
+        return sum(t.tokens for t in self.turnos)
+
+
+def _resumir_turno(t: Turno, max_chars: int = 160) -> str:
+    """Resumen extractivo: primera oración, recortada. No llama al LLM (latencia plana)."""
+    texto = " ".join((t.texto or "").split())
+    primera = _FIN_ORACION.split(texto, 1)[0]
+    if len(primera) > max_chars:
+        primera = primera[: max_chars - 1].rstrip() + "…"
+    quien = "Alumno" if t.rol == "user" else "SINTAXIA"
+    return f"{quien}: {primera}"
+
+
+# -----------------------------------------------------------
+# Almacén
+# -----------------------------------------------------------
+class AlmacenSesiones:
+    def __init__(
+        self,
+        ttl_s: float,
+        max_sesiones: int,
+        presupuesto_historial: int,
+        presupuesto_resumen: int,
+        db_path: Optional[Path] = None,
+        db_retencion_s: float = 7 * 86400,
+    ):
+        self.ttl_s = ttl_s
+        self.max_sesiones = max_sesiones
+        self.presupuesto_historial = presupuesto_historial
+        self.presupuesto_resumen = presupuesto_resumen
+        self._sesiones: "OrderedDict[str, Sesion]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_path = Path(db_path) if db_path else None
+        self._local = threading.local()
+        if self._db_path:
+            self._db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._db().execute(
+                "CREATE TABLE IF NOT EXISTS sesiones ("
+                " id TEXT PRIMARY KEY, estado TEXT NOT NULL, actualizado REAL NOT NULL)"
+            )
+            self._db().execute("DELETE FROM sesiones WHERE actualizado<?", (time.time() - db_retencion_s,))
+
+    # ---------- persistencia opcional ----------
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self._db_path), timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _cargar(self, sesion_id: str) -> Optional[Sesion]:
+        if not self._db_path:
+            return None
+        row = self._db().execute("SELECT estado FROM sesiones WHERE id=?", (sesion_id,)).fetchone()
+        if not row:
+            return None
+        d = json.loads(row[0])
+        return Sesion(
+            id=sesion_id,
+            turnos=[Turno(**t) for t in d.get("turnos", [])],
+            resumen=d.get("resumen", []),
+        )
+
+    def _guardar(self, s: Sesion) -> None:
+        if not self._db_path:
+            return
+        estado = json.dumps(
+            {"turnos": [t.__dict__ for t in s.turnos], "resumen": s.resumen}, ensure_ascii=False
+        )
+        self._db().execute(
+            "INSERT INTO sesiones (id, estado, actualizado) VALUES (?,?,?) "
+            "ON CONFLICT(id) DO UPDATE SET estado=excluded.estado, actualizado=excluded.actualizado",
+            (s.id, estado, s.ultimo_uso),
+        )
+
+    # ---------- memoria ----------
+    def _evictar(self, ahora: float) -> None:
+        # el OrderedDict está ordenado por último uso: alcanza con mirar el principio
+        while self._sesiones:
+            sid, s = next(iter(self._sesiones.items()))
+            if ahora - s.ultimo_uso > self.ttl_s or len(self._sesiones) > self.max_sesiones:
+                self._sesiones.popitem(last=False)
+            else:
+                break
+
+    def obtener(self, sesion_id: str) -> Sesion:
+        ahora = time.time()
+        with self._lock:
+            s = self._sesiones.get(sesion_id)
+            if s is not None:
+                self._sesiones.move_to_end(sesion_id)
+            else:
+                s = self._cargar(sesion_id) or Sesion(id=sesion_id)
+                self._sesiones[sesion_id] = s
+            s.ultimo_uso = ahora
+            self._evictar(ahora)
+            return s
+
+    def registrar_intercambio(self, sesion_id: str, pregunta: str, respuesta: str) -> None:
+        s = self.obtener(sesion_id)
+        with self._lock:
+            s.turnos.append(Turno("user", pregunta))
+            s.turnos.append(Turno("assistant", respuesta))
+            self._compactar(s)
+        try:
+            self._guardar(s)
+        except sqlite3.Error as e:
+            print(f"⚠ No se pudo persistir la sesión {sesion_id}: {e}")
+
+    def _compactar(self, s: Sesion) -> None:
+        # los turnos que no entran en la ventana pasan al resumen (una sola vez cada uno)
+        while len(s.turnos) > 2 and s.tokens_turnos > self.presupuesto_historial:
+            s.resumen.append(_resumir_turno(s.turnos.pop(0)))
+        while s.resumen and estimar_tokens("\n".join(s.resumen)) > self.presupuesto_resumen:
+            s.resumen.pop(0)
+
+    def mensajes_historial(self, sesion_id: str) -> List[Dict[str, str]]:
+        """Mensajes (formato chat) a insertar entre el system prompt y la pregunta actual."""
+        s = self.obtener(sesion_id)
+        with self._lock:
+            msgs: List[Dict[str, str]] = []
+            if s.resumen:
+                msgs.append({
+                    "role": "system",
+                    "content": "Resumen de la conversación previa con este alumno:\n" + "\n".join(s.resumen),
+                })
+            msgs.extend({"role": t.rol, "content": t.texto} for t in s.turnos)
+            return msgs
@@ -0,0 +1,119 @@
+# api_client/teselado.py
+"""
+Inferencia por teselas (sliced inference) para fotos grandes: racks, pizarrones, mesas de laboratorio.
+
+La imagen se corta en teselas solapadas que se infieren en UN batch junto con la imagen
+completa (para no perder los objetos grandes). Las cajas vuelven a coordenadas globales y
+se fusionan con NMS por clase. El batch está acotado (max_teselas): en una foto muy grande la
+grilla se hace más gruesa (teselas más grandes, que YOLO reduce a imgsz) en vez de crecer sin
+límite. Como una caja cortada por el borde de una tesela tiene poco
+IoU con la caja completa del mismo objeto, la supresión usa IoS (intersección sobre la
+caja más chica).
+
+No depende de la app (solo de numpy y de un modelo Ultralytics), así lo usa también
+scripts/bench_teselas.py.
+"""
+from __future__ import annotations
+
+from typing import Any, List, Tuple
+
+import numpy as np
+
+# columnas de una detección: x1, y1, x2, y2, confianza, clase
+Detecciones = np.ndarray
+
+
+def detecciones_de_resultado(r: Any) -> Detecciones:
+    """Convierte un resultado de Ultralytics a un array Nx6."""
+    boxes = getattr(r, "boxes", None)
+    if boxes is None or len(boxes) == 0:
+        return np.zeros((0, 6), dtype=np.float32)
+
+    def _np(t):
+        return t.cpu().numpy() if hasattr(t, "cpu") else np.asarray(t)
+
+    xyxy = _np(boxes.xyxy).reshape(-1, 4)
+    conf = _np(boxes.conf).reshape(-1, 1)
+    cls = _np(boxes.cls).reshape(-1, 1)
+    return np.hstack([xyxy, conf, cls]).astype(np.float32)
+
+
+def calcular_teselas(alto: int, ancho: int, tam: int, solape: float) -> List[Tuple[int, int, int, int]]:
+    """Ventanas (x0, y0, x1, y1) de tam x tam con solape fraccional; la última se pega al borde."""
+    paso = max(1, int(tam * (1 - solape)))
+
+    def _inicios(total: int) -> List[int]:
+        if total <= tam:
+            return [0]
+        xs = list(range(0, total - tam, paso))
+        xs.append(total - tam)
+        return xs
+
+    return [(x, y, min(x + tam, ancho), min(y + tam, alto)) for y in _inicios(alto) for x in _inicios(ancho)]
+
+
+def teselas_acotadas(alto: int, ancho: int, tam: int, solape: float,
+                     max_teselas: int) -> List[Tuple[int, int, int, int]]:
+    """Como calcular_teselas, pero agranda las teselas hasta que sean a lo sumo max_teselas."""
+    ventanas = calcular_teselas(alto, ancho, tam, solape)
+    while max_teselas > 0 and len(ventanas) > max_teselas and tam < max(alto, ancho):
+        tam = int(tam * 1.25) + 1
+        ventanas = calcular_teselas(alto, ancho, tam, solape)
+    return ventanas
+
+
+def nms_por_clase(dets: Detecciones, umbral: float) -> Detecciones:
+    """NMS clase por clase usando IoS (intersección / área de la caja más chica)."""
+    if len(dets) == 0:
+        return dets
+    conservar: List[int] = []
+    for c in np.unique(dets[:, 5]):
+        idx = np.where(dets[:, 5] == c)[0]
+        idx = idx[np.argsort(-dets[idx, 4])]
+        areas = (dets[idx, 2] - dets[idx, 0]) * (dets[idx, 3] - dets[idx, 1])
+        vivos = np.ones(len(idx), dtype=bool)
+        for i in range(len(idx)):
+            if not vivos[i]:
+                continue
+            conservar.append(idx[i])
+            resto = np.where(vivos[i + 1:])[0] + i + 1
+            if len(resto) == 0:
+                break
+            a, b = dets[idx[i]], dets[idx[resto]]
+            iw = np.clip(np.minimum(a[2], b[:, 2]) - np.maximum(a[0], b[:, 0]), 0, None)
+            ih = np.clip(np.minimum(a[3], b[:, 3]) - np.maximum(a[1], b[:, 1]), 0, None)
+            inter = iw * ih
+            ios = inter / np.maximum(np.minimum(areas[i], areas[resto]), 1e-6)
+            vivos[resto[ios > umbral]] = False
+    return dets[sorted(conservar)]
+
+
+def predecir_simple(model: Any, img: np.ndarray, **kwargs) -> Detecciones:
+    results = model.predict(img, verbose=False, **kwargs)
+    return detecciones_de_resultado(results[0]) if results else np.zeros((0, 6), dtype=np.float32)
+
+
+def predecir_por_teselas(model: Any, img: np.ndarray, tam: int, solape: float, umbral_nms: float,
+                         max_teselas: int = 0, **kwargs) -> Detecciones:
+    """
+    Teselas + imagen completa en un solo batch, cajas a coordenadas globales y NMS por clase.
+    Si la imagen entra en una sola tesela, es una pasada simple. max_teselas > 0 acota el batch.
+    """
+    alto, ancho = img.shape[:2]
+    ventanas = teselas_acotadas(alto, ancho, tam, solape, max_teselas)
+    if len(ventanas) <= 1:
+        return predecir_simple(model, img, **kwargs)
+
+    recortes = [img[y0:y1, x0:x1] for (x0, y0, x1, y1) in ventanas]
+    results = model.predict(recortes + [img], verbose=False, **kwargs)
+
+    partes: List[Detecciones] = []
+    for (x0, y0, _x1, _y1), r in zip(ventanas + [(0, 0, ancho, alto)], results):
+        d = detecciones_de_resultado(r)
+        if len(d):
+            d[:, [0, 2]] += x0
+            d[:, [1, 3]] += y0
+            partes.append(d)
+    if not partes:
+        return np.zeros((0, 6), dtype=np.float32)
+    return nms_por_clase(np.vstack(partes), umbral_nms)
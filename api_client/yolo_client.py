@@ -3,17 +3,29 @@ from __future__ import annotations
 
 import json
 import os
-import random
 import re
 import shutil
+import threading
+import time
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, Any, List, Optional, Set
+from typing import Dict, Any, List, Optional, Set, Tuple
 
 import cv2
+import numpy as np
 from ultralytics import YOLO
 
 from utils.config import settings
-from modelado_3d.generar_modelo import generar_modelo_3d_desde_imagen
+from utils.admision import compuertas
+from utils.metricas import metricas
+from api_client.teselado import predecir_por_teselas, predecir_simple
+from api_client.adaptativo import ControladorCalidad, niveles_desde_config
+from utils.limpieza import nueva_carpeta, registrar_referencia, url_modelo
+from utils.almacen import Cache, hash_archivo
+from utils.obj import OBJ_MTL_LIB, dec, escanear_cabecera_obj
+from api_client.clases import TIC_SET, cargar_alias_extra, normalize_class
+from modelado_3d.cola import LISTO, encolar_modelo, obtener_cola, resumen_trabajo
+from modelado_3d.generar_modelo import resolver_placeholder
 
 
 # -----------------------------------------------------------
@@ -42,46 +54,39 @@ except Exception as e:
     _modelo_error = e
     print(f"❌ Error cargando modelo YOLO: {e}")
 
+# Modelo liviano opcional para el nivel más bajo de calidad adaptativa
+model_liviano = None
+if settings.yolo_weights_liviano and model is not None:
+    try:
+        model_liviano = YOLO(str(settings.yolo_weights_liviano))
+        print(f"✔ Modelo YOLO liviano cargado desde: {settings.yolo_weights_liviano}")
+    except Exception as e:
+        print(f"⚠ No se pudo cargar el modelo liviano ({e}); se usa solo el principal")
 
-# -----------------------------------------------------------
-# Normalización y whitelist TIC
-# -----------------------------------------------------------
-_ALIAS: Dict[str, str] = {
-    "notebook": "laptop",
-    "screen": "monitor",
-    "tv": "monitor",
-    "cell phone": "phone",
-    "mobile": "phone",
-    "cellphone": "phone",
-    "smartphone": "phone",
-    "desktop": "pc_tower",
-    "pc": "pc_tower",
-    "computer": "pc_tower",
-    "servers": "server",
-    "monitors": "monitor",
-    "laptops": "laptop",
-    "routers": "router",
-    "switches": "switch",
-    # ruido común que no queremos como modelo TIC:
-    "dining table": "table",
-    "table": "table",
-    "chair": "chair",
-}
+# Calidad adaptativa (resolución / modelo) según carga y objetivo de latencia
+controlador_calidad = ControladorCalidad(
+    niveles_desde_config(settings.yolo_niveles, model_liviano is not None),
+    settings.yolo_slo_p95_s,
+)
+
+# Detecciones cacheadas por contenido de la imagen (la misma foto subida otra vez, o a otro nodo)
+cache_det = Cache("det", settings.cache_det_ttl_s)
 
-# Clases TIC a mostrar en visor
-TIC_WHITELIST = [
-    "laptop", "router", "monitor", "keyboard", "mouse",
-    "switch", "server", "pc_tower", "printer", "phone",
-    # ampliables:
-    "tablet", "projector", "camera", "firewall", "access_point",
-]
+def calentar_modelo() -> None:
+    """Una inferencia en vacío por modelo y resolución: la primera request real no paga la inicialización."""
+    for nivel in controlador_calidad.niveles:
+        m = model_liviano if nivel.liviano else model
+        if m is None:
+            continue
+        t0 = time.perf_counter()
+        predecir_simple(m, np.zeros((nivel.imgsz, nivel.imgsz, 3), dtype=np.uint8), imgsz=nivel.imgsz)
+        print(f"🔥 YOLO {nivel.nombre} ({nivel.imgsz}px) listo en {(time.perf_counter() - t0) * 1000:.0f} ms")
 
-def normalize_class(name: str) -> str:
-    n = (name or "").strip().lower()
-    return _ALIAS.get(n, n)
 
-def is_tic_class(cls: str) -> bool:
-    return normalize_class(cls) in TIC_WHITELIST
+# -----------------------------------------------------------
+# Normalización y whitelist TIC (vocabulario en api_client/clases.py)
+# -----------------------------------------------------------
+cargar_alias_extra(settings.alias_path)
 
 
 # -----------------------------------------------------------
@@ -97,106 +102,108 @@ _MTL_MAP_PAT = re.compile(
     r'^\s*(map_Kd|map_Ka|map_d|map_bump|bump|disp|decal)\s+(.+?)\s*$',
     re.IGNORECASE | re.MULTILINE
 )
-# patrón de mtllib en obj
-_OBJ_MTL_LIB = re.compile(r'^\s*mtllib\s+(.+?)\s*$', re.IGNORECASE | re.MULTILINE)
-
 def sanitize_filename(name: str) -> str:
     # Reemplaza espacios por _ y elimina caracteres raros
     s = name.replace(" ", "_")
     s = _SANITIZER.sub("", s)
     return s
 
-def _unique_dest_name(dest_dir: Path, filename: str) -> Path:
-    base = Path(filename).stem
-    ext = Path(filename).suffix
-    candidate = dest_dir / f"{base}{ext}"
-    if not candidate.exists():
-        return candidate
-    for _ in range(10000):
-        rnd = random.randint(1000, 9999)
-        candidate = dest_dir / f"{base}_{rnd}{ext}"
-        if not candidate.exists():
-            return candidate
-    return dest_dir / f"{base}_{random.randint(10000,99999)}{ext}"
-
 def _resolve_rel(base_dir: Path, rel_path: str) -> Path:
     # Quita comillas y normaliza separadores
     rel = rel_path.strip().strip('"').strip("'")
     return (base_dir / rel).resolve()
 
-def _parse_obj_for_mtl(src_obj: Path) -> Optional[str]:
-    try:
-        txt = src_obj.read_text(encoding="utf-8", errors="ignore")
-        m = _OBJ_MTL_LIB.search(txt)
-        return m.group(1).strip() if m else None
-    except Exception:
-        return None
+def _enc(texto: str) -> bytes:
+    return texto.encode("utf-8", errors="surrogateescape")
 
-def _parse_mtl_for_textures(src_mtl: Path) -> Set[str]:
-    out: Set[str] = set()
-    try:
-        txt = src_mtl.read_text(encoding="utf-8", errors="ignore")
-        for mm in _MTL_MAP_PAT.finditer(txt):
-            tex = mm.group(2).strip()
-            # líneas con opciones: map_Kd -o 1 1 1 textures/xxx.jpg
-            # nos quedamos con el último “token” que tenga extensión
-            tokens = [t for t in tex.split() if Path(t).suffix]
-            if tokens:
-                out.add(tokens[-1])
-    except Exception:
-        pass
-    return out
+def _eol(linea: bytes) -> bytes:
+    return b"\r\n" if linea.endswith(b"\r\n") else b"\n"
 
-def _rewrite_obj_mtllib_to_basename(dest_obj: Path, dest_mtl_name: str) -> None:
+def _enlazar_o_copiar(src: Path, dest: Path) -> None:
+    """
+    Materializa src en dest sin duplicar bytes si se puede:
+    hardlink -> reflink (FICLONE, btrfs/xfs) -> copia normal.
+    Solo para archivos que NO se reescriben después (comparten inodo con el original).
+    """
     try:
-        txt = dest_obj.read_text(encoding="utf-8", errors="ignore")
-        if _OBJ_MTL_LIB.search(txt):
-            txt2 = _OBJ_MTL_LIB.sub(f"mtllib {dest_mtl_name}", txt)
-            dest_obj.write_text(txt2, encoding="utf-8")
-            print(f"  • Reescribí mtllib -> {dest_mtl_name}")
-    except Exception as e:
-        print(f"⚠ No pude reescribir mtllib en {dest_obj}: {e}")
-
-def _rewrite_mtl_maps_to_basenames(dest_mtl: Path) -> None:
+        os.link(src, dest)
+        return
+    except OSError:
+        pass
     try:
-        txt = dest_mtl.read_text(encoding="utf-8", errors="ignore")
-        def _subber(m: re.Match) -> str:
-            key, val = m.group(1), m.group(2)
-            tokens = val.split()
-            # reemplazo último token por su basename si es ruta
-            if tokens and Path(tokens[-1]).suffix:
-                tokens[-1] = Path(tokens[-1]).name
-            return f"{key} {' '.join(tokens)}"
-        txt2 = _MTL_MAP_PAT.sub(_subber, txt)
-        dest_mtl.write_text(txt2, encoding="utf-8")
-        print(f"  • Reescribí rutas de texturas en {dest_mtl.name}")
-    except Exception as e:
-        print(f"⚠ No pude reescribir texturas en {dest_mtl}: {e}")
+        import fcntl
+        with open(src, "rb") as fsrc, open(dest, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), 0x40049409, fsrc.fileno())  # FICLONE
+        return
+    except Exception:
+        pass
+    shutil.copy2(src, dest)
 
-def _copy_obj_with_assets(src_obj: Path, dest_dir: Path) -> Path:
+def _copiar_obj(src_obj: Path, dest_obj: Path, cabecera: List[bytes], offset: int,
+                mtllib_rel: Optional[str], dest_mtl_name: Optional[str]) -> None:
     """
-    Copia OBJ + su MTL (si existe) + texturas referenciadas a dest_dir.
+    Copia el OBJ en una sola pasada: cabecera con mtllib parcheado + resto del archivo
+    en bloques. Si no hay nada que parchear, hardlink/reflink.
+    """
+    if not mtllib_rel or not dest_mtl_name or mtllib_rel == dest_mtl_name:
+        _enlazar_o_copiar(src_obj, dest_obj)
+        return
+    with open(src_obj, "rb") as fsrc, open(dest_obj, "wb") as fdst:
+        for linea in cabecera:
+            if OBJ_MTL_LIB.match(dec(linea)):
+                linea = _enc(f"mtllib {dest_mtl_name}") + _eol(linea)
+            fdst.write(linea)
+        fsrc.seek(offset)
+        shutil.copyfileobj(fsrc, fdst, 1 << 20)
+    print(f"  • Reescribí mtllib -> {dest_mtl_name}")
+
+def _copiar_mtl(src_mtl: Path, dest_mtl: Path) -> Set[str]:
+    """
+    Copia el MTL en una sola pasada reescribiendo map_* a basenames.
+    Devuelve las rutas de texturas tal como estaban declaradas.
+    """
+    texturas: Set[str] = set()
+    with open(src_mtl, "rb") as fsrc, open(dest_mtl, "wb") as fdst:
+        for linea in fsrc:
+            m = _MTL_MAP_PAT.match(dec(linea))
+            if m:
+                key, val = m.group(1), m.group(2)
+                # líneas con opciones: map_Kd -o 1 1 1 textures/xxx.jpg
+                # nos quedamos con el último “token” que tenga extensión
+                tokens = val.split()
+                if tokens and Path(tokens[-1]).suffix:
+                    texturas.add(tokens[-1])
+                    tokens[-1] = Path(tokens[-1]).name
+                linea = _enc(f"{key} {' '.join(tokens)}") + _eol(linea)
+            fdst.write(linea)
+    return texturas
+
+def _copy_obj_with_assets(src_obj: Path, dest_root: Path) -> Path:
+    """
+    Copia OBJ + su MTL (si existe) + texturas referenciadas a una carpeta nueva dentro de dest_root.
     Reescribe referencias para que el OBJ apunte a <mtl_basename> y el MTL a basenames de texturas.
+    La carpeta tiene id único (utils.limpieza.nueva_carpeta): no hay colisiones ni sondeo de nombres.
+    Cada archivo se lee una sola vez; lo que no cambia se enlaza en vez de copiarse.
     """
     src_obj = src_obj.resolve()
-    dest_dir.mkdir(parents=True, exist_ok=True)
+    dest_dir = nueva_carpeta(dest_root)
+    src_dir = src_obj.parent
 
-    # Copia del OBJ con nombre saneado (para evitar espacios raros)
-    clean_name = sanitize_filename(src_obj.name)
-    dest_obj = _unique_dest_name(dest_dir, clean_name)
-    shutil.copy2(src_obj, dest_obj)
+    # OBJ con nombre saneado (para evitar espacios raros)
+    dest_obj = dest_dir / sanitize_filename(src_obj.name)
 
-    src_dir = src_obj.parent
-    # 1) localizar MTL desde el OBJ
-    mtllib_rel = _parse_obj_for_mtl(src_obj)
+    # 1) localizar MTL desde la cabecera del OBJ (no se lee la geometría)
+    mtllib_rel, cabecera, offset = escanear_cabecera_obj(src_obj)
+    src_mtl: Optional[Path] = None
     dest_mtl_path: Optional[Path] = None
+    texture_rels: Set[str] = set()
 
     if mtllib_rel:
         src_mtl = _resolve_rel(src_dir, mtllib_rel)
         if src_mtl.exists():
             dest_mtl_path = dest_dir / src_mtl.name
             try:
-                shutil.copy2(src_mtl, dest_mtl_path)
+                texture_rels = _copiar_mtl(src_mtl, dest_mtl_path)
                 print(f"  • Copiado MTL: {src_mtl.name}")
             except Exception as e:
                 print(f"⚠ No pude copiar MTL {src_mtl}: {e}")
@@ -204,25 +211,21 @@ def _copy_obj_with_assets(src_obj: Path, dest_dir: Path) -> Path:
         else:
             print(f"⚠ mtllib declarado pero no encontrado: {src_mtl}")
 
-    # 2) si hay MTL, parsear y copiar texturas declaradas
+    _copiar_obj(src_obj, dest_obj, cabecera, offset, mtllib_rel,
+                dest_mtl_path.name if dest_mtl_path else None)
+
+    # 2) si hay MTL, enlazar las texturas declaradas
     if dest_mtl_path:
-        # lee el mtl original para saber texturas (no el copiado; vale cualquiera)
-        src_mtl = _resolve_rel(src_dir, mtllib_rel)
-        texture_rels = _parse_mtl_for_textures(src_mtl)
         for rel_tex in texture_rels:
             src_tex = _resolve_rel(src_dir, rel_tex)
             if src_tex.exists() and src_tex.suffix.lower() in _IMG_EXTS:
                 dest_tex = dest_dir / src_tex.name
                 if not dest_tex.exists():
                     try:
-                        shutil.copy2(src_tex, dest_tex)
-                        print(f"  • Copiada textura: {src_tex.name}")
+                        _enlazar_o_copiar(src_tex, dest_tex)
+                        print(f"  • Enlazada textura: {src_tex.name}")
                     except Exception as e:
                         print(f"⚠ No pude copiar textura {src_tex}: {e}")
-
-        # reescrituras para que todo mire a archivos en el mismo folder
-        _rewrite_mtl_maps_to_basenames(dest_mtl_path)
-        _rewrite_obj_mtllib_to_basename(dest_obj, dest_mtl_path.name)
     else:
         # fallback: copiar MTL/IMGs adyacentes (mismo directorio) por si el OBJ no declara mtllib,
         # o el mtl está en blanco. Esto no rompe nada y a veces salva casos simples.
@@ -233,7 +236,7 @@ def _copy_obj_with_assets(src_obj: Path, dest_dir: Path) -> Path:
                 dest_aux = dest_dir / entry.name
                 if not dest_aux.exists():
                     try:
-                        shutil.copy2(entry, dest_aux)
+                        _enlazar_o_copiar(entry, dest_aux)
                         print(f"  • Copiado asset adyacente: {entry.name}")
                     except Exception as e:
                         print(f"⚠ No pude copiar asset {entry}: {e}")
@@ -243,31 +246,55 @@ def _copy_obj_with_assets(src_obj: Path, dest_dir: Path) -> Path:
 
 # -----------------------------------------------------------
 # Biblioteca curada (index.json)
+# Se lee una vez; se relee solo si cambia su mtime (revisado a lo sumo cada _REVISAR_INDICE_S).
 # -----------------------------------------------------------
-def _library_pick_obj(clase: str) -> Optional[str]:
+_REVISAR_INDICE_S = 2.0
+_indice_lock = threading.Lock()
+_indice_version: Optional[int] = None
+_indice_proxima = 0.0
+
+def _leer_biblioteca() -> Dict[str, Tuple[Path, Dict[str, Any]]]:
+    """clase normalizada -> (ruta del OBJ, entrada de index.json) del asset elegido."""
     try:
-        if not INDEX_PATH.exists():
-            return None
         data = json.loads(INDEX_PATH.read_text(encoding="utf-8"))
-        key = normalize_class(clase)
-        items = data.get(key, [])
-        if not items:
-            return None
-
-        # Elegimos el primero; si querés aleatorio: random.choice(items)
-        rel = items[0].get("file")
-        if not rel:
-            return None
-        src = (ASSETS_MODELS_DIR / rel).resolve()
-        if not src.exists():
-            print(f"⚠ Asset listado no existe: {src}")
-            return None
-
-        copied_obj = _copy_obj_with_assets(src, MODELOS3D_DIR)
-        return f"/modelos/{copied_obj.name}"
+    except FileNotFoundError:
+        return {}
     except Exception as e:
         print("⚠ index.json no disponible o inválido:", e)
-        return None
+        return {}
+    elegidos: Dict[str, Tuple[Path, Dict[str, Any]]] = {}
+    for clase, items in data.items():
+        key = normalize_class(clase)
+        if key in elegidos or not items:
+            continue
+        # El primero que build_index no marcó como pesado; si todos lo son, el primero igual
+        for item in sorted(items, key=lambda it: bool(it.get("grande"))):
+            rel = item.get("file")
+            src = (ASSETS_MODELS_DIR / rel).resolve() if rel else None
+            if src is not None and src.exists():
+                elegidos[key] = (src, item)
+                break
+            print(f"⚠ Asset listado no existe: {src}")
+    return elegidos
+
+def _vigilar_indice() -> None:
+    """Si index.json cambió, se reemplazan las tablas de clases (se rearman en el próximo uso)."""
+    global _estado, _indice_version, _indice_proxima
+    ahora = time.monotonic()
+    if ahora < _indice_proxima:
+        return
+    _indice_proxima = ahora + _REVISAR_INDICE_S
+    try:
+        version = INDEX_PATH.stat().st_mtime_ns
+    except OSError:
+        version = None
+    if version != _indice_version:
+        with _indice_lock:
+            if version != _indice_version:
+                # se arma aparte y se publica con una sola asignación: un lector que todavía tiene
+                # el estado anterior termina con él y lo que cachee ahí se descarta
+                _estado = _EstadoClases(_leer_biblioteca())
+                _indice_version = version
 
 
 # -----------------------------------------------------------
@@ -286,15 +313,95 @@ _FALLBACK_MAP = {
     "phone": "phone_basic.obj",
 }
 
-def _fallback_generic_obj(clase: str) -> Optional[str]:
-    nombre = _FALLBACK_MAP.get(normalize_class(clase))
-    if not nombre:
+
+# -----------------------------------------------------------
+# Tabla compilada: clase YOLO -> nombre normalizado, es_tic y de dónde sale su modelo 3D
+# (biblioteca con su transform, placeholder para el procedural, genérico). Se arma una vez por
+# modelo/clase y por versión de index.json; en cada request es solo un dict lookup.
+# -----------------------------------------------------------
+@dataclass(frozen=True)
+class ClaseResuelta:
+    nombre: str
+    es_tic: bool
+    placeholder: Optional[Path] = None             # OBJ base del modelado procedural
+    biblioteca: Optional[Path] = None              # asset curado elegido en index.json
+    transform: Optional[Dict[str, Any]] = None     # normalización precalculada por build_index.py
+    generico: Optional[Path] = None                # fallback en assets/models
+
+@dataclass(frozen=True)
+class _EstadoClases:
+    """Todo lo derivado de una versión de index.json; nunca se vacía, se reemplaza entero."""
+    biblioteca: Dict[str, Tuple[Path, Dict[str, Any]]]
+    por_nombre: Dict[str, ClaseResuelta] = field(default_factory=dict)
+    tablas: Dict[int, Dict[int, ClaseResuelta]] = field(default_factory=dict)
+
+_estado = _EstadoClases({})
+
+def _resolver(original: str, biblioteca: Dict[str, Tuple[Path, Dict[str, Any]]]) -> ClaseResuelta:
+    nombre = normalize_class(original)
+    if nombre not in TIC_SET:
+        return ClaseResuelta(nombre, False)
+    src, item = biblioteca.get(nombre, (None, {}))
+    try:
+        placeholder: Optional[Path] = resolver_placeholder(nombre)
+    except FileNotFoundError as e:
+        print("⚠", e)
+        placeholder = None
+    generico = ASSETS_MODELS_DIR / _FALLBACK_MAP[nombre] if nombre in _FALLBACK_MAP else None
+    return ClaseResuelta(
+        nombre, True,
+        placeholder=placeholder,
+        biblioteca=src,
+        transform=item.get("transform"),
+        generico=generico if generico is not None and generico.exists() else None,
+    )
+
+def clase_resuelta(clase: str) -> ClaseResuelta:
+    """Resolución de una clase por nombre (original o ya normalizado, ej. de detecciones cacheadas)."""
+    _vigilar_indice()
+    return _resolver_en(_estado, clase)
+
+def _resolver_en(estado: _EstadoClases, clase: str) -> ClaseResuelta:
+    r = estado.por_nombre.get(clase)
+    if r is None:
+        r = estado.por_nombre[clase] = _resolver(clase, estado.biblioteca)
+    return r
+
+def construir_tabla_clases(names: Dict[int, str], estado: Optional[_EstadoClases] = None) -> Dict[int, ClaseResuelta]:
+    estado = estado or _estado
+    return {int(idx): _resolver_en(estado, original) for idx, original in names.items()}
+
+def tabla_clases(modelo: Any) -> Dict[int, ClaseResuelta]:
+    _vigilar_indice()
+    estado = _estado
+    tabla = estado.tablas.get(id(modelo))
+    if tabla is None:
+        tabla = estado.tablas[id(modelo)] = construir_tabla_clases(getattr(modelo, "names", {}) or {}, estado)
+    return tabla
+
+for _m in (model, model_liviano):
+    if _m is not None:
+        tabla_clases(_m)
+
+
+def _library_pick_obj(clase: str) -> Optional[Tuple[str, Optional[Dict[str, Any]]]]:
+    """(modelo_url, transform precalculado por build_index.py o None)."""
+    r = clase_resuelta(clase)
+    if r.biblioteca is None:
         return None
-    src = ASSETS_MODELS_DIR / nombre
-    if not src.exists():
+    try:
+        copied_obj = _copy_obj_with_assets(r.biblioteca, MODELOS3D_DIR)
+        return url_modelo(copied_obj), r.transform
+    except Exception as e:
+        print(f"⚠ No pude copiar asset {r.biblioteca}: {e}")
+        return None
+
+def _fallback_generic_obj(clase: str) -> Optional[str]:
+    src = clase_resuelta(clase).generico
+    if src is None:
         return None
     copied_obj = _copy_obj_with_assets(src, MODELOS3D_DIR)
-    return f"/modelos/{copied_obj.name}"
+    return url_modelo(copied_obj)
 
 
 # -----------------------------------------------------------
@@ -314,14 +421,15 @@ def _select_target_class(dets: List[Dict[str, Any]]) -> Optional[str]:
     ordered = sorted(dets, key=lambda x: x.get("confianza", 0.0), reverse=True)
 
     # 1) solo TIC
-    tic_only = [d for d in ordered if is_tic_class(d["clase"])]
+    tic_only = [d for d in ordered if clase_resuelta(d["clase"]).es_tic]
 
     if not tic_only:
         return None
 
     # 2) Si alguna de las TIC tiene asset en index.json, elegimos esa primero
+    #    (solo se consulta el índice; la copia la hace quien llama)
     for d in tic_only:
-        if _library_pick_obj(d["clase"]):
+        if clase_resuelta(d["clase"]).biblioteca is not None:
             return d["clase"]
 
     # 3) Sino, devolvemos la TIC de mayor confianza
@@ -331,7 +439,15 @@ def _select_target_class(dets: List[Dict[str, Any]]) -> Optional[str]:
 # -----------------------------------------------------------
 # Principal
 # -----------------------------------------------------------
-def analizar_imagen_yolo(path_imagen: str) -> Dict[str, Any]:
+def detectar_objetos(path_imagen: str, teselas: Optional[bool] = None,
+                     llegada: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Paso 1, el único que ocupa la compuerta de visión: inferencia (o caché) y resumen de lo
+    detectado, con la clase TIC elegida en "clase_objetivo". El modelo 3D lo busca resolver_modelo.
+    teselas: fuerza (True/False) la inferencia por teselas; None usa YOLO_TESELAS.
+    llegada: time.perf_counter() de cuando la request pidió turno en la compuerta de visión
+             (la calidad adaptativa registra la latencia medida, con la espera incluida).
+    """
     try:
         img_path = Path(path_imagen).resolve()
         if not img_path.exists():
@@ -340,25 +456,56 @@ def analizar_imagen_yolo(path_imagen: str) -> Dict[str, Any]:
         if model is None:
             return {"descripcion": "No se detectaron objetos.", "respuesta": f"Error cargando modelo YOLO: {_modelo_error}", "objetos": [], "modelo_url": None}
 
-        img = cv2.imread(str(img_path))
-        if img is None:
-            return {"descripcion": "No se detectaron objetos.", "respuesta": "La imagen no pudo ser decodificada.", "objetos": [], "modelo_url": None}
-
-        results = model.predict(img, verbose=False)
-        if not results:
-            return {"descripcion": "No se detectaron objetos.", "respuesta": "El modelo no devolvió resultados.", "objetos": [], "modelo_url": None}
-
-        r = results[0]
-        objetos_detectados: List[Dict[str, Any]] = []
-        names = getattr(r, "names", getattr(model, "names", {}))
-
-        if getattr(r, "boxes", None) is not None and len(r.boxes) > 0:
-            for box in r.boxes:
-                cls_idx = int(box.cls[0].item()) if hasattr(box.cls[0], "item") else int(box.cls[0])
-                conf = float(box.conf[0].item()) if hasattr(box.conf[0], "item") else float(box.conf[0])
-                clase_orig = names.get(cls_idx, str(cls_idx))
-                clase = normalize_class(clase_orig)
-                objetos_detectados.append({"clase": clase, "confianza": round(conf * 100, 2)})
+        # Nivel de calidad: con YOLO_ADAPTATIVO se baja resolución/modelo si hay cola
+        idx_nivel = 0
+        if settings.yolo_adaptativo:
+            vision = compuertas["vision"]
+            idx_nivel = controlador_calidad.elegir(vision.en_curso, vision.en_espera, vision.max_concurrentes)
+        nivel = controlador_calidad.niveles[idx_nivel]
+        modelo_nivel = model_liviano if nivel.liviano else model
+
+        # Inferencia: pasada simple o por teselas (fotos grandes con objetos chicos).
+        # Las teselas solo en calidad completa: bajo carga no hay margen para N pasadas.
+        usar_teselas = (settings.yolo_teselas if teselas is None else teselas) and idx_nivel == 0
+
+        clave_det = f"{hash_archivo(img_path)}:{YOLO_WEIGHTS.name}:{'teselas' if usar_teselas else nivel.nombre}"
+        objetos_detectados: Optional[List[Dict[str, Any]]] = cache_det.obtener(clave_det)
+        if objetos_detectados is None:
+            img = cv2.imread(str(img_path))
+            if img is None:
+                return {"descripcion": "No se detectaron objetos.", "respuesta": "La imagen no pudo ser decodificada.", "objetos": [], "modelo_url": None}
+
+            t0 = time.perf_counter()
+            if usar_teselas:
+                dets = predecir_por_teselas(
+                    model, img, settings.yolo_tesela_tam, settings.yolo_tesela_solape, settings.yolo_nms_umbral,
+                    max_teselas=settings.yolo_max_teselas,
+                )
+            else:
+                dets = predecir_simple(modelo_nivel, img, imgsz=nivel.imgsz)
+            fin = time.perf_counter()
+            duracion = fin - t0
+            # el batch de teselas (N teselas + imagen completa) no es una pasada del nivel 0:
+            # no entra en su tiempo de servicio estimado y se mide aparte
+            controlador_calidad.registrar(idx_nivel, duracion, fin - llegada if llegada is not None else None,
+                                          estimar=not usar_teselas)
+            metricas.observar("vision.inferencia.teselas" if usar_teselas else f"vision.inferencia.{nivel.nombre}",
+                              duracion)
+            metricas.incrementar(f"vision.nivel.{nivel.nombre}")
+
+            objetos_detectados = []
+            tabla = tabla_clases(model if usar_teselas else modelo_nivel)
+
+            for x1, y1, x2, y2, conf, cls in dets.tolist():
+                cls_idx = int(cls)
+                info = tabla.get(cls_idx)
+                clase = info.nombre if info else str(cls_idx)
+                objetos_detectados.append({
+                    "clase": clase,
+                    "confianza": round(conf * 100, 2),
+                    "caja": [round(x1), round(y1), round(x2), round(y2)],
+                })
+            cache_det.guardar(clave_det, objetos_detectados)
 
         if not objetos_detectados:
             return {"descripcion": "No se detectaron objetos.", "respuesta": "No se encontró ningún objeto relevante.", "objetos": [], "modelo_url": None}
@@ -370,32 +517,7 @@ def analizar_imagen_yolo(path_imagen: str) -> Dict[str, Any]:
 
         # === Seleccionamos la clase objetivo TIC ===
         target_cls = _select_target_class(objetos_detectados)
-
-        modelo_url: Optional[str] = None
-
-        if target_cls:
-            # 1) Biblioteca (preferida)
-            modelo_url = _library_pick_obj(target_cls)
-            if modelo_url:
-                respuesta += f" (Modelo TIC: {target_cls})"
-            else:
-                # 2) Procedural (si lo tenés)
-                try:
-                    nombre_archivo = f"{sanitize_filename(target_cls)}_{random.randint(1000,9999)}.obj"
-                    ruta_modelo = MODELOS3D_DIR / nombre_archivo
-                    generar_modelo_3d_desde_imagen(str(img_path), salida_obj=str(ruta_modelo))
-                    if ruta_modelo.exists():
-                        modelo_url = f"/modelos/{ruta_modelo.name}"
-                        respuesta += " (Modelo procedural)"
-                except Exception as gen_err:
-                    print(f"⚠ Error en generación 3D procedural: {gen_err}")
-
-            # 3) Fallback genérico
-            if not modelo_url:
-                modelo_url = _fallback_generic_obj(target_cls)
-                if modelo_url:
-                    respuesta += " (Modelo genérico)"
-        else:
+        if not target_cls:
             # No hay clase TIC clara → no forzamos cubo
             respuesta += " (No se identificó un dispositivo TIC para el visor)"
 
@@ -403,9 +525,72 @@ def analizar_imagen_yolo(path_imagen: str) -> Dict[str, Any]:
             "descripcion": descripcion,
             "respuesta": respuesta,
             "objetos": objetos_detectados,
-            "modelo_url": modelo_url
+            "modelo_url": None,
+            "clase_objetivo": target_cls,
+            "imagen": str(img_path),
+            "modo": "teselas" if usar_teselas else "simple",
+            "calidad": {"nivel": nivel.nombre, "imgsz": nivel.imgsz, "liviano": nivel.liviano},
         }
 
     except Exception as e:
         print(f"❌ Error inesperado en YOLO: {e}")
         return {"descripcion": "No se detectaron objetos.", "respuesta": f"Error interno en YOLO: {e}", "objetos": [], "modelo_url": None}
+
+def resolver_modelo(resultado: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Paso 2, fuera de la compuerta de visión: modelo 3D para la clase objetivo de detectar_objetos
+    (biblioteca, cola de modelado con espera corta, genérico). Completa `resultado` y lo devuelve.
+    """
+    target_cls = resultado.pop("clase_objetivo", None)
+    img_path = resultado.pop("imagen", None)
+    if not target_cls:
+        return resultado
+
+    modelo_url: Optional[str] = None
+    modelo_transform: Optional[Dict[str, Any]] = None
+    modelo_job: Optional[Dict[str, Any]] = None
+    respuesta = resultado["respuesta"]
+
+    # 1) Biblioteca (preferida); trae la normalización precalculada del índice
+    elegido = _library_pick_obj(target_cls)
+    if elegido:
+        modelo_url, modelo_transform = elegido
+        respuesta += f" (Modelo TIC: {target_cls})"
+    else:
+        # 2) Procedural: va a la cola; si termina enseguida lo devolvemos,
+        #    si no, el cliente recibe un handle para consultar /api/modelado/<id>
+        try:
+            cola = obtener_cola()
+            job_id, _ = encolar_modelo(img_path, sanitize_filename(target_cls),
+                                       placeholder=clase_resuelta(target_cls).placeholder)
+            job = cola.esperar(job_id, settings.modelado_espera_s)
+            if job and job["estado"] == LISTO:
+                modelo_url = (job["resultado"] or {}).get("modelo_url")
+                registrar_referencia(modelo_url)
+                respuesta += " (Modelo procedural)"
+            elif job:
+                modelo_job = resumen_trabajo(job)
+        except Exception as gen_err:
+            print(f"⚠ Error en generación 3D procedural: {gen_err}")
+
+    # 3) Fallback genérico (provisorio si el procedural sigue en la cola)
+    if not modelo_url:
+        try:
+            modelo_url = _fallback_generic_obj(target_cls)
+        except Exception as e:
+            print(f"⚠ No pude copiar el modelo genérico: {e}")
+        if modelo_url:
+            respuesta += " (Modelo genérico)"
+
+    resultado.update({
+        "respuesta": respuesta,
+        "modelo_url": modelo_url,
+        "modelo_transform": modelo_transform,   # {"centro": [x,y,z], "escala": s} o None
+        "modelo_job": modelo_job,
+    })
+    return resultado
+
+def analizar_imagen_yolo(path_imagen: str, teselas: Optional[bool] = None,
+                         llegada: Optional[float] = None) -> Dict[str, Any]:
+    """Detección + modelo 3D en una sola llamada (sin compuerta de visión: scripts y pruebas)."""
+    return resolver_modelo(detectar_objetos(path_imagen, teselas=teselas, llegada=llegada))
@@ -1,13 +1,27 @@
 # app.py
-from flask import Flask, request, jsonify, render_template, send_from_directory, abort
+from flask import Flask, Response, request, jsonify, render_template, send_from_directory, abort, redirect, g
 from voice_module.text_to_speech import hablar
-from api_client.mistral_client import responder_mensaje_texto
-from api_client.yolo_client import analizar_imagen_yolo
+from api_client.mistral_client import cache_llm, responder_mensaje_stream, responder_mensaje_texto
+from api_client.sesiones import id_valido
+from api_client.yolo_client import cache_det, calentar_modelo, detectar_objetos, resolver_modelo
+from utils.config import settings
+from utils.metricas import metricas
+from utils.historial import obtener_historial
+from utils.admision import COSTOS, PRIORIDAD_IMAGEN, PRIORIDAD_TEXTO, Sobrecarga, compuertas, limitador
+from utils.limpieza import iniciar_conserje, nuevo_id, registrar_referencia
+from utils.canal import Canal, EmisorTokens, info_modelo, leer_trama, vigia_modelos
+from utils.almacen import carpetas_recientes, materializar_carpeta, obtener_almacen
+from utils.perfilado import capturas, perfilador
+from modelado_3d.cola import ERROR, LISTO, iniciar_workers, obtener_cola, resumen_trabajo
 
 import os
 import json
 import datetime
+import hmac
+import threading
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
 
 app = Flask(__name__)
@@ -23,8 +37,32 @@ os.makedirs(UPLOADS_DIR, exist_ok=True)
 os.makedirs(MODELOS_DIR, exist_ok=True)
 os.makedirs(PEDIDOS_DIR, exist_ok=True)
 
+# --- conserje: borra modelos/uploads viejos respetando cuotas de tamaño y edad ---
+iniciar_conserje()
+
+# --- workers de la cola de modelado (MODELADO_WORKERS=0 si corren como procesos aparte) ---
+iniciar_workers(settings.modelado_workers)
+
+
+# --- calentamiento del nodo: modelo YOLO, cachés y modelos 3D recientes del almacén compartido ---
+def calentar_nodo():
+    t0 = time.perf_counter()
+    try:
+        calentar_modelo()
+    except Exception as e:
+        print(f"⚠ No se pudo calentar YOLO: {e}")
+    n_llm = cache_llm.calentar(settings.calentar_n)
+    n_det = cache_det.calentar(settings.calentar_n)
+    n_mod = sum(1 for c in carpetas_recientes(settings.calentar_n) if materializar_carpeta(c))
+    print(f"🔥 Nodo caliente en {time.perf_counter() - t0:.1f}s: {n_llm} respuestas, "
+          f"{n_det} detecciones y {n_mod} modelos 3D precargados")
+
+if settings.calentar_n > 0:
+    threading.Thread(target=calentar_nodo, name="calentar", daemon=True).start()
+
 
 # --- util: guardar pedido de modelado si el bot lo sugiere ---
+# Un archivo por pedido (antes se pisaba un único entrada.json entre requests concurrentes).
 def guardar_instruccion_modelado(descripcion, instruccion):
     try:
         datos = {
@@ -33,15 +71,116 @@ def guardar_instruccion_modelado(descripcion, instruccion):
             "instrucciones_modelado": instruccion,
             "modelo_sugerido": (descripcion or "modelo").replace(" ", "_")[:25],
         }
-        path_json = os.path.join(PEDIDOS_DIR, "entrada.json")
-        with open(path_json, "w", encoding="utf-8") as f:
+        pedido_id = nuevo_id()
+        path_json = os.path.join(PEDIDOS_DIR, f"pedido_{pedido_id}.json")
+        tmp = path_json + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
             json.dump(datos, f, indent=4, ensure_ascii=False)
+        os.replace(tmp, path_json)
         print(f"📝 Pedido guardado en: {path_json}")
+        # con varios nodos, los pedidos quedan también en el almacén compartido
+        alm = obtener_almacen()
+        if alm.compartido:
+            alm.guardar(f"pedido:{pedido_id}", json.dumps(datos, ensure_ascii=False).encode("utf-8"))
+            alm.anotar("pedidos", pedido_id)
     except Exception:
         print("⚠ No se pudo guardar el pedido de modelado:")
         traceback.print_exc()
 
 
+# --- util: id de sesión de conversación (body, form o header X-Sesion) ---
+def obtener_sesion_id(data=None):
+    sid = (data or {}).get("sesion") or request.form.get("sesion") or request.headers.get("X-Sesion")
+    return sid if id_valido(sid) else nuevo_id()
+
+
+# -------------------------- ADMISIÓN --------------------------
+
+def _cliente():
+    if settings.confiar_proxy and request.headers.get("X-Forwarded-For"):
+        return request.headers["X-Forwarded-For"].split(",")[0].strip()
+    return request.remote_addr or "?"
+
+
+@app.before_request
+def marcar_inicio():
+    g.t0 = time.perf_counter()
+
+
+# -------------------------- PERFILADO --------------------------
+# Muestreo continuo por endpoint (siempre) + captura fina de una request con X-Perfil: 1 o ?perfil=1.
+perfilador.iniciar()
+
+
+def _es_admin():
+    """
+    ADMIN_TOKEN en X-Admin-Token o Authorization: Bearer. Sin token configurado no hay admin: detrás de
+    un proxy en el mismo host todas las requests llegan desde 127.0.0.1, así que la IP no sirve.
+    """
+    if not settings.admin_token:
+        return False
+    token = request.headers.get("X-Admin-Token") or \
+        request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    return hmac.compare_digest(token.encode("utf-8"), settings.admin_token.encode("utf-8"))
+
+
+@app.before_request
+def perfil_inicio():
+    if not request.endpoint or request.endpoint == "static":
+        return
+    perfilador.marcar(request.endpoint)
+    flag = (request.headers.get("X-Perfil") or request.args.get("perfil") or "").lower()
+    if flag in ("1", "true", "si", "sí") and _es_admin():
+        g.perfil_pedido = True
+        g.captura = capturas.iniciar(request.endpoint)
+
+
+@app.after_request
+def perfil_fin(resp):
+    captura = g.pop("captura", None)
+    if captura is not None:
+        datos = capturas.terminar(captura)
+        resp.headers["X-Perfil"] = f"/api/admin/perfil/{datos['id']}"
+    elif g.get("perfil_pedido"):
+        resp.headers["X-Perfil"] = "ocupado"   # ya hay PERFIL_MAX_CAPTURAS en curso
+    return resp
+
+
+@app.teardown_request
+def perfil_limpiar(_exc):
+    perfilador.desmarcar()
+    captura = g.pop("captura", None)   # la request terminó con excepción antes de after_request
+    if captura is not None:
+        capturas.terminar(captura)
+
+
+@app.after_request
+def medir_request(resp):
+    if request.endpoint and hasattr(g, "t0"):
+        metricas.observar(f"http.{request.endpoint}", time.perf_counter() - g.t0)
+        metricas.incrementar(f"http.{request.endpoint}.{resp.status_code}")
+    return resp
+
+
+@app.before_request
+def admision():
+    costo = COSTOS.get(request.endpoint or "")
+    if costo:
+        limitador.consumir(_cliente(), costo)
+    # cortar antes de leer el upload si visión ya está saturada
+    if request.endpoint == "recibir_imagen" and compuertas["vision"].saturada():
+        raise Sobrecarga("Servidor ocupado (vision), probá de nuevo en unos segundos.", 503,
+                         compuertas["vision"].estado()["servicio_s"])
+
+
+@app.errorhandler(Sobrecarga)
+def sobrecarga(e):
+    resp = jsonify({"error": str(e)})
+    resp.status_code = e.codigo
+    resp.headers["Retry-After"] = str(e.retry_after)
+    return resp
+
+
 # -------------------------- PÁGINAS --------------------------
 
 @app.route("/")
@@ -59,23 +198,123 @@ def viewer_page():
 @app.route("/modelos/<path:filename>")
 def modelos(filename):
     modelos_dir = os.path.join(app.root_path, "data", "modelos3d")
+    # un cliente lo está mirando: que el conserje no lo borre
+    registrar_referencia(filename)
+    # lo generó otro nodo: se baja del almacén compartido (no-op con almacén local)
+    if not os.path.exists(os.path.join(modelos_dir, filename)):
+        materializar_carpeta(filename.split("/", 1)[0])
     return send_from_directory(modelos_dir, filename)
 
 
 
 # -------------------------- API: IMAGEN --------------------------
 
+def procesar_imagen(img_path, nota, sesion_id, teselas=None, canal=None, pedido=None):
+    """
+    Pipeline de una imagen (lo comparten /api/imagen y el canal /ws):
+      1) Corre YOLO sobre la imagen
+      2) Si hay 'nota', genera respuesta del LLM combinada con las detecciones
+      3) (opcional) habla el resumen YOLO
+    Con `canal` (WebSocket) las detecciones se empujan apenas están, la respuesta del LLM va
+    token a token y se avisa cuando termina la lectura en voz alta; `pedido` es el id del cliente.
+    """
+    # 1) YOLO (cupo global de visión, prioridad baja frente al texto). El cupo es solo para la
+    #    inferencia: el modelo 3D (que puede esperar a la cola de modelado) se busca ya liberado.
+    llegada = time.perf_counter()
+    with compuertas["vision"].turno(PRIORIDAD_IMAGEN):
+        resultado_yolo = detectar_objetos(img_path, teselas=teselas, llegada=llegada)
+    resultado_yolo = resolver_modelo(resultado_yolo)
+    print("🔎 Resultado YOLO:", resultado_yolo)
+
+    # historial de detecciones (encola y sigue: la escritura es en segundo plano)
+    obtener_historial().registrar(resultado_yolo.get("objetos", []), sesion=sesion_id,
+                                  imagen=os.path.basename(img_path))
+
+    descripcion = resultado_yolo.get("descripcion", "")
+    respuesta_yolo = resultado_yolo.get("respuesta", "No se obtuvo respuesta del modelo.")
+
+    datos = {
+        "descripcion": descripcion,
+        "respuesta": respuesta_yolo,
+        "objetos": resultado_yolo.get("objetos", []),
+        "modelo_url": resultado_yolo.get("modelo_url"),    # ej: /modelos/<id>/laptop.obj
+        "modelo_transform": resultado_yolo.get("modelo_transform"),   # centrado/escala precalculados (biblioteca)
+        "modelo_job": resultado_yolo.get("modelo_job"),    # ej: {"id": ..., "estado": "pendiente", "url": "/api/modelado/<id>"}
+        "modo": resultado_yolo.get("modo"),
+        "calidad": resultado_yolo.get("calidad"),
+        "sesion": sesion_id,
+    }
+    if canal:
+        canal.enviar("det", pedido, datos)
+
+    # 2) Si vino nota, combinamos con LLM
+    respuesta_llm = None
+    if nota:
+        prompt = (
+            "Actúa como tutor de TICs. Te paso detecciones de una imagen y una nota del estudiante.\n"
+            "1) Resume brevemente lo que ves a partir de las detecciones.\n"
+            "2) Responde la nota del estudiante en relación con lo que se ve.\n"
+            "3) Si procede, sugiere actividades o conceptos TICs relacionados.\n\n"
+            f"Detecciones: {descripcion if descripcion else 'sin objetos relevantes'}\n"
+            f"Nota del estudiante: {nota}\n"
+        )
+        try:
+            with compuertas["llm"].turno(PRIORIDAD_IMAGEN):
+                if canal:
+                    respuesta_llm = _stream_llm(prompt, sesion_id, canal, pedido)
+                else:
+                    respuesta_llm = responder_mensaje_texto(prompt, sesion_id=sesion_id)
+            print("🧠 LLM OK")
+        except Sobrecarga:
+            print("⚠ LLM saturado, se omite la respuesta a la nota")
+            respuesta_llm = None
+        except Exception:
+            print("⚠ Error consultando al LLM con la nota:")
+            traceback.print_exc()
+            respuesta_llm = None
+    datos["respuesta_llm"] = respuesta_llm
+
+    # 3) TTS (no bloquear si falla)
+    try:
+        if respuesta_yolo:
+            hablar(respuesta_yolo, al_terminar=_aviso_voz(canal, pedido))
+    except Exception:
+        pass
+
+    # 4) Guardar pedido de modelado si el texto lo sugiere
+    if "modelo 3d" in (respuesta_yolo or "").lower():
+        guardar_instruccion_modelado(descripcion, respuesta_yolo)
+
+    return datos
+
+
+def _stream_llm(mensaje, sesion_id, canal, pedido):
+    """Manda la respuesta del LLM por el canal a medida que llega; devuelve el texto completo."""
+    emisor = EmisorTokens(canal, pedido)
+    partes = []
+    for parte in responder_mensaje_stream(mensaje, sesion_id=sesion_id):
+        emisor.agregar(parte)
+        partes.append(parte)
+    emisor.vaciar()
+    return "".join(partes)
+
+
+def _aviso_voz(canal, pedido):
+    if canal is None:
+        return None
+    return lambda leido: canal.enviar("voz", pedido, {"leido": leido})
+
+
 @app.route("/api/imagen", methods=["POST"])
 def recibir_imagen():
     """
     Recibe:
       - 'imagen': archivo
       - 'nota': (opcional) texto del usuario
-    Hace:
-      1) Corre YOLO sobre la imagen
-      2) Si hay 'nota', genera respuesta del LLM combinada con las detecciones
-      3) (opcional) habla el resumen YOLO
-    Devuelve: JSON con {descripcion, respuesta, objetos, modelo_url, respuesta_llm}
+      - 'teselas': (opcional) 1/0 para forzar la inferencia por teselas
+    Devuelve: JSON con {descripcion, respuesta, objetos, modelo_url, modelo_job, respuesta_llm}
+    (ver procesar_imagen). Si el modelo procedural no está listo al instante, 'modelo_job' trae
+    el handle para consultar /api/modelado/<id>.
     """
     try:
         if "imagen" not in request.files:
@@ -83,66 +322,122 @@ def recibir_imagen():
 
         img_file = request.files["imagen"]
         nota = (request.form.get("nota") or "").strip()
+        sesion_id = obtener_sesion_id()
+        # 'teselas' = 1/0 fuerza la inferencia por teselas; sin el campo manda YOLO_TESELAS
+        teselas = request.form.get("teselas")
+        teselas = None if teselas is None else teselas.lower() in ("1", "true", "si", "sí")
 
-        img_path = os.path.join(UPLOADS_DIR, "entrada.jpg")
+        # nombre propio por request: la cola de modelado puede leerla después
+        img_path = os.path.join(UPLOADS_DIR, f"entrada_{nuevo_id()}.jpg")
         img_file.save(img_path)
         print(f"📥 Imagen guardada en: {img_path}")
         if nota:
             print(f"📝 Nota adjunta: {nota}")
 
-        # 1) YOLO
-        resultado_yolo = analizar_imagen_yolo(img_path)
-        print("🔎 Resultado YOLO:", resultado_yolo)
-
-        descripcion = resultado_yolo.get("descripcion", "")
-        respuesta_yolo = resultado_yolo.get("respuesta", "No se obtuvo respuesta del modelo.")
-        modelo_url = resultado_yolo.get("modelo_url")
-        objetos = resultado_yolo.get("objetos", [])
-
-        # 2) Si vino nota, combinamos con LLM
-        respuesta_llm = None
-        if nota:
-            prompt = (
-                "Actúa como tutor de TICs. Te paso detecciones de una imagen y una nota del estudiante.\n"
-                "1) Resume brevemente lo que ves a partir de las detecciones.\n"
-                "2) Responde la nota del estudiante en relación con lo que se ve.\n"
-                "3) Si procede, sugiere actividades o conceptos TICs relacionados.\n\n"
-                f"Detecciones: {descripcion if descripcion else 'sin objetos relevantes'}\n"
-                f"Nota del estudiante: {nota}\n"
-            )
-            try:
-                respuesta_llm = responder_mensaje_texto(prompt)
-                print("🧠 LLM OK")
-            except Exception:
-                print("⚠ Error consultando al LLM con la nota:")
-                traceback.print_exc()
-                respuesta_llm = None
-
-        # 3) TTS (no bloquear si falla)
-        try:
-            if respuesta_yolo:
-                hablar(respuesta_yolo)
-        except Exception:
-            pass
-
-        # 4) Guardar pedido de modelado si el texto lo sugiere
-        if "modelo 3d" in (respuesta_yolo or "").lower():
-            guardar_instruccion_modelado(descripcion, respuesta_yolo)
-
-        return jsonify({
-            "descripcion": descripcion,
-            "respuesta": respuesta_yolo,
-            "objetos": objetos,
-            "modelo_url": modelo_url,        # ej: /modelos/person_1234.obj
-            "respuesta_llm": respuesta_llm,
-        })
+        return jsonify(procesar_imagen(img_path, nota, sesion_id, teselas))
 
+    except Sobrecarga:
+        raise
     except Exception as e:
         print("❌ Error en /api/imagen:", e)
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
 
+# -------------------------- API: MODELADO (cola) --------------------------
+
+@app.route("/api/modelado/<job_id>", methods=["GET"])
+def estado_modelado(job_id):
+    job = obtener_cola().obtener(job_id)
+    if job is None:
+        return jsonify({"error": "Trabajo inexistente"}), 404
+    if job["estado"] == LISTO:
+        registrar_referencia((job["resultado"] or {}).get("modelo_url"))
+    return jsonify(resumen_trabajo(job))
+
+
+@app.route("/api/modelado/<job_id>/resultado", methods=["GET"])
+def resultado_modelado(job_id):
+    job = obtener_cola().obtener(job_id)
+    if job is None:
+        return jsonify({"error": "Trabajo inexistente"}), 404
+    if job["estado"] != LISTO:
+        # todavía no está: 202 + estado para que el cliente vuelva a consultar
+        return jsonify(resumen_trabajo(job)), (500 if job["estado"] == ERROR else 202)
+    modelo_url = (job["resultado"] or {}).get("modelo_url")
+    registrar_referencia(modelo_url)
+    return redirect(modelo_url)
+
+
+# -------------------------- API: HISTORIAL --------------------------
+
+@app.route("/api/historial/top", methods=["GET"])
+def historial_top():
+    dias = request.args.get("dias", 7, type=int)
+    limite = max(1, min(request.args.get("limite", 10, type=int), 1000))
+    return jsonify({"dias": dias, "clases": obtener_historial().top_clases(dias, limite)})
+
+
+@app.route("/api/historial/serie", methods=["GET"])
+def historial_serie():
+    clase = request.args.get("clase")
+    dias = request.args.get("dias", 30, type=int)
+    return jsonify({"clase": clase, "dias": dias, "serie": obtener_historial().serie_diaria(clase, dias)})
+
+
+@app.route("/api/historial/sesion/<sesion_id>", methods=["GET"])
+def historial_sesion(sesion_id):
+    if not id_valido(sesion_id):
+        return jsonify({"error": "Sesión inválida"}), 400
+    limite = max(1, min(request.args.get("limite", 100, type=int), 1000))
+    return jsonify({"sesion": sesion_id, "detecciones": obtener_historial().por_sesion(sesion_id, limite)})
+
+
+# -------------------------- API: MÉTRICAS --------------------------
+
+@app.route("/api/metricas", methods=["GET"])
+def ver_metricas():
+    datos = metricas.resumen()
+    datos["compuertas"] = {nombre: c.estado() for nombre, c in compuertas.items()}
+    return jsonify(datos)
+
+
+# -------------------------- API: ADMIN (perfiles) --------------------------
+
+def _colapsadas(texto, nombre):
+    return Response(texto, mimetype="text/plain",
+                    headers={"Content-Disposition": f'attachment; filename="{nombre}"'})
+
+
+@app.route("/api/admin/perfil", methods=["GET"])
+def admin_perfil():
+    if not _es_admin():
+        abort(403)
+    return jsonify({"continuo": perfilador.resumen(), "capturas": capturas.listar()})
+
+
+@app.route("/api/admin/perfil/continuo", methods=["GET"])
+def admin_perfil_continuo():
+    """Pilas colapsadas del muestreo continuo (?endpoint=recibir_imagen; &reiniciar=1 para empezar de cero)."""
+    if not _es_admin():
+        abort(403)
+    endpoint = request.args.get("endpoint")
+    texto = perfilador.colapsadas(endpoint)
+    if request.args.get("reiniciar") == "1":
+        perfilador.reiniciar()
+    return _colapsadas(texto, f"continuo_{endpoint or 'todos'}.folded")
+
+
+@app.route("/api/admin/perfil/<captura_id>", methods=["GET"])
+def admin_perfil_captura(captura_id):
+    if not _es_admin():
+        abort(403)
+    datos = capturas.obtener(captura_id)
+    if datos is None:
+        return jsonify({"error": "Perfil inexistente o descartado"}), 404
+    return _colapsadas(datos["pilas"], f"{datos['endpoint']}_{captura_id}.folded")
+
+
 # -------------------------- API: MENSAJE TEXTO --------------------------
 
 @app.route("/api/mensaje", methods=["POST"])
@@ -152,8 +447,10 @@ def recibir_mensaje():
         mensaje = (data.get("mensaje") or "").strip()
         if not mensaje:
             return jsonify({"error": "Mensaje vacío"}), 400
+        sesion_id = obtener_sesion_id(data)
 
-        resultado = responder_mensaje_texto(mensaje)
+        with compuertas["llm"].turno(PRIORIDAD_TEXTO):
+            resultado = responder_mensaje_texto(mensaje, sesion_id=sesion_id)
 
         if isinstance(resultado, dict):
             respuesta = resultado.get("respuesta", "")
@@ -173,15 +470,157 @@ def recibir_mensaje():
 
         return jsonify({
             "respuesta": respuesta,
-            "modelo_url": modelo_url
+            "modelo_url": modelo_url,
+            "sesion": sesion_id,
         })
 
+    except Sobrecarga:
+        raise
     except Exception as e:
         print("❌ Error en /api/mensaje:", e)
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
 
+# -------------------------- CANAL WEBSOCKET --------------------------
+# Una conexión persistente por pestaña: chat token a token, detecciones, modelo listo y voz
+# multiplexados con tramas compactas (protocolo en utils/canal.py).
+# Opcional: sin flask-sock (o con WS_HABILITADO=0) el frontend sigue con fetch + polling.
+
+def _ws_mensaje(canal, pedido, d, sesion_id, cliente):
+    mensaje = (d.get("mensaje") or "").strip()
+    if not mensaje:
+        raise ValueError("Mensaje vacío")
+    limitador.consumir(cliente, COSTOS["recibir_mensaje"])
+
+    with compuertas["llm"].turno(PRIORIDAD_TEXTO):
+        respuesta = _stream_llm(mensaje, sesion_id, canal, pedido)
+    canal.enviar("fin", pedido, {"sesion": sesion_id})
+
+    if "modelo 3d" in (respuesta or "").lower():
+        guardar_instruccion_modelado(mensaje, respuesta)
+    try:
+        if respuesta:
+            hablar(respuesta, al_terminar=_aviso_voz(canal, pedido))
+    except Exception:
+        pass
+
+
+def _ws_imagen(canal, pedido, d, imagen, sesion_id, cliente):
+    if not isinstance(imagen, (bytes, bytearray)) or not imagen:
+        raise ValueError("Se esperaba la imagen (trama binaria) después de 'img'")
+    limitador.consumir(cliente, COSTOS["recibir_imagen"])
+    if compuertas["vision"].saturada():
+        raise Sobrecarga("Servidor ocupado (vision), probá de nuevo en unos segundos.", 503,
+                         compuertas["vision"].estado()["servicio_s"])
+
+    nota = (d.get("nota") or "").strip()
+    teselas = d.get("teselas")
+    teselas = None if teselas is None else bool(teselas)
+
+    img_path = os.path.join(UPLOADS_DIR, f"entrada_{nuevo_id()}.jpg")
+    with open(img_path, "wb") as f:
+        f.write(imagen)
+    print(f"📥 Imagen (ws) guardada en: {img_path}")
+
+    datos = procesar_imagen(img_path, nota, sesion_id, teselas, canal=canal, pedido=pedido)
+    canal.enviar("fin", pedido, {"sesion": sesion_id})
+
+    # el modelo va por push: el inmediato (biblioteca o genérico provisorio) ya con su MTL,
+    # y el procedural cuando el vigía lo vea terminado
+    if datos.get("modelo_url"):
+        registrar_referencia(datos["modelo_url"])
+        canal.enviar("modelo", pedido, info_modelo(datos["modelo_url"], datos.get("modelo_transform")))
+    job = datos.get("modelo_job")
+    if job and job.get("estado") != LISTO:
+        vigia_modelos.seguir(job["id"], canal, pedido)
+
+
+try:
+    from flask_sock import Sock  # type: ignore
+except Exception:
+    Sock = None
+
+if Sock is not None and settings.ws_habilitado:
+    app.config.setdefault("SOCK_SERVER_OPTIONS", {
+        "ping_interval": settings.ws_ping_s,
+        "max_message_size": settings.ws_max_mb * 1024 * 1024,
+    })
+    sock = Sock(app)
+
+    def _ws_atender(canal, t, pedido, d, imagen, sesion_id, cliente):
+        """Un pedido del canal, en un hilo del pool de la conexión (varios en vuelo a la vez)."""
+        t0 = time.perf_counter()
+        perfilador.marcar(f"ws.{t}")
+        try:
+            if t == "msg":
+                _ws_mensaje(canal, pedido, d, sesion_id, cliente)
+            else:
+                _ws_imagen(canal, pedido, d, imagen, sesion_id, cliente)
+            metricas.observar(f"ws.{t}", time.perf_counter() - t0)
+        except Sobrecarga as e:
+            canal.enviar("err", pedido, {"error": str(e), "codigo": e.codigo, "retry_after": e.retry_after})
+        except ValueError as e:
+            canal.enviar("err", pedido, {"error": str(e), "codigo": 400})
+        except Exception as e:
+            print("❌ Error en /ws:", e)
+            traceback.print_exc()
+            canal.enviar("err", pedido, {"error": str(e), "codigo": 500})
+        finally:
+            perfilador.desmarcar()
+
+    @sock.route("/ws")
+    def canal_ws(ws):
+        # El hilo del socket solo lee tramas: msg/img se atienden en un pool chico por conexión,
+        # así un "msg" no espera a que termine la imagen anterior (Canal.enviar es thread-safe).
+        canal = Canal(ws)
+        cliente = _cliente()
+        sesion_id = obtener_sesion_id({"sesion": request.args.get("sesion")})
+        metricas.incrementar("ws.conexiones")
+        perfilador.desmarcar()   # la conexión ociosa no cuenta; se marca cada pedido por separado
+        pool = ThreadPoolExecutor(max_workers=settings.ws_max_en_vuelo, thread_name_prefix="ws")
+        en_vuelo = threading.BoundedSemaphore(settings.ws_max_en_vuelo)
+
+        def _liberar(_fut):
+            en_vuelo.release()
+
+        try:
+            while True:
+                texto = ws.receive()
+                if texto is None:
+                    break
+                pedido = None
+                try:
+                    if isinstance(texto, (bytes, bytearray)):
+                        raise ValueError("Trama binaria inesperada")
+                    m = leer_trama(texto)
+                    t, pedido, d = m["t"], m.get("id"), m.get("d") or {}
+                    if t == "ping":
+                        canal.enviar("pong", pedido)
+                    elif t == "hola":
+                        sesion_id = obtener_sesion_id(d)
+                        canal.enviar("hola", pedido, {"sesion": sesion_id})
+                    elif t in ("msg", "img"):
+                        # la imagen viene en la trama siguiente: se lee acá, en orden
+                        imagen = ws.receive(timeout=30) if t == "img" else None
+                        if not en_vuelo.acquire(blocking=False):
+                            raise Sobrecarga("Demasiados pedidos en curso en esta conexión.", 429, 1)
+                        pool.submit(_ws_atender, canal, t, pedido, d, imagen, sesion_id, cliente) \
+                            .add_done_callback(_liberar)
+                    else:
+                        raise ValueError(f"Tipo de trama desconocido: {t}")
+                except Sobrecarga as e:
+                    canal.enviar("err", pedido, {"error": str(e), "codigo": e.codigo, "retry_after": e.retry_after})
+                except ValueError as e:
+                    canal.enviar("err", pedido, {"error": str(e), "codigo": 400})
+        finally:
+            canal.abierto = False
+            pool.shutdown(wait=False)
+    print("🔌 Canal WebSocket habilitado en /ws")
+else:
+    print("ℹ Canal WebSocket deshabilitado (flask-sock no instalado o WS_HABILITADO=0)")
+
+
 # -------------------------- MAIN --------------------------
 
 if __name__ == "__main__":
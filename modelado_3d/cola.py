@@ -0,0 +1,503 @@
+# modelado_3d/cola.py
+"""
+Cola persistente de trabajos de modelado 3D: SQLite (un host) o Redis (varios nodos, con ALMACEN_URL).
+
+- Cada pedido tiene su propio id; el estado se consulta en /api/modelado/<id>.
+- Pedidos idénticos (misma imagen + misma clase) se deduplican: se devuelve el trabajo existente.
+- Los workers pueden ser hilos dentro de Flask (MODELADO_WORKERS) o procesos aparte:
+      python -m modelado_3d.cola --procesos 4
+  Todos comparten la misma base, así que se pueden mezclar.
+- Con almacén compartido la imagen de entrada se sube como blob (el worker puede estar en otro
+  nodo) y el modelo generado se publica para que lo sirva cualquier nodo.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+from abc import ABC, abstractmethod
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from utils.config import settings
+from utils.almacen import bajar_archivo, carpeta_disponible, obtener_almacen, publicar_archivo
+from utils.limpieza import _clave_ref, nueva_carpeta, nuevo_id, registrar_proteccion, url_modelo
+from modelado_3d.generar_modelo import generar_modelo_3d_desde_imagen
+
+PENDIENTE = "pendiente"
+EN_PROCESO = "en_proceso"
+LISTO = "listo"
+ERROR = "error"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    id          TEXT PRIMARY KEY,
+    tipo        TEXT NOT NULL,
+    clave       TEXT,
+    estado      TEXT NOT NULL,
+    entrada     TEXT NOT NULL,
+    resultado   TEXT,
+    error       TEXT,
+    worker      TEXT,
+    intentos    INTEGER NOT NULL DEFAULT 0,
+    creado      REAL NOT NULL,
+    actualizado REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_trabajos_estado ON trabajos(estado, creado);
+CREATE INDEX IF NOT EXISTS ix_trabajos_clave ON trabajos(clave);
+"""
+
+
+# -----------------------------------------------------------
+# Cola
+# -----------------------------------------------------------
+class ColaBase(ABC):
+    """Lo común a las dos implementaciones (SQLite y Redis)."""
+
+    hay_trabajo: threading.Event
+
+    @abstractmethod
+    def encolar(self, tipo: str, entrada: Dict[str, Any], clave: Optional[str] = None) -> Tuple[str, bool]:
+        """Encola (o reutiliza, si hay uno vigente con la misma clave) un trabajo. Devuelve (id, nuevo)."""
+
+    @abstractmethod
+    def tomar(self, worker: str) -> Optional[Dict[str, Any]]:
+        """Reclama atómicamente el trabajo pendiente más antiguo (None si no hay)."""
+
+    @abstractmethod
+    def completar(self, job_id: str, resultado: Dict[str, Any]) -> None: ...
+
+    @abstractmethod
+    def fallar(self, job_id: str, error: str) -> None: ...
+
+    @abstractmethod
+    def obtener(self, job_id: str) -> Optional[Dict[str, Any]]: ...
+
+    @abstractmethod
+    def recuperar_huerfanos(self, max_s: float) -> int:
+        """Devuelve a 'pendiente' los trabajos en proceso sin novedades hace más de `max_s`."""
+
+    @abstractmethod
+    def entradas_activas(self) -> Set[str]:
+        """Nombres de las imágenes de entrada de trabajos pendientes o en proceso (el conserje no las borra)."""
+
+    def esperar(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Espera hasta `timeout` segundos a que el trabajo termine; devuelve su último estado."""
+        limite = time.monotonic() + timeout
+        job = self.obtener(job_id)
+        while job and job["estado"] in (PENDIENTE, EN_PROCESO) and time.monotonic() < limite:
+            time.sleep(0.05)
+            job = self.obtener(job_id)
+        return job
+
+
+class ColaModelado(ColaBase):
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        # despierta a los workers del mismo proceso apenas se encola algo
+        self.hay_trabajo = threading.Event()
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # una conexión por hilo (sqlite3 no comparte conexiones entre hilos)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _fila(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        d = dict(row)
+        d["entrada"] = json.loads(d["entrada"]) if d.get("entrada") else {}
+        d["resultado"] = json.loads(d["resultado"]) if d.get("resultado") else None
+        return d
+
+    def encolar(self, tipo: str, entrada: Dict[str, Any], clave: Optional[str] = None) -> Tuple[str, bool]:
+        """
+        Encola un trabajo. Devuelve (id, nuevo).
+        Si ya hay uno con la misma clave pendiente, en proceso o listo (con su archivo vivo), lo reutiliza.
+        """
+        c = self._conn()
+        ahora = time.time()
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            if clave:
+                row = c.execute(
+                    "SELECT * FROM trabajos WHERE clave=? AND estado IN (?,?,?) ORDER BY creado DESC LIMIT 1",
+                    (clave, PENDIENTE, EN_PROCESO, LISTO),
+                ).fetchone()
+                previo = self._fila(row)
+                if previo and (previo["estado"] != LISTO or _resultado_vigente(previo)):
+                    c.execute("COMMIT")
+                    return previo["id"], False
+
+            job_id = nuevo_id()
+            c.execute(
+                "INSERT INTO trabajos (id, tipo, clave, estado, entrada, creado, actualizado) VALUES (?,?,?,?,?,?,?)",
+                (job_id, tipo, clave, PENDIENTE, json.dumps(entrada, ensure_ascii=False), ahora, ahora),
+            )
+            c.execute("COMMIT")
+        except Exception:
+            c.execute("ROLLBACK")
+            raise
+        self.hay_trabajo.set()
+        return job_id, True
+
+    def tomar(self, worker: str) -> Optional[Dict[str, Any]]:
+        """Reclama atómicamente el trabajo pendiente más antiguo."""
+        c = self._conn()
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            row = c.execute(
+                "SELECT * FROM trabajos WHERE estado=? ORDER BY creado LIMIT 1", (PENDIENTE,)
+            ).fetchone()
+            if row is None:
+                c.execute("COMMIT")
+                return None
+            c.execute(
+                "UPDATE trabajos SET estado=?, worker=?, intentos=intentos+1, actualizado=? WHERE id=?",
+                (EN_PROCESO, worker, time.time(), row["id"]),
+            )
+            c.execute("COMMIT")
+        except Exception:
+            c.execute("ROLLBACK")
+            raise
+        job = self._fila(row)
+        job.update(estado=EN_PROCESO, worker=worker, intentos=job["intentos"] + 1)
+        return job
+
+    def completar(self, job_id: str, resultado: Dict[str, Any]) -> None:
+        self._conn().execute(
+            "UPDATE trabajos SET estado=?, resultado=?, error=NULL, actualizado=? WHERE id=?",
+            (LISTO, json.dumps(resultado, ensure_ascii=False), time.time(), job_id),
+        )
+
+    def fallar(self, job_id: str, error: str) -> None:
+        self._conn().execute(
+            "UPDATE trabajos SET estado=?, error=?, actualizado=? WHERE id=?",
+            (ERROR, error, time.time(), job_id),
+        )
+
+    def obtener(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM trabajos WHERE id=?", (job_id,)).fetchone()
+        return self._fila(row)
+
+    def recuperar_huerfanos(self, max_s: float) -> int:
+        """Devuelve a 'pendiente' los trabajos tomados por un worker que murió."""
+        cur = self._conn().execute(
+            "UPDATE trabajos SET estado=?, worker=NULL WHERE estado=? AND actualizado<?",
+            (PENDIENTE, EN_PROCESO, time.time() - max_s),
+        )
+        return cur.rowcount
+
+    def entradas_activas(self) -> Set[str]:
+        rows = self._conn().execute(
+            "SELECT entrada FROM trabajos WHERE estado IN (?,?)", (PENDIENTE, EN_PROCESO)
+        ).fetchall()
+        return {Path(json.loads(r["entrada"]).get("imagen", "")).name for r in rows} - {""}
+
+
+class ColaModeladoRedis(ColaBase):
+    """
+    Misma interfaz sobre Redis. Cada trabajo es un JSON en <prefijo>modelado:job:<id>; los ids
+    pendientes van en una lista y se reclaman con RPOPLPUSH (atómico: un solo worker lo toma).
+    """
+
+    def __init__(self, cliente: Any, prefijo: str = "", ttl_s: float = 86400):
+        self.r = cliente
+        self.prefijo = prefijo + "modelado:"
+        self.ttl_ms = int(ttl_s * 1000)
+        self.hay_trabajo = threading.Event()
+        # ids vistos en en_proceso con estado 'pendiente' (el worker murió entre RPOPLPUSH y
+        # _guardar) -> cuándo se vieron así por primera vez
+        self._sin_reclamar: Dict[str, float] = {}
+
+    def _k(self, *partes: str) -> str:
+        return self.prefijo + ":".join(partes)
+
+    def _guardar(self, job: Dict[str, Any]) -> None:
+        self.r.set(self._k("job", job["id"]), json.dumps(job, ensure_ascii=False), px=self.ttl_ms)
+
+    def encolar(self, tipo: str, entrada: Dict[str, Any], clave: Optional[str] = None) -> Tuple[str, bool]:
+        job_id = nuevo_id()
+        if clave:
+            k_clave = self._k("clave", clave)
+            for _ in range(2):
+                if self.r.set(k_clave, job_id, nx=True, px=self.ttl_ms):
+                    break
+                previo_id = self.r.get(k_clave)
+                previo = self.obtener(previo_id.decode("utf-8")) if previo_id else None
+                if previo and previo["estado"] != ERROR and (previo["estado"] != LISTO or _resultado_vigente(previo)):
+                    return previo["id"], False
+                self.r.delete(k_clave)  # trabajo fallido o modelo vencido: se regenera
+        ahora = time.time()
+        self._guardar({
+            "id": job_id, "tipo": tipo, "clave": clave, "estado": PENDIENTE, "entrada": entrada,
+            "resultado": None, "error": None, "worker": None, "intentos": 0, "creado": ahora, "actualizado": ahora,
+        })
+        self.r.lpush(self._k("pendientes"), job_id)
+        self.hay_trabajo.set()
+        return job_id, True
+
+    def tomar(self, worker: str) -> Optional[Dict[str, Any]]:
+        job_id = self.r.rpoplpush(self._k("pendientes"), self._k("en_proceso"))
+        if job_id is None:
+            return None
+        job = self.obtener(job_id.decode("utf-8"))
+        if job is None:  # venció mientras esperaba
+            self.r.lrem(self._k("en_proceso"), 0, job_id)
+            return None
+        job.update(estado=EN_PROCESO, worker=worker, intentos=job["intentos"] + 1, actualizado=time.time())
+        self._guardar(job)
+        return job
+
+    def _terminar(self, job_id: str, **cambios: Any) -> None:
+        job = self.obtener(job_id)
+        if job is not None:
+            job.update(actualizado=time.time(), **cambios)
+            self._guardar(job)
+        self.r.lrem(self._k("en_proceso"), 0, job_id)
+
+    def completar(self, job_id: str, resultado: Dict[str, Any]) -> None:
+        self._terminar(job_id, estado=LISTO, resultado=resultado, error=None)
+
+    def fallar(self, job_id: str, error: str) -> None:
+        self._terminar(job_id, estado=ERROR, error=error)
+
+    def obtener(self, job_id: str) -> Optional[Dict[str, Any]]:
+        datos = self.r.get(self._k("job", job_id))
+        return json.loads(datos) if datos else None
+
+    def recuperar_huerfanos(self, max_s: float) -> int:
+        """
+        Devuelve a 'pendiente' los trabajos tomados por un worker (de cualquier nodo) que murió.
+        tomar() no es atómico entre RPOPLPUSH y guardar el estado: un id en en_proceso que sigue
+        'pendiente' cuenta como huérfano si sigue así durante `max_s` (medido desde que se vio);
+        uno ya terminado (murió antes del LREM) solo se saca de la lista.
+        """
+        n = 0
+        ahora = time.time()
+        limite = ahora - max_s
+        vistos = set()
+        for raw in self.r.lrange(self._k("en_proceso"), 0, -1):
+            job_id = raw.decode("utf-8")
+            vistos.add(job_id)
+            job = self.obtener(job_id)
+            if job is not None:
+                if job["estado"] in (LISTO, ERROR):
+                    self.r.lrem(self._k("en_proceso"), 1, raw)
+                    continue
+                if job["estado"] == EN_PROCESO and job["actualizado"] >= limite:
+                    continue
+                if job["estado"] == PENDIENTE and self._sin_reclamar.setdefault(job_id, ahora) > limite:
+                    continue
+            if self.r.lrem(self._k("en_proceso"), 1, raw):
+                self._sin_reclamar.pop(job_id, None)
+                if job is not None:
+                    job.update(estado=PENDIENTE, worker=None, actualizado=ahora)
+                    self._guardar(job)
+                    self.r.rpush(self._k("pendientes"), raw)  # a la punta: sale primero
+                    n += 1
+        for job_id in list(self._sin_reclamar):
+            if job_id not in vistos:
+                del self._sin_reclamar[job_id]
+        return n
+
+    def entradas_activas(self) -> Set[str]:
+        nombres: Set[str] = set()
+        for lista in ("pendientes", "en_proceso"):
+            for raw in self.r.lrange(self._k(lista), 0, -1):
+                job = self.obtener(raw.decode("utf-8"))
+                if job is not None:
+                    nombres.add(Path(job["entrada"].get("imagen", "")).name)
+        return nombres - {""}
+
+
+def _resultado_vigente(job: Dict[str, Any]) -> bool:
+    # el conserje pudo haber borrado el modelo: en ese caso hay que regenerarlo
+    # (con almacén compartido alcanza con que esté publicado: otro nodo lo baja)
+    resultado = job.get("resultado") or {}
+    obj = resultado.get("obj")
+    if obj and Path(obj).exists():
+        return True
+    modelo_url = resultado.get("modelo_url")
+    return bool(modelo_url) and carpeta_disponible(_clave_ref(modelo_url))
+
+
+# -----------------------------------------------------------
+# Trabajos
+# -----------------------------------------------------------
+def _imagen_local(entrada: Dict[str, Any]) -> str:
+    """Ruta de la imagen en este nodo; si se encoló en otro, se baja del almacén."""
+    imagen = Path(entrada["imagen"])
+    if not imagen.exists() and entrada.get("imagen_blob"):
+        imagen = settings.uploads_dir / imagen.name
+        if not imagen.exists() and not bajar_archivo(entrada["imagen_blob"], imagen):
+            raise FileNotFoundError(f"La imagen del pedido ya no está disponible: {imagen.name}")
+    return str(imagen)
+
+def _trabajo_modelo(entrada: Dict[str, Any]) -> Dict[str, Any]:
+    clase = entrada.get("clase") or "modelo"
+    carpeta = nueva_carpeta(settings.modelos_dir)
+    salida = carpeta / f"{clase}.obj"
+    generar_modelo_3d_desde_imagen(_imagen_local(entrada), salida_obj=str(salida), clase_objeto=clase,
+                                   placeholder=entrada.get("placeholder"))
+    return {"obj": str(salida), "modelo_url": url_modelo(salida)}
+
+_HANDLERS: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    "modelo": _trabajo_modelo,
+}
+
+def procesar_uno(cola: ColaBase, worker: str) -> bool:
+    """Toma y ejecuta un trabajo. Devuelve False si la cola estaba vacía."""
+    job = cola.tomar(worker)
+    if job is None:
+        return False
+    handler = _HANDLERS.get(job["tipo"])
+    try:
+        if handler is None:
+            raise ValueError(f"Tipo de trabajo desconocido: {job['tipo']}")
+        cola.completar(job["id"], handler(job["entrada"]))
+        print(f"🧩 Trabajo {job['id']} listo ({worker})")
+    except Exception as e:
+        traceback.print_exc()
+        cola.fallar(job["id"], str(e))
+    return True
+
+def worker_loop(cola: ColaBase, worker: str, parar: threading.Event) -> None:
+    # además del arranque, los huérfanos se revisan seguido: un worker puede morir con el
+    # proceso (o el nodo) vivo y su trabajo quedaría "en_proceso" para siempre
+    cada_s = max(1.0, settings.modelado_timeout_s / 2)
+    proxima = time.monotonic() + cada_s
+    while not parar.is_set():
+        if time.monotonic() >= proxima:
+            proxima = time.monotonic() + cada_s
+            try:
+                n = cola.recuperar_huerfanos(settings.modelado_timeout_s)
+                if n:
+                    print(f"♻ Worker {worker}: {n} trabajos huérfanos devueltos a la cola")
+            except Exception as e:
+                print(f"⚠ Worker {worker}: no se pudieron revisar huérfanos ({e})")
+        try:
+            if procesar_uno(cola, worker):
+                continue
+        except sqlite3.OperationalError as e:
+            print(f"⚠ Worker {worker}: base ocupada ({e})")
+        except Exception as e:
+            print(f"⚠ Worker {worker}: error de la cola ({e})")
+        # cola vacía: esperamos aviso local o sondeamos (por si encoló otro proceso)
+        cola.hay_trabajo.wait(0.5)
+        cola.hay_trabajo.clear()
+
+
+# -----------------------------------------------------------
+# Instancia compartida y arranque de workers
+# -----------------------------------------------------------
+_cola: Optional[ColaBase] = None
+_cola_lock = threading.Lock()
+_parar = threading.Event()
+
+def crear_cola() -> ColaBase:
+    """Redis si el almacén es Redis (la cola la ven todos los nodos); si no, SQLite."""
+    alm = obtener_almacen()
+    if alm.tipo == "redis":
+        return ColaModeladoRedis(alm.r, alm.prefijo, ttl_s=settings.retencion_horas * 3600)
+    return ColaModelado(settings.modelado_db)
+
+def obtener_cola() -> ColaBase:
+    global _cola
+    with _cola_lock:
+        if _cola is None:
+            _cola = crear_cola()
+        return _cola
+
+def _imagenes_en_uso() -> Set[str]:
+    # la imagen de un trabajo sin terminar no se borra aunque el directorio esté excedido
+    return _cola.entradas_activas() if _cola is not None else set()
+
+registrar_proteccion(_imagenes_en_uso)
+
+def iniciar_workers(n: int) -> None:
+    """Arranca n hilos worker dentro del proceso actual (0 = solo workers externos)."""
+    cola = obtener_cola()
+    cola.recuperar_huerfanos(settings.modelado_timeout_s)
+    for i in range(n):
+        nombre = f"{os.getpid()}-hilo{i}"
+        threading.Thread(target=worker_loop, args=(cola, nombre, _parar), name=f"modelado-{i}", daemon=True).start()
+
+def clave_pedido(path_imagen: str, clase: str) -> str:
+    h = hashlib.sha256()
+    with open(path_imagen, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 16), b""):
+            h.update(bloque)
+    h.update(b"\0" + (clase or "").encode("utf-8"))
+    return h.hexdigest()
+
+def encolar_modelo(path_imagen: str, clase: str, placeholder: Optional[Path] = None) -> Tuple[str, bool]:
+    """
+    Encola (o reutiliza) la generación del modelo 3D para una imagen + clase. `placeholder` es el
+    OBJ base ya resuelto por la tabla de clases (viaja solo el nombre: el worker lo busca en su nodo).
+    """
+    entrada = {"imagen": str(path_imagen), "clase": clase}
+    if placeholder is not None:
+        entrada["placeholder"] = Path(placeholder).name
+    if obtener_almacen().compartido:
+        # el worker que lo tome puede estar en otro nodo
+        entrada["imagen_blob"] = publicar_archivo(Path(path_imagen), settings.modelado_timeout_s * 2)
+    return obtener_cola().encolar("modelo", entrada, clave=clave_pedido(path_imagen, clase))
+
+def resumen_trabajo(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Vista pública de un trabajo (lo que devuelve la API)."""
+    resultado = job.get("resultado") or {}
+    return {
+        "id": job["id"],
+        "estado": job["estado"],
+        "modelo_url": resultado.get("modelo_url"),
+        "error": job.get("error"),
+        "creado": job.get("creado"),
+        "actualizado": job.get("actualizado"),
+        "url": f"/api/modelado/{job['id']}",
+    }
+
+
+# -----------------------------------------------------------
+# Workers como procesos aparte
+# -----------------------------------------------------------
+def _proceso_worker(i: int) -> None:
+    cola = crear_cola()
+    worker_loop(cola, f"{os.getpid()}-proc{i}", threading.Event())
+
+def main():
+    parser = argparse.ArgumentParser(description="Workers de la cola de modelado 3D.")
+    parser.add_argument("--procesos", "-p", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Cantidad de procesos worker.")
+    args = parser.parse_args()
+
+    crear_cola().recuperar_huerfanos(settings.modelado_timeout_s)
+    procs = [multiprocessing.Process(target=_proceso_worker, args=(i,), daemon=True) for i in range(args.procesos)]
+    for p in procs:
+        p.start()
+    origen = settings.almacen_url or settings.modelado_db
+    print(f"✔ {len(procs)} workers de modelado escuchando {origen}")
+    try:
+        for p in procs:
+            p.join()
+    except KeyboardInterrupt:
+        print("⏹ Deteniendo workers…")
+
+if __name__ == "__main__":
+    main()
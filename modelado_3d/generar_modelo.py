@@ -1,5 +1,6 @@
 # modelado_3d/generar_modelo.py
 from __future__ import annotations
+from functools import lru_cache
 from pathlib import Path
 import shutil
 
@@ -36,19 +37,30 @@ def _asegurar_base_models():
             encoding="utf-8"
         )
 
-def _buscar_modelo_placeholder(clase: str) -> Path:
+@lru_cache(maxsize=None)
+def _placeholders_existentes() -> dict:
     """
-    Devuelve la ruta al .obj placeholder más adecuado para la clase detectada.
-    Si no encuentra, usa 'laptop.obj' como fallback.
+    Escanea data/base_models UNA vez: clave de MAPEO -> ruta existente.
+    Si se agregan placeholders en caliente, llamar resolver_placeholder.cache_clear()
+    y _placeholders_existentes.cache_clear().
     """
     _asegurar_base_models()
+    presentes = {p.name for p in BASE_MODELS.iterdir() if p.is_file()}
+    return {k: BASE_MODELS / fname for k, fname in MAPEO.items() if fname in presentes}
+
+@lru_cache(maxsize=1024)
+def resolver_placeholder(clase: str) -> Path:
+    """
+    Devuelve la ruta al .obj placeholder más adecuado para la clase detectada.
+    Si no encuentra, usa 'laptop.obj' como fallback. Resultado cacheado por clase:
+    no hay scans ni stats por request.
+    """
     clase = (clase or "").lower()
+    existentes = _placeholders_existentes()
 
-    for k, fname in MAPEO.items():
-        if k in clase:
-            p = BASE_MODELS / fname
-            if p.exists():
-                return p
+    for k in MAPEO:
+        if k in clase and k in existentes:
+            return existentes[k]
 
     # Fallback
     p = BASE_MODELS / "laptop.obj"
@@ -59,18 +71,25 @@ def _buscar_modelo_placeholder(clase: str) -> Path:
         f"Agrega al menos 'laptop.obj'."
     )
 
+# nombre histórico
+_buscar_modelo_placeholder = resolver_placeholder
+
 def generar_modelo_3d_desde_imagen(
     path_imagen: str,
     salida_obj: str,
     clase_objeto: str | None = None,
+    placeholder: str | None = None,
 ) -> str:
     """
     MVP seguro: NO reconstruye; solo copia un .obj placeholder a la salida.
     - clase_objeto: clase detectada por YOLO (ej.: 'laptop'), para elegir el placeholder.
     - salida_obj: ruta donde se guardará el .obj final que verá el visor.
+    - placeholder: nombre del .obj en data/base_models ya elegido por quien encoló; si falta, se resuelve por clase.
     Devuelve la ruta del .obj generado.
     """
-    src = _buscar_modelo_placeholder(clase_objeto or "")
+    src = BASE_MODELS / Path(placeholder).name if placeholder else None
+    if src is None or not src.is_file():
+        src = resolver_placeholder(clase_objeto or "")
     dst = Path(salida_obj)
     dst.parent.mkdir(parents=True, exist_ok=True)
     shutil.copy2(src, dst)
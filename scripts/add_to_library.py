@@ -2,6 +2,10 @@
 import sys, json
 from pathlib import Path
 ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+from scripts.build_index import ALIAS_PATH, cargar_alias_extra, entrada_indice, escalas_catalogo, normalize_class
+
 ASSETS = ROOT / "assets" / "models"
 INDEX = ASSETS / "index.json"
 
@@ -9,7 +13,8 @@ def main():
     if len(sys.argv) < 3:
         print("Uso: python scripts/add_to_library.py <clase> <ruta_al_obj> [name] [license] [source] [author]")
         sys.exit(1)
-    clase = sys.argv[1].lower()
+    cargar_alias_extra(ALIAS_PATH)
+    clase = normalize_class(sys.argv[1])   # misma clave que usa build_index.py / la detección
     src = Path(sys.argv[2]).resolve()
     if not src.exists():
         raise SystemExit(f"No existe: {src}")
@@ -20,7 +25,13 @@ def main():
     dest.parent.mkdir(parents=True, exist_ok=True)
     dest.write_bytes(src.read_bytes())
 
-    meta = {"file": str(dest_rel).replace("\\", "/")}
+    # misma validación / normalización que build_index.py
+    meta = entrada_indice(dest, max_mb=20, max_caras=300_000, escala=escalas_catalogo().get(clase, 1.0))
+    if "rechazado" in meta:
+        dest.unlink()
+        raise SystemExit("OBJ inválido: " + "; ".join(meta["rechazado"]))
+    for aviso in meta.get("avisos", []):
+        print(f"⚠ {aviso}")
     if len(sys.argv) > 3: meta["name"] = sys.argv[3]
     if len(sys.argv) > 4: meta["license"] = sys.argv[4]
     if len(sys.argv) > 5: meta["source"] = sys.argv[5]
@@ -30,7 +41,7 @@ def main():
     if INDEX.exists():
         data = json.loads(INDEX.read_text(encoding="utf-8"))
     data.setdefault(clase, []).append(meta)
-    INDEX.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+    INDEX.write_text(json.dumps(data, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
 
     print(f"OK → {dest_rel}")
 
@@ -0,0 +1,118 @@
+# scripts/bench_teselas.py
+"""
+Compara inferencia simple vs por teselas: recall (si hay etiquetas) y latencia.
+
+Uso:
+  python scripts/bench_teselas.py --imagenes fotos/ [--etiquetas labels/] [--tam 640] [--solape 0.2]
+
+Las etiquetas son opcionales, en formato YOLO (una .txt por imagen con el mismo nombre):
+  <clase_id> <cx> <cy> <w> <h>   (normalizados 0..1, ids de clase del modelo)
+Sin etiquetas solo se reportan latencia y cantidad de detecciones.
+"""
+from __future__ import annotations
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from api_client.teselado import predecir_por_teselas, predecir_simple
+
+_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def _cargar_etiquetas(path: Path, ancho: int, alto: int) -> np.ndarray:
+    if not path.exists():
+        return np.zeros((0, 5), dtype=np.float32)
+    filas = []
+    for linea in path.read_text(encoding="utf-8").splitlines():
+        partes = linea.split()
+        if len(partes) < 5:
+            continue
+        c, cx, cy, w, h = int(partes[0]), *map(float, partes[1:5])
+        filas.append([(cx - w / 2) * ancho, (cy - h / 2) * alto, (cx + w / 2) * ancho, (cy + h / 2) * alto, c])
+    return np.array(filas, dtype=np.float32).reshape(-1, 5)
+
+
+def _aciertos(gt: np.ndarray, dets: np.ndarray, iou_min: float) -> int:
+    """Cuántas cajas reales tienen alguna detección de su clase con IoU >= iou_min."""
+    n = 0
+    for x1, y1, x2, y2, c in gt:
+        d = dets[dets[:, 5] == c]
+        if len(d) == 0:
+            continue
+        iw = np.clip(np.minimum(x2, d[:, 2]) - np.maximum(x1, d[:, 0]), 0, None)
+        ih = np.clip(np.minimum(y2, d[:, 3]) - np.maximum(y1, d[:, 1]), 0, None)
+        inter = iw * ih
+        union = (x2 - x1) * (y2 - y1) + (d[:, 2] - d[:, 0]) * (d[:, 3] - d[:, 1]) - inter
+        if (inter / np.maximum(union, 1e-6)).max() >= iou_min:
+            n += 1
+    return n
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark: inferencia simple vs por teselas.")
+    parser.add_argument("--imagenes", "-i", required=True, help="Carpeta con imágenes.")
+    parser.add_argument("--etiquetas", "-e", default=None, help="Carpeta con etiquetas YOLO (.txt).")
+    parser.add_argument("--model", "-m", default=str(ROOT / "yolov5su.pt"), help="Pesos YOLO.")
+    parser.add_argument("--tam", type=int, default=640, help="Tamaño de tesela (px).")
+    parser.add_argument("--solape", type=float, default=0.2, help="Solape entre teselas (0..1).")
+    parser.add_argument("--max-teselas", type=int, default=12, help="Tope de teselas por imagen (0 = sin tope).")
+    parser.add_argument("--nms", type=float, default=0.6, help="Umbral IoS del NMS entre teselas.")
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU mínimo para contar un acierto.")
+    parser.add_argument("--repeticiones", "-r", type=int, default=3, help="Corridas por imagen (se toma la mediana).")
+    args = parser.parse_args()
+
+    imagenes = sorted(p for p in Path(args.imagenes).iterdir() if p.suffix.lower() in _EXTS)
+    if not imagenes:
+        raise SystemExit(f"No hay imágenes en {args.imagenes}")
+
+    model = YOLO(args.model)
+    modos = {
+        "simple": lambda img: predecir_simple(model, img),
+        "teselas": lambda img: predecir_por_teselas(model, img, args.tam, args.solape, args.nms, args.max_teselas),
+    }
+    # calentamiento (carga de pesos / kernels)
+    predecir_simple(model, cv2.imread(str(imagenes[0])))
+
+    stats = {m: {"lat": [], "dets": 0, "aciertos": 0} for m in modos}
+    total_gt = 0
+    for path in imagenes:
+        img = cv2.imread(str(path))
+        if img is None:
+            print(f"⚠ No se pudo leer {path}")
+            continue
+        gt = None
+        if args.etiquetas:
+            gt = _cargar_etiquetas(Path(args.etiquetas) / f"{path.stem}.txt", img.shape[1], img.shape[0])
+            total_gt += len(gt)
+        for nombre, fn in modos.items():
+            tiempos = []
+            for _ in range(args.repeticiones):
+                t0 = time.perf_counter()
+                dets = fn(img)
+                tiempos.append(time.perf_counter() - t0)
+            stats[nombre]["lat"].append(statistics.median(tiempos))
+            stats[nombre]["dets"] += len(dets)
+            if gt is not None:
+                stats[nombre]["aciertos"] += _aciertos(gt, dets, args.iou)
+
+    print(f"\n===== {len(imagenes)} imágenes | tesela={args.tam}px solape={args.solape} =====")
+    print(f"{'modo':8s} {'lat media':>10s} {'lat p95':>9s} {'dets':>6s} {'recall':>8s}")
+    for nombre, st in stats.items():
+        lat = sorted(st["lat"])
+        p95 = lat[min(len(lat) - 1, int(0.95 * len(lat)))]
+        recall = f"{st['aciertos'] / total_gt:.3f}" if total_gt else "-"
+        print(f"{nombre:8s} {statistics.mean(lat)*1000:8.1f}ms {p95*1000:7.1f}ms {st['dets']:6d} {recall:>8s}")
+
+
+if __name__ == "__main__":
+    main()
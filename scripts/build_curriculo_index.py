@@ -0,0 +1,27 @@
+# scripts/build_curriculo_index.py
+import argparse
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from api_client.recuperacion import construir_indice
+
+DOCS_DIR = ROOT / "assets" / "curriculo"
+INDICE_DIR = ROOT / "data" / "indice_curriculo"
+
+def main():
+    parser = argparse.ArgumentParser(description="(Re)construye el índice BM25 del material curricular.")
+    parser.add_argument("--docs", type=str, default=str(DOCS_DIR), help="Carpeta con .md/.txt del temario.")
+    parser.add_argument("--salida", type=str, default=str(INDICE_DIR), help="Carpeta del índice.")
+    parser.add_argument("--forzar", action="store_true", help="Reprocesar todos los documentos.")
+    args = parser.parse_args()
+
+    stats = construir_indice(Path(args.docs), Path(args.salida), forzar=args.forzar)
+    print(f"✔ Índice generado en {args.salida}: {stats['documentos']} documentos "
+          f"({stats['reprocesados']} reprocesados), {stats['fragmentos']} fragmentos, {stats['terminos']} términos")
+
+if __name__ == "__main__":
+    main()
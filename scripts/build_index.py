@@ -1,27 +1,268 @@
 # scripts/build_index.py
+"""
+Genera assets/models/index.json a partir de assets/models/library/<clase>/*.obj.
+
+Además de listar los archivos, valida cada OBJ y precalcula lo que los visores hacían en el navegador:
+- geometría: vértices/caras, coordenadas finitas, índices de caras dentro de rango, mtllib y texturas;
+- bbox y transformación de normalización {"centro": [x,y,z], "escala": s} (escala = 1 / lado mayor,
+  multiplicada por el "scale" que assets/catalog.json da a esa clase: la del primer tag de cada
+  modelo), que viaja junto a `modelo_url` para que el cliente no recorra la malla con Box3.
+
+La clase es el nombre de la carpeta normalizado con los mismos alias que la detección
+(api_client/clases.py, más ALIAS_PATH si existe): library/computer/ queda en index.json como pc_tower.
+
+Los OBJ con errores se descartan del índice; los que superan --max-mb / --max-caras se marcan
+"grande": true (o se descartan con --estricto). Se conservan los metadatos previos de cada archivo
+(name, license, source, author) que agregó add_to_library.py.
+
+Uso:
+  python scripts/build_index.py [--max-mb 20] [--max-caras 300000] [--estricto]
+"""
+import argparse
 import json
+import math
+import os
+import sys
 from pathlib import Path
+from typing import Any, Dict, List, Optional
 
 ROOT = Path(__file__).resolve().parents[1]
-LIB_DIR = ROOT / "assets" / "models" / "library"
-INDEX_PATH = ROOT / "assets" / "models" / "index.json"
+MODELS_DIR = ROOT / "assets" / "models"
+LIB_DIR = MODELS_DIR / "library"
+INDEX_PATH = MODELS_DIR / "index.json"
+CATALOG_PATH = ROOT / "assets" / "catalog.json"
+ALIAS_PATH = Path(os.getenv("ALIAS_PATH", str(ROOT / "config" / "alias.yaml")))
+
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from api_client.clases import cargar_alias_extra, normalize_class
+
+MAX_ERRORES = 10   # por archivo; después se deja de detallar
+
+
+def analizar_obj(path: Path) -> Dict[str, Any]:
+    """Recorre el OBJ una vez: conteos, bbox, mtllib, errores y avisos."""
+    nv = nvt = nvn = caras = triangulos = 0
+    mins = [math.inf] * 3
+    maxs = [-math.inf] * 3
+    mtllib: Optional[str] = None
+    errores: List[str] = []
+    avisos: List[str] = []
+
+    def error(n: int, msg: str) -> None:
+        if len(errores) < MAX_ERRORES:
+            errores.append(f"línea {n}: {msg}")
+
+    with open(path, "rb") as f:
+        for n, linea in enumerate(f, 1):
+            partes = linea.split()
+            if not partes:
+                continue
+            tag = partes[0]
+            if tag == b"v":
+                try:
+                    xyz = [float(x) for x in partes[1:4]]
+                except ValueError:
+                    error(n, "vértice no numérico")
+                    continue
+                if len(xyz) < 3 or not all(math.isfinite(c) for c in xyz):
+                    error(n, "vértice incompleto o no finito")
+                    continue
+                nv += 1
+                for i, c in enumerate(xyz):
+                    if c < mins[i]:
+                        mins[i] = c
+                    if c > maxs[i]:
+                        maxs[i] = c
+            elif tag == b"vt":
+                nvt += 1
+            elif tag == b"vn":
+                nvn += 1
+            elif tag == b"f":
+                refs = partes[1:]
+                if len(refs) < 3:
+                    error(n, "cara con menos de 3 vértices")
+                    continue
+                for ref in refs:
+                    try:
+                        idx = [int(x) if x else 0 for x in ref.split(b"/")]
+                    except ValueError:
+                        error(n, f"índice inválido {ref.decode('utf-8', 'replace')}")
+                        break
+                    malo = False
+                    for valor, total in zip(idx, (nv, nvt, nvn)):
+                        real = total + valor + 1 if valor < 0 else valor   # índices relativos
+                        if valor != 0 and not 1 <= real <= total:
+                            malo = True
+                    if malo or idx[0] == 0:
+                        error(n, f"índice fuera de rango {ref.decode('utf-8', 'replace')}")
+                        break
+                caras += 1
+                triangulos += len(refs) - 2
+            elif tag == b"mtllib" and mtllib is None and len(partes) > 1:
+                mtllib = linea.strip()[len(b"mtllib"):].strip().decode("utf-8", "replace")
+
+    if nv == 0:
+        errores.append("sin vértices")
+    if caras == 0:
+        errores.append("sin caras")
+
+    if mtllib:
+        mtl = path.parent / mtllib
+        if not mtl.is_file():
+            avisos.append(f"mtllib {mtllib} no existe (se verá sin material)")
+            mtllib = None
+        else:
+            for textura in texturas_faltantes(mtl):
+                avisos.append(f"textura {textura} no existe")
+
+    info: Dict[str, Any] = {
+        "bytes": path.stat().st_size,
+        "vertices": nv,
+        "caras": caras,
+        "triangulos": triangulos,
+        "mtl": mtllib,
+        "errores": errores,
+        "avisos": avisos,
+    }
+    if nv:
+        info["bbox"] = {"min": mins, "max": maxs}
+    return info
+
+
+def texturas_faltantes(mtl: Path) -> List[str]:
+    """
+    Texturas (map_*, bump, disp, decal, refl) del MTL que no están junto al archivo. El nombre puede
+    tener espacios y venir después de opciones (-s 1 1 1 ...), así que se prueba cada sufijo de la línea.
+    """
+    faltantes = []
+    for linea in mtl.read_text(encoding="utf-8", errors="replace").splitlines():
+        partes = linea.split()
+        if len(partes) < 2 or not (partes[0].lower().startswith("map_") or
+                                   partes[0].lower() in ("bump", "disp", "decal", "refl")):
+            continue
+        if not any((mtl.parent / " ".join(partes[i:])).is_file() for i in range(1, len(partes))):
+            faltantes.append(partes[-1])
+    return faltantes
 
-def build_index():
-    index = {}
-    for path in LIB_DIR.rglob("*.obj"):
-        # clase = nombre de la carpeta (ej: router, laptop, monitor…)
-        clase = path.parent.name.lower()
-        rel_path = path.relative_to(ROOT / "assets" / "models").as_posix()
 
-        if clase not in index:
-            index[clase] = []
-        index[clase].append({"file": rel_path, "name": path.stem})
+def normalizacion(bbox: Dict[str, List[float]], escala_catalogo: float = 1.0) -> Optional[Dict[str, Any]]:
+    """{"centro", "escala"} que lleva el modelo a lado mayor 1 centrado en el origen (None si es degenerado)."""
+    tam = [hi - lo for lo, hi in zip(bbox["min"], bbox["max"])]
+    lado = max(tam)
+    if not lado > 0:
+        return None
+    centro = [(lo + hi) / 2 for lo, hi in zip(bbox["min"], bbox["max"])]
+    return {"centro": [_r(c) for c in centro], "escala": _r(escala_catalogo / lado)}
+
+
+def _r(x: float) -> float:
+    return float(f"{x:.6g}")
+
+
+def escalas_catalogo() -> Dict[str, float]:
+    """Clase normalizada (primer tag del modelo) → "scale" de assets/catalog.json."""
+    try:
+        data = json.loads(CATALOG_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    escalas: Dict[str, float] = {}
+    for m in data.get("models", []):
+        tags = m.get("tags") or []
+        if tags:
+            escalas.setdefault(normalize_class(tags[0]), float(m.get("scale") or 1.0))
+    return escalas
+
+
+def entrada_indice(path: Path, max_mb: float, max_caras: int, estricto: bool = False,
+                   escala: float = 1.0) -> Dict[str, Any]:
+    """
+    Entrada de index.json para un OBJ. Si el archivo no sirve, la entrada trae "rechazado" con el
+    motivo (quien llama decide no publicarla).
+    """
+    info = analizar_obj(path)
+    entrada: Dict[str, Any] = {
+        "file": path.relative_to(MODELS_DIR).as_posix(),
+        "name": path.stem,
+        "mtl": info["mtl"],
+        "vertices": info["vertices"],
+        "caras": info["caras"],
+        "bytes": info["bytes"],
+    }
+    motivos = list(info["errores"])
+    if "bbox" in info:
+        entrada["bbox"] = {k: [_r(c) for c in v] for k, v in info["bbox"].items()}
+        transform = normalizacion(info["bbox"], escala)
+        if transform is None:
+            motivos.append("geometría degenerada (bbox de tamaño 0)")
+        entrada["transform"] = transform
+
+    grande = info["bytes"] > max_mb * 1024 * 1024 or info["triangulos"] > max_caras
+    if grande:
+        aviso = f"pesado: {info['bytes'] / 1e6:.1f} MB, {info['triangulos']} triángulos"
+        if estricto:
+            motivos.append(aviso)
+        else:
+            entrada["grande"] = True
+            info["avisos"].append(aviso)
+    if info["avisos"]:
+        entrada["avisos"] = info["avisos"]
+    if motivos:
+        entrada["rechazado"] = motivos
+    return entrada
+
+
+def build_index(max_mb: float = 20, max_caras: int = 300_000, estricto: bool = False) -> Dict[str, Any]:
+    previo: Dict[str, Dict[str, Any]] = {}
+    if INDEX_PATH.exists():
+        try:
+            for items in json.loads(INDEX_PATH.read_text(encoding="utf-8")).values():
+                for it in items:
+                    previo[it.get("file")] = it
+        except ValueError:
+            print("⚠ index.json previo inválido; se regenera desde cero")
+
+    cargar_alias_extra(ALIAS_PATH)
+    escalas = escalas_catalogo()
+    index: Dict[str, List[Dict[str, Any]]] = {}
+    rechazados = 0
+    for path in sorted(LIB_DIR.rglob("*.obj")):
+        # clase = nombre de la carpeta normalizado (ej: router, laptop, computer -> pc_tower…)
+        clase = normalize_class(path.parent.name)
+        entrada = entrada_indice(path, max_mb, max_caras, estricto, escalas.get(clase, 1.0))
+        rel = entrada["file"]
+
+        if "rechazado" in entrada:
+            rechazados += 1
+            print(f"✖ {rel}: " + "; ".join(entrada["rechazado"]))
+            continue
+        for aviso in entrada.get("avisos", []):
+            print(f"⚠ {rel}: {aviso}")
+
+        # metadatos curados a mano (name, license, source, author) pisan los calculados
+        meta = {k: v for k, v in previo.get(rel, {}).items() if k in ("name", "license", "source", "author")}
+        index.setdefault(clase, []).append({**entrada, **meta})
 
     INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
     with open(INDEX_PATH, "w", encoding="utf-8") as f:
         json.dump(index, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+
+    total = sum(len(v) for v in index.values())
+    print(f"✔ Index generado en {INDEX_PATH} ({total} modelos, {rechazados} rechazados)")
+    return index
+
+
+def main():
+    p = argparse.ArgumentParser(description="Valida la biblioteca de OBJ y genera index.json.")
+    p.add_argument("--max-mb", type=float, default=20, help="Tamaño a partir del cual un OBJ se marca pesado.")
+    p.add_argument("--max-caras", type=int, default=300_000, help="Triángulos a partir de los cuales se marca pesado.")
+    p.add_argument("--estricto", action="store_true", help="Descartar los pesados en vez de marcarlos.")
+    args = p.parse_args()
+    build_index(args.max_mb, args.max_caras, args.estricto)
+    return 0
 
-    print(f"✔ Index generado en {INDEX_PATH}")
 
 if __name__ == "__main__":
-    build_index()
+    sys.exit(main())
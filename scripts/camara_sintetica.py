@@ -0,0 +1,118 @@
+# scripts/camara_sintetica.py
+"""
+Cámara sintética: genera cuadros JPEG reproducibles (fondo, "equipos" rectangulares, texto y ruido)
+para probar /api/imagen sin webcam. También puede reciclar fotos reales de una carpeta.
+
+Uso:
+  python scripts/camara_sintetica.py --guardar cuadros/ --cantidad 20          # solo generar
+  python scripts/camara_sintetica.py --enviar http://localhost:5000 --fps 2    # reemplaza capture-and-send.py
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import sys
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import cv2
+import numpy as np
+
+_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def generar_cuadro(rng: np.random.Generator, ancho: int = 1280, alto: int = 720, calidad: int = 85) -> bytes:
+    """Un cuadro JPEG: mesa con 2-6 cajas tipo monitor/teclado/router, una etiqueta y ruido de sensor."""
+    fondo = rng.integers(40, 200, size=3)
+    img = np.empty((alto, ancho, 3), dtype=np.uint8)
+    img[:] = fondo
+    # gradiente de iluminación
+    img = (img * np.linspace(0.7, 1.1, ancho)[None, :, None]).clip(0, 255).astype(np.uint8)
+
+    for _ in range(int(rng.integers(2, 7))):
+        w = int(rng.integers(ancho // 10, ancho // 3))
+        h = int(rng.integers(alto // 10, alto // 3))
+        x = int(rng.integers(0, ancho - w))
+        y = int(rng.integers(0, alto - h))
+        color = tuple(int(c) for c in rng.integers(0, 255, size=3))
+        cv2.rectangle(img, (x, y), (x + w, y + h), color, -1)
+        cv2.rectangle(img, (x, y), (x + w, y + h), (20, 20, 20), 3)
+        if rng.random() < 0.5:  # "pantalla"
+            m = max(4, min(w, h) // 12)
+            cv2.rectangle(img, (x + m, y + m), (x + w - m, y + h - m), (30, 30, 60), -1)
+
+    cv2.putText(img, f"LAB {int(rng.integers(1, 20))}", (20, alto - 30),
+                cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255, 255, 255), 2)
+    ruido = rng.normal(0, 6, size=img.shape)
+    img = (img + ruido).clip(0, 255).astype(np.uint8)
+
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, calidad])
+    if not ok:
+        raise RuntimeError("No se pudo codificar el cuadro")
+    return buf.tobytes()
+
+
+def cuadros(semilla: int = 0, ancho: int = 1280, alto: int = 720, desde: Optional[Path] = None) -> Iterator[bytes]:
+    """Flujo infinito de cuadros: sintéticos, o las fotos de `desde` en ciclo."""
+    if desde is not None:
+        fotos = sorted(p for p in desde.iterdir() if p.suffix.lower() in _EXTS)
+        if not fotos:
+            raise FileNotFoundError(f"No hay imágenes en {desde}")
+        datos = [p.read_bytes() for p in fotos]
+        yield from itertools.cycle(datos)
+        return
+    rng = np.random.default_rng(semilla)
+    while True:
+        yield generar_cuadro(rng, ancho, alto)
+
+
+def pool_cuadros(n: int, semilla: int = 0, ancho: int = 1280, alto: int = 720,
+                 desde: Optional[Path] = None) -> List[bytes]:
+    """n cuadros pregenerados (así el generador de carga no gasta CPU codificando JPEG)."""
+    return list(itertools.islice(cuadros(semilla, ancho, alto, desde), n))
+
+
+def main():
+    p = argparse.ArgumentParser(description="Cámara sintética para probar /api/imagen sin webcam.")
+    p.add_argument("--guardar", type=str, help="Carpeta donde escribir los cuadros.")
+    p.add_argument("--enviar", type=str, help="URL base de la app (ej: http://localhost:5000).")
+    p.add_argument("--cantidad", type=int, default=10)
+    p.add_argument("--fps", type=float, default=1.0, help="Cuadros por segundo al enviar.")
+    p.add_argument("--ancho", type=int, default=1280)
+    p.add_argument("--alto", type=int, default=720)
+    p.add_argument("--semilla", type=int, default=0)
+    p.add_argument("--desde", type=str, help="Reciclar fotos reales de esta carpeta.")
+    args = p.parse_args()
+
+    if not args.guardar and not args.enviar:
+        p.error("indicá --guardar y/o --enviar")
+
+    flujo = cuadros(args.semilla, args.ancho, args.alto, Path(args.desde) if args.desde else None)
+    sesion = None
+    if args.enviar:
+        import requests
+        sesion = requests.Session()
+    destino = Path(args.guardar) if args.guardar else None
+    if destino:
+        destino.mkdir(parents=True, exist_ok=True)
+
+    periodo = 1 / args.fps if args.fps > 0 else 0
+    proximo = time.monotonic()
+    for i, jpg in enumerate(itertools.islice(flujo, args.cantidad)):
+        if destino:
+            (destino / f"cuadro_{i:05d}.jpg").write_bytes(jpg)
+        if sesion is not None:
+            time.sleep(max(0.0, proximo - time.monotonic()))
+            proximo += periodo
+            t0 = time.perf_counter()
+            r = sesion.post(args.enviar.rstrip("/") + "/api/imagen",
+                            files={"imagen": (f"cuadro_{i}.jpg", jpg, "image/jpeg")})
+            print(f"📷 {i}: {r.status_code} en {(time.perf_counter() - t0) * 1000:.0f} ms")
+    if destino:
+        print(f"✔ {args.cantidad} cuadros en {destino}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
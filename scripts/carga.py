@@ -0,0 +1,227 @@
+# scripts/carga.py
+"""
+Generador de carga de lazo abierto contra la app (texto + imágenes mezclados).
+
+Las llegadas siguen un proceso de Poisson a --tasa pedidos/s, independientemente de cuánto tarde
+el servidor (lazo abierto: si el servidor se atrasa, los pedidos se acumulan como pasaría con
+estudiantes reales). La latencia se mide desde el instante PROGRAMADO de cada pedido, así la
+espera del lado del cliente también cuenta (sin "coordinated omission").
+
+Reporta por endpoint: pedidos, respuestas por código, throughput y percentiles de latencia.
+
+Cada imagen enviada lleva una marca única después del fin del JPEG (los decodificadores la ignoran),
+así no pega en la caché de detecciones aunque el pool de cuadros sea chico (--repetir-cuadros la quita).
+
+Ejemplo completo sin Groq ni webcam. Todos los pedidos salen de la misma IP, así que hay que subir el
+rate limit por cliente; y sin cachés, para medir inferencia real y no aciertos de caché:
+  python scripts/mock_groq.py --latencia-ms 300 &
+  GROQ_API_KEY=simulada BASE_URL=http://127.0.0.1:8089/openai/v1 \
+    RATE_TASA=1000 RATE_RAFAGA=1000 CACHE_LLM_TTL_S=0 CACHE_DET_TTL_S=0 python app.py &
+  python scripts/carga.py --url http://127.0.0.1:5000 --tasa 5 --duracion 60 --imagenes 0.2
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import requests
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from utils.metricas import percentil
+from scripts.camara_sintetica import pool_cuadros
+
+PREGUNTAS = [
+    "¿Qué es una máscara de subred?",
+    "Explicame la diferencia entre un switch y un router.",
+    "¿Para qué sirve DHCP?",
+    "¿Cómo diagnostico una fuente de PC que no enciende?",
+    "Dame un ejemplo de API REST con Python.",
+    "¿Qué es Scrum y cómo se organiza un sprint?",
+    "¿Qué diferencia hay entre un ERP y un CRM?",
+    "¿Cómo funciona un lazo de control de temperatura con Arduino?",
+    "¿Qué es la latencia y el jitter en una red?",
+    "¿Cómo hago un backup de una base de datos SQL?",
+]
+NOTAS = ["", "", "¿Qué es esto?", "¿Cómo se conecta este equipo a la red?"]
+
+
+class Resultados:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.filas: List[Dict[str, Any]] = []
+
+    def agregar(self, **fila) -> None:
+        with self._lock:
+            self.filas.append(fila)
+
+
+class Generador:
+    def __init__(self, args: argparse.Namespace, cuadros: List[bytes]):
+        self.url = args.url.rstrip("/")
+        self.timeout = args.timeout
+        self.cuadros = cuadros
+        self.sesiones = [f"carga-{i:04d}" for i in range(args.sesiones)]
+        self.rng = random.Random(args.semilla)
+        self.resultados = Resultados()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.en_vuelo = 0
+        self.marcar = not args.repetir_cuadros
+        self._n = 0
+
+    def _http(self) -> requests.Session:
+        s = getattr(self._local, "s", None)
+        if s is None:
+            s = self._local.s = requests.Session()
+        return s
+
+    def ejecutar(self, tipo: str, programado: float, carga: Dict[str, Any]) -> None:
+        codigo: Optional[int] = None
+        error: Optional[str] = None
+        try:
+            if tipo == "imagen":
+                r = self._http().post(self.url + "/api/imagen", timeout=self.timeout,
+                                      files={"imagen": ("cuadro.jpg", carga["jpg"], "image/jpeg")},
+                                      data={"sesion": carga["sesion"], "nota": carga["nota"]})
+            else:
+                r = self._http().post(self.url + "/api/mensaje", timeout=self.timeout,
+                                      json={"mensaje": carga["mensaje"], "sesion": carga["sesion"]})
+            codigo = r.status_code
+        except requests.RequestException as e:
+            error = type(e).__name__
+        finally:
+            fin = time.monotonic()
+            with self._lock:
+                self.en_vuelo -= 1
+            self.resultados.agregar(tipo=tipo, programado=programado, fin=fin,
+                                    latencia=fin - programado, codigo=codigo, error=error)
+
+    def correr(self, tasa: float, duracion: float, frac_imagenes: float, max_vuelo: int) -> float:
+        inicio = time.monotonic()
+        t = 0.0
+        with ThreadPoolExecutor(max_workers=max_vuelo) as pool:
+            while True:
+                t += self.rng.expovariate(tasa)
+                if t >= duracion:
+                    break
+                programado = inicio + t
+                time.sleep(max(0.0, programado - time.monotonic()))
+
+                sesion = self.rng.choice(self.sesiones)
+                if self.rng.random() < frac_imagenes:
+                    tipo = "imagen"
+                    jpg = self.rng.choice(self.cuadros)
+                    if self.marcar:
+                        self._n += 1
+                        jpg += b"carga-%d" % self._n   # bytes distintos -> otro hash -> sin acierto de caché
+                    carga = {"jpg": jpg, "sesion": sesion, "nota": self.rng.choice(NOTAS)}
+                else:
+                    tipo = "mensaje"
+                    carga = {"mensaje": self.rng.choice(PREGUNTAS), "sesion": sesion}
+
+                with self._lock:
+                    lleno = self.en_vuelo >= max_vuelo
+                    if not lleno:
+                        self.en_vuelo += 1
+                if lleno:
+                    # el cliente no da abasto: se cuenta, no se espera (seguimos en lazo abierto)
+                    self.resultados.agregar(tipo=tipo, programado=programado, fin=programado,
+                                            latencia=None, codigo=None, error="descartado_cliente")
+                    continue
+                pool.submit(self.ejecutar, tipo, programado, carga)
+        return time.monotonic() - inicio
+
+
+def resumir(filas: List[Dict[str, Any]], desde: float, hasta: float) -> Dict[str, Any]:
+    """Resumen por endpoint de los pedidos programados en [desde, hasta)."""
+    ventana = max(1e-9, hasta - desde)
+    salida: Dict[str, Any] = {}
+    for tipo in sorted({f["tipo"] for f in filas}):
+        fs = [f for f in filas if f["tipo"] == tipo and desde <= f["programado"] < hasta]
+        codigos: Dict[str, int] = {}
+        for f in fs:
+            clave = str(f["codigo"]) if f["codigo"] is not None else f["error"]
+            codigos[clave] = codigos.get(clave, 0) + 1
+        ok = [f["latencia"] for f in fs if f["codigo"] is not None and 200 <= f["codigo"] < 300]
+        todas = [f["latencia"] for f in fs if f["latencia"] is not None]
+
+        def _ms(v: List[float], p: float) -> Optional[float]:
+            x = percentil(v, p)
+            return None if x is None else round(x * 1000, 1)
+
+        salida[tipo] = {
+            "pedidos": len(fs),
+            "codigos": codigos,
+            "ofrecido_rps": round(len(fs) / ventana, 2),
+            "throughput_ok_rps": round(len(ok) / ventana, 2),
+            "exito": round(len(ok) / len(fs), 4) if fs else None,
+            "latencia_ok_ms": {p: _ms(ok, q) for p, q in (("p50", 50), ("p90", 90), ("p95", 95), ("p99", 99), ("max", 100))},
+            "latencia_todas_ms": {p: _ms(todas, q) for p, q in (("p50", 50), ("p95", 95), ("p99", 99))},
+        }
+    return salida
+
+
+def imprimir(resumen: Dict[str, Any]) -> None:
+    print(f"\n{'endpoint':<10} {'pedidos':>8} {'ofrecido':>9} {'ok/s':>7} {'éxito':>7} "
+          f"{'p50':>8} {'p90':>8} {'p95':>8} {'p99':>8} {'max':>8}   códigos")
+    for tipo, r in resumen.items():
+        lat = r["latencia_ok_ms"]
+        fmt = lambda v: f"{v:8.0f}" if v is not None else f"{'-':>8}"
+        exito = f"{r['exito']:.1%}" if r["exito"] is not None else "-"
+        print(f"{tipo:<10} {r['pedidos']:>8} {r['ofrecido_rps']:>9} {r['throughput_ok_rps']:>7} {exito:>7} "
+              f"{fmt(lat['p50'])} {fmt(lat['p90'])} {fmt(lat['p95'])} {fmt(lat['p99'])} {fmt(lat['max'])}   "
+              f"{r['codigos']}")
+    print("(latencias en ms de las respuestas 2xx, medidas desde el instante programado)")
+
+
+def main():
+    p = argparse.ArgumentParser(description="Carga de lazo abierto (texto + imágenes) contra la app.")
+    p.add_argument("--url", default="http://127.0.0.1:5000")
+    p.add_argument("--tasa", type=float, default=2.0, help="Llegadas por segundo (Poisson).")
+    p.add_argument("--duracion", type=float, default=60, help="Segundos de carga.")
+    p.add_argument("--calentamiento", type=float, default=5, help="Segundos iniciales que no se cuentan.")
+    p.add_argument("--imagenes", type=float, default=0.2, help="Fracción de pedidos que son imágenes.")
+    p.add_argument("--sesiones", type=int, default=30, help="Cantidad de estudiantes simulados.")
+    p.add_argument("--max-vuelo", type=int, default=256, help="Pedidos simultáneos máximos del cliente.")
+    p.add_argument("--timeout", type=float, default=120)
+    p.add_argument("--cuadros", type=int, default=16, help="Cuadros sintéticos pregenerados.")
+    p.add_argument("--desde", type=str, help="Usar fotos reales de esta carpeta en vez de cuadros sintéticos.")
+    p.add_argument("--repetir-cuadros", action="store_true",
+                   help="Enviar los cuadros tal cual (pueden pegar en la caché de detecciones).")
+    p.add_argument("--semilla", type=int, default=0)
+    p.add_argument("--json", type=str, help="Guardar el resumen en este archivo.")
+    args = p.parse_args()
+
+    cuadros = pool_cuadros(args.cuadros, semilla=args.semilla, desde=Path(args.desde) if args.desde else None) \
+        if args.imagenes > 0 else []
+    gen = Generador(args, cuadros)
+    print(f"🚦 {args.tasa} pedidos/s durante {args.duracion:.0f}s ({args.imagenes:.0%} imágenes) contra {args.url}")
+    inicio = time.monotonic()
+    gen.correr(args.tasa, args.duracion, args.imagenes, args.max_vuelo)
+
+    resumen = resumir(gen.resultados.filas, inicio + args.calentamiento, inicio + args.duracion)
+    imprimir(resumen)
+
+    # vista del servidor (compuertas, p95 internos), si está disponible
+    try:
+        servidor = requests.get(args.url.rstrip("/") + "/api/metricas", timeout=5).json()
+    except Exception:
+        servidor = None
+    if args.json:
+        Path(args.json).write_text(json.dumps({"parametros": vars(args), "cliente": resumen, "servidor": servidor},
+                                              ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"💾 Resumen en {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+# scripts/mock_groq.py
+"""
+Simulador local de la API de chat de Groq (OpenAI-compatible) para pruebas de carga sin clave real.
+
+Sirve POST /openai/v1/chat/completions (con y sin stream SSE) y GET /openai/v1/models, con
+latencia, velocidad de tokens y errores configurables. Solo usa la biblioteca estándar.
+
+Uso:
+  python scripts/mock_groq.py --puerto 8089 --latencia-ms 300 --jitter-ms 100 --tokens-por-s 250 --error-tasa 0.02
+
+y la app apuntando al simulador (la clave puede ser cualquiera):
+  GROQ_API_KEY=simulada BASE_URL=http://127.0.0.1:8089/openai/v1 python app.py
+
+Ojo: el SDK de Groq reintenta solo los 429/5xx (2 veces por defecto), así que los errores
+inyectados se ven en el cliente con una tasa menor que --error-tasa.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+_TEXTO_BASE = (
+    "Una red LAN conecta equipos dentro de un mismo edificio. Cada equipo necesita una dirección IP, "
+    "una máscara de subred y una puerta de enlace para salir a otras redes. El servidor DHCP reparte "
+    "esas direcciones de forma automática y el DNS traduce nombres a direcciones. En el laboratorio "
+    "podemos probarlo con ping, ipconfig y tracert para ver por dónde viajan los paquetes."
+).split(" ")
+
+
+class Config:
+    def __init__(self, args: argparse.Namespace):
+        self.latencia_s = args.latencia_ms / 1000
+        self.jitter_s = args.jitter_ms / 1000
+        self.tokens_por_s = args.tokens_por_s
+        self.tokens = args.tokens
+        self.error_tasa = args.error_tasa
+        self.tasa_429 = args.tasa_429
+        self.corte_tasa = args.corte_tasa
+        self.rng = random.Random(args.semilla)
+        self._lock = threading.Lock()
+        self.contadores: Dict[str, int] = {}
+
+    def azar(self) -> float:
+        with self._lock:
+            return self.rng.random()
+
+    def contar(self, nombre: str) -> None:
+        with self._lock:
+            self.contadores[nombre] = self.contadores.get(nombre, 0) + 1
+
+
+def _tokens_respuesta(cfg: Config, n: int) -> List[str]:
+    inicio = int(cfg.azar() * len(_TEXTO_BASE))
+    return [(" " if i else "") + _TEXTO_BASE[(inicio + i) % len(_TEXTO_BASE)] for i in range(n)]
+
+
+def _estimar_tokens_prompt(mensajes: List[Dict[str, Any]]) -> int:
+    return sum(len(str(m.get("content", ""))) for m in mensajes) // 4 + 1
+
+
+class Manejador(BaseHTTPRequestHandler):
+    cfg: Config  # lo asigna main()
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):  # silencioso: bajo carga el log pesa más que el simulador
+        pass
+
+    # ---------- utilidades ----------
+    def _json(self, codigo: int, cuerpo: Dict[str, Any], extra: Dict[str, str] | None = None) -> None:
+        datos = json.dumps(cuerpo).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(datos)))
+        for k, v in (extra or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _error(self, codigo: int, mensaje: str, tipo: str) -> None:
+        self.cfg.contar(f"error_{codigo}")
+        extra = {"Retry-After": "1"} if codigo == 429 else None
+        self._json(codigo, {"error": {"message": mensaje, "type": tipo}}, extra)
+
+    # ---------- rutas ----------
+    def do_GET(self):
+        if self.path.rstrip("/") == "/openai/v1/models":
+            self._json(200, {"object": "list", "data": [{"id": "simulado", "object": "model", "owned_by": "mock"}]})
+        else:
+            self._error(404, "Ruta inexistente", "not_found")
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/openai/v1/chat/completions":
+            self._error(404, "Ruta inexistente", "not_found")
+            return
+        try:
+            largo = int(self.headers.get("Content-Length") or 0)
+            pedido = json.loads(self.rfile.read(largo) or b"{}")
+            mensajes = pedido["messages"]
+        except Exception:
+            self._error(400, "JSON inválido o sin 'messages'", "invalid_request_error")
+            return
+
+        cfg = self.cfg
+        cfg.contar("pedidos")
+        # errores inyectados (antes de "pensar", como un rechazo del proveedor)
+        r = cfg.azar()
+        if r < cfg.tasa_429:
+            self._error(429, "Rate limit simulado", "rate_limit_exceeded")
+            return
+        if r < cfg.tasa_429 + cfg.error_tasa:
+            self._error(500, "Error interno simulado", "internal_server_error")
+            return
+
+        # tiempo hasta el primer token
+        time.sleep(max(0.0, cfg.latencia_s + (cfg.azar() * 2 - 1) * cfg.jitter_s))
+
+        modelo = pedido.get("model", "simulado")
+        tokens = _tokens_respuesta(cfg, cfg.tokens)
+        usage = {
+            "prompt_tokens": _estimar_tokens_prompt(mensajes),
+            "completion_tokens": len(tokens),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex[:24]}", "created": int(time.time()), "model": modelo}
+
+        if pedido.get("stream"):
+            self._stream(base, tokens, usage)
+        else:
+            time.sleep(len(tokens) / cfg.tokens_por_s if cfg.tokens_por_s > 0 else 0)
+            self._json(200, {
+                **base,
+                "object": "chat.completion",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)},
+                             "finish_reason": "stop"}],
+                "usage": usage,
+            })
+        cfg.contar("ok")
+
+    def _stream(self, base: Dict[str, Any], tokens: List[str], usage: Dict[str, int]) -> None:
+        cfg = self.cfg
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def _enviar(delta: Dict[str, Any], fin: str | None = None, **extra) -> None:
+            chunk = {**base, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": fin}], **extra}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        pausa = 1 / cfg.tokens_por_s if cfg.tokens_por_s > 0 else 0
+        cortar_en = int(cfg.azar() * len(tokens)) if cfg.azar() < cfg.corte_tasa else None
+        try:
+            _enviar({"role": "assistant", "content": ""})
+            for i, t in enumerate(tokens):
+                if i == cortar_en:
+                    cfg.contar("cortes")
+                    return  # conexión cortada a mitad del stream
+                time.sleep(pausa)
+                _enviar({"content": t})
+            _enviar({}, "stop", x_groq={"usage": usage})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            cfg.contar("cliente_cerro")
+
+
+def main():
+    p = argparse.ArgumentParser(description="Simulador local de la API de chat de Groq.")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--puerto", type=int, default=8089)
+    p.add_argument("--latencia-ms", type=float, default=300, help="Tiempo hasta el primer token.")
+    p.add_argument("--jitter-ms", type=float, default=100, help="Variación uniforme ± sobre la latencia.")
+    p.add_argument("--tokens-por-s", type=float, default=250, help="Velocidad de generación (0 = instantáneo).")
+    p.add_argument("--tokens", type=int, default=120, help="Largo de cada respuesta en tokens.")
+    p.add_argument("--error-tasa", type=float, default=0.0, help="Fracción de pedidos que responden 500.")
+    p.add_argument("--tasa-429", type=float, default=0.0, help="Fracción de pedidos que responden 429.")
+    p.add_argument("--corte-tasa", type=float, default=0.0, help="Fracción de streams que se cortan a la mitad.")
+    p.add_argument("--semilla", type=int, default=None)
+    args = p.parse_args()
+
+    Manejador.cfg = Config(args)
+    servidor = ThreadingHTTPServer((args.host, args.puerto), Manejador)
+    servidor.daemon_threads = True
+    print(f"🤖 Groq simulado en http://{args.host}:{args.puerto}/openai/v1 "
+          f"(latencia {args.latencia_ms:.0f}±{args.jitter_ms:.0f} ms, {args.tokens_por_s:.0f} tok/s, "
+          f"errores 500={args.error_tasa:.0%} 429={args.tasa_429:.0%})")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("📊", json.dumps(Manejador.cfg.contadores, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
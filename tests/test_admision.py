@@ -0,0 +1,73 @@
+# tests/test_admision.py
+import os
+import threading
+import time
+
+os.environ.setdefault("GROQ_API_KEY", "test")   # utils.config lo exige al importar
+
+import pytest
+
+from utils.admision import PRIORIDAD_IMAGEN, PRIORIDAD_TEXTO, Compuerta, Sobrecarga
+
+
+def _esperar(condicion, timeout=2.0):
+    limite = time.monotonic() + timeout
+    while not condicion():
+        if time.monotonic() > limite:
+            raise AssertionError("timeout esperando condición")
+        time.sleep(0.005)
+
+
+def _pedido(compuerta, prioridad, nombre, orden, errores):
+    try:
+        compuerta.adquirir(prioridad)
+    except Sobrecarga as e:
+        errores.append((nombre, e.codigo))
+        return
+    orden.append(nombre)
+    compuerta.liberar()
+
+
+def test_texto_desplaza_imagen_con_cola_llena():
+    c = Compuerta("llm", max_concurrentes=1, max_cola=2, espera_max_s=5)
+    c.adquirir(PRIORIDAD_TEXTO)   # ocupa el único lugar
+    orden, errores = [], []
+    hilos = []
+    for nombre in ("img1", "img2"):
+        h = threading.Thread(target=_pedido, args=(c, PRIORIDAD_IMAGEN, nombre, orden, errores))
+        h.start()
+        hilos.append(h)
+        _esperar(lambda n=len(hilos): c.en_espera == n)
+
+    txt = threading.Thread(target=_pedido, args=(c, PRIORIDAD_TEXTO, "txt", orden, errores))
+    txt.start()
+    hilos.append(txt)
+    # el texto entra a la cola y la imagen más nueva recibe el 503
+    _esperar(lambda: errores)
+    assert errores == [("img2", 503)]
+    assert c.en_espera == 2
+
+    c.liberar()
+    for h in hilos:
+        h.join(2)
+    assert orden == ["txt", "img1"]
+    assert c.en_curso == 0 and c.en_espera == 0
+
+
+def test_misma_prioridad_con_cola_llena_rechaza():
+    c = Compuerta("vision", max_concurrentes=1, max_cola=1, espera_max_s=5)
+    c.adquirir(PRIORIDAD_IMAGEN)
+    orden, errores = [], []
+    h = threading.Thread(target=_pedido, args=(c, PRIORIDAD_IMAGEN, "img1", orden, errores))
+    h.start()
+    _esperar(lambda: c.en_espera == 1)
+
+    assert c.saturada(PRIORIDAD_IMAGEN)
+    assert not c.saturada(PRIORIDAD_TEXTO)
+    with pytest.raises(Sobrecarga) as e:
+        c.adquirir(PRIORIDAD_IMAGEN)
+    assert e.value.codigo == 503
+
+    c.liberar()
+    h.join(2)
+    assert orden == ["img1"] and not errores
@@ -0,0 +1,121 @@
+# tests/test_cola.py
+import os
+import time
+
+os.environ.setdefault("GROQ_API_KEY", "test")   # utils.config lo exige al importar
+
+import pytest
+
+from modelado_3d.cola import EN_PROCESO, ERROR, LISTO, PENDIENTE, ColaModelado, ColaModeladoRedis
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def cola(request, tmp_path):
+    if request.param == "sqlite":
+        return ColaModelado(tmp_path / "cola.sqlite3")
+    fakeredis = pytest.importorskip("fakeredis")
+    return ColaModeladoRedis(fakeredis.FakeRedis(), prefijo="test:")
+
+
+def _obj(tmp_path, nombre="m.obj"):
+    obj = tmp_path / nombre
+    obj.write_text("v 0 0 0\n", encoding="utf-8")
+    return str(obj)
+
+
+def test_misma_clave_reutiliza_el_trabajo(cola):
+    a, nuevo_a = cola.encolar("modelo", {"imagen": "/u/a.jpg"}, clave="k1")
+    b, nuevo_b = cola.encolar("modelo", {"imagen": "/u/a.jpg"}, clave="k1")
+    c, nuevo_c = cola.encolar("modelo", {"imagen": "/u/b.jpg"}, clave="k2")
+    assert nuevo_a and not nuevo_b and nuevo_c
+    assert a == b != c
+
+
+def test_tomar_reclama_en_orden_y_una_sola_vez(cola):
+    a, _ = cola.encolar("modelo", {"imagen": "/u/a.jpg"})
+    b, _ = cola.encolar("modelo", {"imagen": "/u/b.jpg"})
+    assert cola.tomar("w1")["id"] == a
+    assert cola.tomar("w2")["id"] == b
+    assert cola.tomar("w3") is None
+    job = cola.obtener(a)
+    assert job["estado"] == EN_PROCESO and job["worker"] == "w1" and job["intentos"] == 1
+
+
+def test_listo_se_reutiliza_mientras_el_modelo_exista(cola, tmp_path):
+    obj = _obj(tmp_path)
+    a, _ = cola.encolar("modelo", {"imagen": "/u/a.jpg"}, clave="k")
+    cola.tomar("w")
+    cola.completar(a, {"obj": obj, "modelo_url": None})
+    assert cola.obtener(a)["estado"] == LISTO
+    assert cola.encolar("modelo", {"imagen": "/u/a.jpg"}, clave="k") == (a, False)
+
+    os.remove(obj)   # el conserje lo borró: hay que regenerarlo
+    b, nuevo = cola.encolar("modelo", {"imagen": "/u/a.jpg"}, clave="k")
+    assert nuevo and b != a
+
+
+def test_fallido_no_se_reutiliza(cola):
+    a, _ = cola.encolar("modelo", {"imagen": "/u/a.jpg"}, clave="k")
+    cola.tomar("w")
+    cola.fallar(a, "boom")
+    assert cola.obtener(a)["estado"] == ERROR
+    b, nuevo = cola.encolar("modelo", {"imagen": "/u/a.jpg"}, clave="k")
+    assert nuevo and b != a
+
+
+def test_recupera_huerfanos_vencidos(cola):
+    a, _ = cola.encolar("modelo", {"imagen": "/u/a.jpg"})
+    cola.tomar("w-muerto")
+    assert cola.recuperar_huerfanos(60) == 0
+    time.sleep(0.05)
+    assert cola.recuperar_huerfanos(0.01) == 1
+    assert cola.obtener(a)["estado"] == PENDIENTE
+    job = cola.tomar("w2")
+    assert job["id"] == a and job["intentos"] == 2
+
+
+def test_entradas_activas(cola):
+    a, _ = cola.encolar("modelo", {"imagen": "/u/a.jpg"})
+    cola.encolar("modelo", {"imagen": "/u/b.jpg"})
+    cola.tomar("w")
+    assert cola.entradas_activas() == {"a.jpg", "b.jpg"}
+    cola.completar(a, {"obj": None})
+    assert cola.entradas_activas() == {"b.jpg"}
+
+
+def test_esperar_devuelve_el_ultimo_estado(cola):
+    a, _ = cola.encolar("modelo", {"imagen": "/u/a.jpg"})
+    t0 = time.monotonic()
+    assert cola.esperar(a, 0.1)["estado"] == PENDIENTE
+    assert time.monotonic() - t0 >= 0.1
+    cola.tomar("w")
+    cola.fallar(a, "x")
+    assert cola.esperar(a, 5)["estado"] == ERROR
+
+
+def test_redis_recupera_trabajo_sin_reclamar():
+    # el worker murió entre RPOPLPUSH y guardar EN_PROCESO: el id queda en en_proceso como 'pendiente'
+    fakeredis = pytest.importorskip("fakeredis")
+    r = fakeredis.FakeRedis()
+    cola = ColaModeladoRedis(r)
+    a, _ = cola.encolar("modelo", {"imagen": "/u/a.jpg"}, clave="k")
+    r.rpoplpush(cola._k("pendientes"), cola._k("en_proceso"))
+
+    assert cola.recuperar_huerfanos(0.05) == 0   # recién visto: puede ser un tomar() en curso
+    time.sleep(0.1)
+    assert cola.recuperar_huerfanos(0.05) == 1
+    assert cola.tomar("w2")["id"] == a
+    assert cola.encolar("modelo", {"imagen": "/u/a.jpg"}, clave="k") == (a, False)
+
+
+def test_redis_saca_terminados_de_en_proceso():
+    # murió entre guardar LISTO y el LREM: no se reencola, solo se limpia la lista
+    fakeredis = pytest.importorskip("fakeredis")
+    r = fakeredis.FakeRedis()
+    cola = ColaModeladoRedis(r)
+    a, _ = cola.encolar("modelo", {"imagen": "/u/a.jpg"})
+    job = cola.tomar("w")
+    job["estado"] = LISTO
+    cola._guardar(job)
+    assert cola.recuperar_huerfanos(0) == 0
+    assert r.llen(cola._k("en_proceso")) == 0 and cola.tomar("w2") is None
@@ -0,0 +1,76 @@
+# tests/test_recuperacion.py
+import json
+
+from api_client.recuperacion import IndiceCurriculo, construir_indice, version_actual
+
+
+def _docs(tmp_path):
+    docs = tmp_path / "curriculo"
+    docs.mkdir()
+    (docs / "01_redes.md").write_text(
+        "# Administración de Redes\n\n"
+        "## DHCP\nEl servidor DHCP asigna direcciones IP, máscara y puerta de enlace automáticamente.\n\n"
+        "## VPN\nUna VPN cifra el tráfico entre dos redes a través de Internet.\n",
+        encoding="utf-8",
+    )
+    (docs / "02_control.md").write_text(
+        "# Tecnología de Control\n\n"
+        "## Lazo cerrado\nUn lazo de control de temperatura compara la medición del sensor con el valor deseado.\n",
+        encoding="utf-8",
+    )
+    return docs
+
+
+def test_buscar_ordena_por_relevancia(tmp_path):
+    docs = _docs(tmp_path)
+    stats = construir_indice(docs, tmp_path / "indice")
+    assert stats["documentos"] == 2 and stats["fragmentos"] == 3
+
+    indice = IndiceCurriculo(tmp_path / "indice")
+    res = indice.buscar("¿Cómo asigna direcciones el DHCP?", k=2)
+    assert res[0]["titulo"] == "Administración de Redes — DHCP"
+    assert all(a["score"] >= b["score"] for a, b in zip(res, res[1:]))
+    assert indice.buscar("temperatura", k=3)[0]["fuente"] == "02_control.md"
+    assert indice.buscar("xyzzy inexistente") == []
+
+
+def test_reconstruccion_incremental_y_versionada(tmp_path):
+    docs = _docs(tmp_path)
+    destino = tmp_path / "indice"
+    construir_indice(docs, destino)
+    primera = version_actual(destino)
+
+    assert construir_indice(docs, destino)["reprocesados"] == 0
+    (docs / "02_control.md").write_text("# Tecnología de Control\n\nPLC y ladder.\n", encoding="utf-8")
+    assert construir_indice(docs, destino)["reprocesados"] == 1
+
+    actual = version_actual(destino)
+    assert actual != primera and actual.is_dir()
+    assert json.loads((destino / "actual.json").read_text(encoding="utf-8"))["version"] == actual.name
+    # se conservan la vigente y la anterior (un proceso puede seguir leyéndola)
+    assert len([p for p in destino.glob("v*") if p.is_dir()]) == 2
+
+
+def test_indice_se_recarga_al_cambiar_la_version(tmp_path):
+    docs = _docs(tmp_path)
+    destino = tmp_path / "indice"
+    construir_indice(docs, destino)
+    indice = IndiceCurriculo(destino)
+    assert indice.buscar("ladder") == []
+
+    (docs / "03_programables.md").write_text("# Dispositivos Programables\n\nLadder en PLC.\n", encoding="utf-8")
+    construir_indice(docs, destino)
+    assert indice.buscar("ladder")[0]["fuente"] == "03_programables.md"
+
+
+def test_construye_el_indice_si_falta(tmp_path):
+    docs = _docs(tmp_path)
+    indice = IndiceCurriculo(tmp_path / "indice", docs)
+    assert indice.disponible()
+    assert version_actual(tmp_path / "indice") is not None
+
+
+def test_sin_indice_ni_documentos(tmp_path):
+    indice = IndiceCurriculo(tmp_path / "indice")
+    assert not indice.disponible()
+    assert indice.buscar("dhcp") == []
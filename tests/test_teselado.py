@@ -0,0 +1,43 @@
+# tests/test_teselado.py
+import numpy as np
+
+from api_client.teselado import calcular_teselas, nms_por_clase, teselas_acotadas
+
+
+def _dets(*filas):
+    return np.array(filas, dtype=np.float32).reshape(-1, 6)
+
+
+def test_teselas_cubren_la_imagen():
+    ventanas = calcular_teselas(1000, 1500, 640, 0.2)
+    assert len(ventanas) > 1
+    assert min(x1 for x1, _, _, _ in ventanas) == 0 and min(y1 for _, y1, _, _ in ventanas) == 0
+    assert max(x2 for _, _, x2, _ in ventanas) == 1500 and max(y2 for _, _, _, y2 in ventanas) == 1000
+
+
+def test_teselas_acotadas_respeta_el_maximo():
+    libres = calcular_teselas(4000, 6000, 640, 0.2)
+    acotadas = teselas_acotadas(4000, 6000, 640, 0.2, max_teselas=12)
+    assert len(libres) > 12
+    assert 0 < len(acotadas) <= 12
+    assert max(x2 for _, _, x2, _ in acotadas) == 6000 and max(y2 for _, _, _, y2 in acotadas) == 4000
+
+
+def test_teselas_acotadas_sin_tope():
+    assert teselas_acotadas(4000, 6000, 640, 0.2, max_teselas=0) == calcular_teselas(4000, 6000, 640, 0.2)
+
+
+def test_nms_fusiona_caja_cortada_por_el_borde():
+    # la mitad de una caja (corte de tesela) tiene IoU bajo con la completa pero IoS = 1
+    dets = _dets([0, 0, 100, 100, 0.9, 1], [50, 0, 100, 100, 0.6, 1])
+    out = nms_por_clase(dets, 0.5)
+    assert out.tolist() == dets[:1].tolist()
+
+
+def test_nms_no_mezcla_clases():
+    dets = _dets([0, 0, 100, 100, 0.9, 1], [0, 0, 100, 100, 0.8, 2], [300, 300, 400, 400, 0.7, 1])
+    assert len(nms_por_clase(dets, 0.5)) == 3
+
+
+def test_nms_vacio():
+    assert len(nms_por_clase(np.zeros((0, 6), dtype=np.float32), 0.5)) == 0
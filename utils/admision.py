@@ -0,0 +1,192 @@
+# utils/admision.py
+"""
+Control de admisión para los endpoints de la API.
+
+- LimitadorTasa: token bucket por cliente (IP). Si se queda sin fichas -> 429 + Retry-After.
+- Compuerta: límite global de trabajos concurrentes por pipeline (visión, LLM, TTS) con una
+  cola de espera acotada y con prioridad (el texto interactivo pasa antes que las imágenes).
+  Con la cola llena, un pedido más prioritario desplaza al último de menor prioridad (que recibe
+  el 503); si no hay a quién desplazar, o vence la espera -> 503 + Retry-After.
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from utils.config import settings
+
+# menor número = más prioridad
+PRIORIDAD_TEXTO = 0
+PRIORIDAD_IMAGEN = 1
+
+
+class Sobrecarga(Exception):
+    """Se rechaza la request; app.py la convierte en 429/503 con Retry-After."""
+
+    def __init__(self, mensaje: str, codigo: int, retry_after: float):
+        super().__init__(mensaje)
+        self.codigo = codigo
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+# -----------------------------------------------------------
+# Token bucket por cliente
+# -----------------------------------------------------------
+class LimitadorTasa:
+    def __init__(self, tasa_por_s: float, rafaga: float, max_clientes: int = 10000):
+        self.tasa = tasa_por_s
+        self.rafaga = rafaga
+        self.max_clientes = max_clientes
+        self._baldes: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consumir(self, cliente: str, costo: float = 1.0) -> None:
+        """Descuenta `costo` fichas o lanza Sobrecarga(429)."""
+        ahora = time.monotonic()
+        with self._lock:
+            fichas, ts = self._baldes.pop(cliente, (self.rafaga, ahora))
+            fichas = min(self.rafaga, fichas + (ahora - ts) * self.tasa)
+            if fichas < costo:
+                self._baldes[cliente] = (fichas, ahora)
+                falta = (costo - fichas) / self.tasa if self.tasa > 0 else 60
+                raise Sobrecarga("Demasiadas solicitudes, esperá un momento.", 429, falta)
+            self._baldes[cliente] = (fichas - costo, ahora)
+            # LRU: el cliente más viejo sale primero
+            while len(self._baldes) > self.max_clientes:
+                self._baldes.popitem(last=False)
+
+
+# -----------------------------------------------------------
+# Compuerta de concurrencia con cola acotada y prioridad
+# -----------------------------------------------------------
+class Compuerta:
+    def __init__(self, nombre: str, max_concurrentes: int, max_cola: int, espera_max_s: float):
+        self.nombre = nombre
+        self.max_concurrentes = max(1, max_concurrentes)
+        self.max_cola = max(0, max_cola)
+        self.espera_max_s = espera_max_s
+        self._lock = threading.Lock()
+        self._en_curso = 0
+        # (prioridad, orden, evento, estado): estado["expulsada"] lo marca quien la desplaza
+        self._cola: List[Tuple[int, int, threading.Event, Dict[str, bool]]] = []
+        self._seq = itertools.count()
+        self._servicio_s = 1.0   # promedio móvil del tiempo de servicio (para Retry-After)
+
+    @property
+    def en_curso(self) -> int:
+        return self._en_curso
+
+    @property
+    def en_espera(self) -> int:
+        return len(self._cola)
+
+    def _estimar_espera(self, delante: int) -> float:
+        return self._servicio_s * (delante + 1) / self.max_concurrentes
+
+    def saturada(self, prioridad: int = PRIORIDAD_IMAGEN) -> bool:
+        """True si una request nueva sería rechazada ya mismo (sirve para cortar antes de leer el body)."""
+        with self._lock:
+            if self._en_curso < self.max_concurrentes or len(self._cola) < self.max_cola:
+                return False
+            # con la cola llena todavía entra si hay a quién desplazar
+            return not any(e[0] > prioridad for e in self._cola)
+
+    def adquirir(self, prioridad: int) -> None:
+        with self._lock:
+            if self._en_curso < self.max_concurrentes and not self._cola:
+                self._en_curso += 1
+                return
+            if len(self._cola) >= self.max_cola and not self._desplazar(prioridad):
+                raise Sobrecarga(
+                    f"Servidor ocupado ({self.nombre}), probá de nuevo en unos segundos.",
+                    503, self._estimar_espera(len(self._cola)),
+                )
+            evento = threading.Event()
+            estado = {"expulsada": False}
+            entrada = (prioridad, next(self._seq), evento, estado)
+            heapq.heappush(self._cola, entrada)
+
+        if evento.wait(self.espera_max_s):
+            self._si_expulsada(estado)
+            return  # liberar() ya nos transfirió el lugar
+
+        with self._lock:
+            if evento.is_set():
+                self._si_expulsada(estado)
+                return
+            self._cola.remove(entrada)
+            heapq.heapify(self._cola)
+            espera = self._estimar_espera(len(self._cola))
+        raise Sobrecarga(f"Tiempo de espera agotado ({self.nombre}).", 503, espera)
+
+    def _desplazar(self, prioridad: int) -> bool:
+        """Con el lock tomado: saca de la cola al último de menor prioridad que `prioridad`."""
+        if not self._cola:
+            return False
+        peor = max(self._cola)   # mayor número de prioridad y, entre iguales, el más nuevo
+        if peor[0] <= prioridad:
+            return False
+        self._cola.remove(peor)
+        heapq.heapify(self._cola)
+        peor[3]["expulsada"] = True
+        peor[2].set()
+        return True
+
+    def _si_expulsada(self, estado: Dict[str, bool]) -> None:
+        if estado["expulsada"]:
+            raise Sobrecarga(f"Servidor ocupado ({self.nombre}), probá de nuevo en unos segundos.",
+                             503, self._estimar_espera(len(self._cola)))
+
+    def liberar(self, duracion_s: Optional[float] = None) -> None:
+        with self._lock:
+            if duracion_s is not None:
+                self._servicio_s = 0.8 * self._servicio_s + 0.2 * duracion_s
+            if self._cola:
+                # el lugar pasa directo al de mayor prioridad (en_curso no cambia)
+                _, _, evento, _ = heapq.heappop(self._cola)
+                evento.set()
+            else:
+                self._en_curso -= 1
+
+    @contextmanager
+    def turno(self, prioridad: int = PRIORIDAD_TEXTO):
+        self.adquirir(prioridad)
+        inicio = time.monotonic()
+        try:
+            yield
+        finally:
+            self.liberar(time.monotonic() - inicio)
+
+    def estado(self) -> Dict[str, float]:
+        return {
+            "en_curso": self._en_curso,
+            "en_espera": len(self._cola),
+            "max_concurrentes": self.max_concurrentes,
+            "max_cola": self.max_cola,
+            "servicio_s": round(self._servicio_s, 3),
+        }
+
+
+# -----------------------------------------------------------
+# Instancias compartidas
+# -----------------------------------------------------------
+limitador = LimitadorTasa(settings.rate_tasa, settings.rate_rafaga)
+
+compuertas: Dict[str, Compuerta] = {
+    "vision": Compuerta("vision", settings.vision_max_concurrentes, settings.vision_max_cola, settings.cola_espera_max_s),
+    "llm":    Compuerta("llm", settings.llm_max_concurrentes, settings.llm_max_cola, settings.cola_espera_max_s),
+}
+
+# costo en fichas de cada endpoint (las imágenes pesan más que el texto)
+COSTOS: Dict[str, float] = {
+    "recibir_imagen": 3.0,
+    "recibir_mensaje": 1.0,
+    "estado_modelado": 0.1,
+    "resultado_modelado": 0.1,
+}
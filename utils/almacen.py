@@ -0,0 +1,405 @@
+# utils/almacen.py
+"""
+Almacén clave/valor intercambiable para compartir estado entre nodos.
+
+- AlmacenLocal: SQLite en data/cache.sqlite3. Lo comparten los procesos de un mismo host
+  (varios workers de gunicorn, workers de modelado), pero no otros hosts.
+- AlmacenRedis: Redis (o compatible). Lo comparten todos los nodos detrás del balanceador.
+  Con ALMACEN_URL=fakeredis:// se usa fakeredis en memoria (para probar sin servidor).
+
+Encima del almacén:
+- Cache: caché de dos niveles (LRU del proceso + almacén) para respuestas del LLM y detecciones.
+- publicar_carpeta / materializar_carpeta: las carpetas de data/modelos3d se suben por contenido
+  (blob:<sha256>, así las texturas de la biblioteca se suben una sola vez) con un manifiesto
+  carpeta:<id>; otro nodo que recibe el GET de /modelos/<id>/... la baja y la sirve.
+- Cada espacio anota sus claves recientes: un nodo que arranca se calienta con ellas.
+
+Los errores del almacén nunca rompen una request: se cuentan en 'almacen.errores' y se sigue
+como si fuera un fallo de caché.
+"""
+from __future__ import annotations
+
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.config import settings
+from utils.metricas import metricas
+
+
+# -----------------------------------------------------------
+# Interfaz
+# -----------------------------------------------------------
+class Almacen(ABC):
+    """Valores en bytes; las claves llevan el espacio como prefijo ("llm:...", "blob:...")."""
+
+    tipo = "base"
+    compartido = False   # True si lo ven otros hosts
+
+    @abstractmethod
+    def obtener(self, clave: str) -> Optional[bytes]: ...
+
+    @abstractmethod
+    def guardar(self, clave: str, valor: bytes, ttl_s: Optional[float] = None) -> None: ...
+
+    def existe(self, clave: str) -> bool:
+        return self.obtener(clave) is not None
+
+    @abstractmethod
+    def renovar(self, clave: str, ttl_s: float) -> None:
+        """Extiende la vida de una clave existente."""
+
+    @abstractmethod
+    def borrar(self, clave: str) -> None: ...
+
+    @abstractmethod
+    def anotar(self, indice: str, clave: str, max_n: int = 1000) -> None:
+        """Registra `clave` como usada recientemente en `indice` (se conservan las últimas max_n)."""
+
+    @abstractmethod
+    def recientes(self, indice: str, n: int) -> List[str]:
+        """Las n claves más recientes de `indice`, la más nueva primero."""
+
+
+# -----------------------------------------------------------
+# SQLite (un host)
+# -----------------------------------------------------------
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    clave TEXT PRIMARY KEY,
+    valor BLOB NOT NULL,
+    vence REAL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS recientes (
+    indice TEXT NOT NULL,
+    clave  TEXT NOT NULL,
+    ts     REAL NOT NULL,
+    PRIMARY KEY (indice, clave)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_recientes_ts ON recientes(indice, ts);
+"""
+
+
+class AlmacenLocal(Almacen):
+    tipo = "local"
+
+    def __init__(self, db_path: Path, mantenimiento_cada: int = 200):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.mantenimiento_cada = mantenimiento_cada
+        self._local = threading.local()
+        # contadores propios de kv y de recientes; next() sobre itertools.count es atómico con el GIL
+        self._escrituras = itertools.count(1)
+        self._anotaciones = itertools.count(1)
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def obtener(self, clave: str) -> Optional[bytes]:
+        row = self._conn().execute(
+            "SELECT valor FROM kv WHERE clave=? AND (vence IS NULL OR vence>?)", (clave, time.time())
+        ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def guardar(self, clave: str, valor: bytes, ttl_s: Optional[float] = None) -> None:
+        vence = time.time() + ttl_s if ttl_s else None
+        self._conn().execute(
+            "INSERT INTO kv (clave, valor, vence) VALUES (?,?,?) "
+            "ON CONFLICT(clave) DO UPDATE SET valor=excluded.valor, vence=excluded.vence",
+            (clave, sqlite3.Binary(valor), vence),
+        )
+        self._mantenimiento()
+
+    def renovar(self, clave: str, ttl_s: float) -> None:
+        self._conn().execute("UPDATE kv SET vence=? WHERE clave=?", (time.time() + ttl_s, clave))
+
+    def borrar(self, clave: str) -> None:
+        self._conn().execute("DELETE FROM kv WHERE clave=?", (clave,))
+
+    def anotar(self, indice: str, clave: str, max_n: int = 1000) -> None:
+        c = self._conn()
+        c.execute(
+            "INSERT INTO recientes (indice, clave, ts) VALUES (?,?,?) "
+            "ON CONFLICT(indice, clave) DO UPDATE SET ts=excluded.ts",
+            (indice, clave, time.time()),
+        )
+        if next(self._anotaciones) % self.mantenimiento_cada == 0:
+            c.execute(
+                "DELETE FROM recientes WHERE indice=? AND clave NOT IN "
+                "(SELECT clave FROM recientes WHERE indice=? ORDER BY ts DESC LIMIT ?)",
+                (indice, indice, max_n),
+            )
+
+    def recientes(self, indice: str, n: int) -> List[str]:
+        rows = self._conn().execute(
+            "SELECT clave FROM recientes WHERE indice=? ORDER BY ts DESC LIMIT ?", (indice, n)
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def _mantenimiento(self) -> None:
+        # sin hilo aparte: cada tantas escrituras se borran los vencidos
+        if next(self._escrituras) % self.mantenimiento_cada == 0:
+            self._conn().execute("DELETE FROM kv WHERE vence IS NOT NULL AND vence<=?", (time.time(),))
+
+
+# -----------------------------------------------------------
+# Redis (varios nodos)
+# -----------------------------------------------------------
+class AlmacenRedis(Almacen):
+    tipo = "redis"
+    compartido = True
+
+    def __init__(self, cliente: Any, prefijo: str = ""):
+        self.r = cliente
+        self.prefijo = prefijo
+
+    def k(self, clave: str) -> str:
+        return self.prefijo + clave
+
+    def obtener(self, clave: str) -> Optional[bytes]:
+        return self.r.get(self.k(clave))
+
+    def guardar(self, clave: str, valor: bytes, ttl_s: Optional[float] = None) -> None:
+        self.r.set(self.k(clave), valor, px=int(ttl_s * 1000) if ttl_s else None)
+
+    def existe(self, clave: str) -> bool:
+        return bool(self.r.exists(self.k(clave)))
+
+    def renovar(self, clave: str, ttl_s: float) -> None:
+        self.r.pexpire(self.k(clave), int(ttl_s * 1000))
+
+    def borrar(self, clave: str) -> None:
+        self.r.delete(self.k(clave))
+
+    def anotar(self, indice: str, clave: str, max_n: int = 1000) -> None:
+        k = self.k("recientes:" + indice)
+        pipe = self.r.pipeline()
+        pipe.zadd(k, {clave: time.time()})
+        pipe.zremrangebyrank(k, 0, -(max_n + 1))
+        pipe.execute()
+
+    def recientes(self, indice: str, n: int) -> List[str]:
+        claves = self.r.zrevrange(self.k("recientes:" + indice), 0, n - 1)
+        return [c.decode("utf-8") if isinstance(c, bytes) else c for c in claves]
+
+
+def crear_almacen(url: str) -> Almacen:
+    """"" o "local" -> SQLite; redis://, rediss://, unix:// -> Redis; fakeredis:// -> Redis en memoria."""
+    if not url or url == "local":
+        return AlmacenLocal(settings.cache_db)
+    if url.startswith("fakeredis://"):
+        import fakeredis  # type: ignore
+        return AlmacenRedis(fakeredis.FakeRedis(), settings.almacen_prefijo)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        try:
+            import redis  # type: ignore
+        except Exception as e:
+            raise RuntimeError("ALMACEN_URL apunta a Redis pero el paquete 'redis' no está instalado") from e
+        return AlmacenRedis(redis.Redis.from_url(url), settings.almacen_prefijo)
+    raise ValueError(f"ALMACEN_URL no soportada: {url}")
+
+
+_almacen: Optional[Almacen] = None
+_almacen_lock = threading.Lock()
+
+def obtener_almacen() -> Almacen:
+    global _almacen
+    with _almacen_lock:
+        if _almacen is None:
+            _almacen = crear_almacen(settings.almacen_url)
+            print(f"🗄 Almacén: {_almacen.tipo}{' (compartido)' if _almacen.compartido else ''}")
+        return _almacen
+
+
+def _fallo_almacen(operacion: str, e: Exception) -> None:
+    metricas.incrementar("almacen.errores")
+    print(f"⚠ Almacén ({operacion}): {e}")
+
+
+# -----------------------------------------------------------
+# Caché de dos niveles
+# -----------------------------------------------------------
+class Cache:
+    """LRU en memoria del proceso delante del almacén. Valores JSON. ttl_s <= 0 la deshabilita."""
+
+    def __init__(self, espacio: str, ttl_s: float, max_local: int = 512):
+        self.espacio = espacio
+        self.ttl_s = ttl_s
+        self.max_local = max_local
+        self._lru: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def habilitada(self) -> bool:
+        return self.ttl_s > 0
+
+    def _local(self, clave: str, valor: Any) -> None:
+        with self._lock:
+            self._lru[clave] = (time.monotonic() + self.ttl_s, valor)
+            self._lru.move_to_end(clave)
+            while len(self._lru) > self.max_local:
+                self._lru.popitem(last=False)
+
+    def obtener(self, clave: str) -> Optional[Any]:
+        if not self.habilitada:
+            return None
+        with self._lock:
+            hit = self._lru.get(clave)
+            if hit is not None and hit[0] > time.monotonic():
+                self._lru.move_to_end(clave)
+                metricas.incrementar(f"cache.{self.espacio}.local")
+                return hit[1]
+        try:
+            datos = obtener_almacen().obtener(f"{self.espacio}:{clave}")
+        except Exception as e:
+            _fallo_almacen("obtener", e)
+            datos = None
+        if datos is None:
+            metricas.incrementar(f"cache.{self.espacio}.fallo")
+            return None
+        valor = json.loads(datos)
+        self._local(clave, valor)
+        metricas.incrementar(f"cache.{self.espacio}.almacen")
+        return valor
+
+    def guardar(self, clave: str, valor: Any) -> None:
+        if not self.habilitada:
+            return
+        self._local(clave, valor)
+        try:
+            alm = obtener_almacen()
+            alm.guardar(f"{self.espacio}:{clave}", json.dumps(valor, ensure_ascii=False).encode("utf-8"), self.ttl_s)
+            alm.anotar(self.espacio, clave)
+        except Exception as e:
+            _fallo_almacen("guardar", e)
+
+    def calentar(self, n: int) -> int:
+        """Trae al LRU las n claves más usadas recientemente (por cualquier nodo)."""
+        if not self.habilitada or n <= 0:
+            return 0
+        try:
+            claves = obtener_almacen().recientes(self.espacio, n)
+        except Exception as e:
+            _fallo_almacen("calentar", e)
+            return 0
+        return sum(1 for c in claves if self.obtener(c) is not None)
+
+
+# -----------------------------------------------------------
+# Archivos por contenido y carpetas de modelos
+# -----------------------------------------------------------
+@lru_cache(maxsize=4096)
+def _hash_cacheado(path: str, ino: int, tam: int, mtime_ns: int) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 16), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+def hash_archivo(path: Path) -> str:
+    """sha256 del archivo, cacheado por (inodo, tamaño, mtime): los hardlinks de la biblioteca no se releen."""
+    st = os.stat(path)
+    return _hash_cacheado(str(path), st.st_ino, st.st_size, st.st_mtime_ns)
+
+def publicar_archivo(path: Path, ttl_s: float) -> str:
+    """Sube el archivo como blob:<sha256> (si ya estaba solo se renueva). Devuelve el hash."""
+    alm = obtener_almacen()
+    h = hash_archivo(path)
+    if alm.existe(f"blob:{h}"):
+        alm.renovar(f"blob:{h}", ttl_s)
+    else:
+        alm.guardar(f"blob:{h}", Path(path).read_bytes(), ttl_s)
+    return h
+
+def bajar_archivo(h: str, destino: Path) -> bool:
+    datos = obtener_almacen().obtener(f"blob:{h}")
+    if datos is None:
+        return False
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    destino.write_bytes(datos)
+    return True
+
+def publicar_carpeta(carpeta: Path) -> None:
+    """Publica una carpeta de data/modelos3d para los demás nodos (no-op con almacén local)."""
+    try:
+        alm = obtener_almacen()
+        if not alm.compartido or not carpeta.is_dir():
+            return
+        ttl = settings.retencion_horas * 3600
+        manifiesto = {
+            p.relative_to(carpeta).as_posix(): publicar_archivo(p, ttl)
+            for p in sorted(carpeta.rglob("*")) if p.is_file()
+        }
+        alm.guardar(f"carpeta:{carpeta.name}", json.dumps(manifiesto).encode("utf-8"), ttl)
+        alm.anotar("carpetas", carpeta.name)
+    except Exception as e:
+        _fallo_almacen("publicar_carpeta", e)
+
+def carpeta_disponible(nombre: str) -> bool:
+    """True si la carpeta está en este nodo o se puede bajar del almacén compartido."""
+    if (settings.modelos_dir / nombre).is_dir():
+        return True
+    try:
+        alm = obtener_almacen()
+        return alm.compartido and alm.existe(f"carpeta:{nombre}")
+    except Exception as e:
+        _fallo_almacen("carpeta_disponible", e)
+        return False
+
+def materializar_carpeta(nombre: str) -> bool:
+    """Baja data/modelos3d/<nombre> del almacén compartido si este nodo no la tiene."""
+    destino = settings.modelos_dir / nombre
+    if destino.is_dir():
+        return True
+    if not nombre or "/" in nombre or nombre.startswith("."):
+        return False
+    try:
+        alm = obtener_almacen()
+        if not alm.compartido:
+            return False
+        datos = alm.obtener(f"carpeta:{nombre}")
+        if datos is None:
+            return False
+        tmp = settings.modelos_dir / f".{nombre}.{os.getpid()}.{threading.get_ident()}"
+        try:
+            for rel, h in json.loads(datos).items():
+                if rel.startswith("/") or ".." in rel.split("/"):
+                    raise ValueError(f"Ruta inválida en el manifiesto: {rel}")
+                if not bajar_archivo(h, tmp / rel):
+                    return False
+            try:
+                os.rename(tmp, destino)
+            except OSError:
+                pass  # otro hilo/proceso la materializó primero
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        metricas.incrementar("almacen.carpetas_materializadas")
+        return destino.is_dir()
+    except Exception as e:
+        _fallo_almacen("materializar_carpeta", e)
+        return False
+
+def carpetas_recientes(n: int) -> List[str]:
+    try:
+        alm = obtener_almacen()
+        return alm.recientes("carpetas", n) if alm.compartido else []
+    except Exception as e:
+        _fallo_almacen("carpetas_recientes", e)
+        return []
@@ -0,0 +1,184 @@
+# utils/canal.py
+"""
+Canal en tiempo real (WebSocket /ws) entre el navegador y el servidor.
+
+Tramas JSON compactas: {"t": tipo, "id": n, "d": datos}. "id" es el número de pedido que eligió
+el cliente (así varias respuestas viajan multiplexadas por la misma conexión); las claves
+vacías se omiten. El servidor atiende hasta WS_MAX_EN_VUELO pedidos msg/img a la vez por conexión
+(uno más recibe err 429): un "msg" no espera a que termine una imagen anterior.
+
+  cliente -> servidor
+    hola  {"sesion"}                      -> hola {"sesion"}
+    msg   {"mensaje"}                     -> tok "..." (n veces), fin {}
+    img   {"nota", "teselas"} + 1 trama binaria con la imagen
+                                          -> det {...}, tok "..." (si hay nota), fin {}
+    ping                                  -> pong
+  servidor -> cliente (push)
+    modelo {"url", "mtl"} cuando el modelo 3D de un pedido está listo (o {"error"})
+    voz    {"leido"} cuando terminó (o se omitió) la lectura en voz alta
+    err    {"error", "codigo", "retry_after"}
+
+El canal es opcional: si falta flask-sock el frontend sigue usando fetch + polling.
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.config import settings
+from utils.limpieza import registrar_referencia
+from utils.metricas import metricas
+from utils.obj import escanear_cabecera_obj
+from modelado_3d.cola import ERROR, LISTO, obtener_cola
+
+
+def trama(t: str, id: Optional[int] = None, d: Any = None) -> str:
+    m: Dict[str, Any] = {"t": t}
+    if id is not None:
+        m["id"] = id
+    if d is not None:
+        m["d"] = d
+    return json.dumps(m, ensure_ascii=False, separators=(",", ":"))
+
+
+def leer_trama(texto: str) -> Dict[str, Any]:
+    """Parsea una trama del cliente; ValueError si no tiene la forma esperada."""
+    m = json.loads(texto)
+    if not isinstance(m, dict) or not isinstance(m.get("t"), str):
+        raise ValueError("Trama inválida")
+    if not isinstance(m.get("d", {}), dict):
+        raise ValueError("Trama inválida: 'd' debe ser un objeto")
+    return m
+
+
+class Canal:
+    """Envoltorio de una conexión: el envío es thread-safe (el vigía y el TTS empujan desde otros hilos)."""
+
+    def __init__(self, ws: Any):
+        self.ws = ws
+        self.abierto = True
+        self._lock = threading.Lock()
+
+    def enviar(self, t: str, id: Optional[int] = None, d: Any = None) -> bool:
+        if not self.abierto:
+            return False
+        texto = trama(t, id, d)
+        try:
+            with self._lock:
+                self.ws.send(texto)
+            metricas.incrementar("ws.tramas_enviadas")
+            return True
+        except Exception:
+            self.abierto = False
+            return False
+
+
+class EmisorTokens:
+    """
+    Junta los tokens del LLM y los manda en tramas de al menos `min_chars` caracteres
+    o cada `max_espera_s` segundos (menos tramas, mismo efecto de escritura en vivo).
+    """
+
+    def __init__(self, canal: Canal, id: Optional[int], min_chars: int = 24, max_espera_s: float = 0.05):
+        self.canal = canal
+        self.id = id
+        self.min_chars = min_chars
+        self.max_espera_s = max_espera_s
+        self._buf: List[str] = []
+        self._n = 0
+        self._ultimo = time.monotonic()
+
+    def agregar(self, texto: str) -> None:
+        self._buf.append(texto)
+        self._n += len(texto)
+        if self._n >= self.min_chars or time.monotonic() - self._ultimo >= self.max_espera_s:
+            self.vaciar()
+
+    def vaciar(self) -> None:
+        if self._buf:
+            self.canal.enviar("tok", self.id, "".join(self._buf))
+            self._buf, self._n = [], 0
+        self._ultimo = time.monotonic()
+
+
+# -----------------------------------------------------------
+# Modelo listo: URL del OBJ + MTL (así el cliente no hace GET del OBJ + HEAD del MTL)
+# -----------------------------------------------------------
+def info_modelo(modelo_url: str, transform: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    {"url", "mtl"[, "tf"]}; "mtl" es None si el OBJ no tiene material. Sin "mtl" si no se pudo leer.
+    "tf" es la normalización de build_index.py (solo modelos de biblioteca): el cliente no calcula el bbox.
+    """
+    info: Dict[str, Any] = {"url": modelo_url}
+    if transform:
+        info["tf"] = transform
+    if not modelo_url or not modelo_url.startswith("/modelos/"):
+        return info
+    obj = Path(settings.modelos_dir) / modelo_url[len("/modelos/"):]
+    try:
+        mtllib, _, _ = escanear_cabecera_obj(obj)
+    except OSError:
+        return info
+    if mtllib and (obj.parent / mtllib).is_file():
+        info["mtl"] = modelo_url.rsplit("/", 1)[0] + "/" + mtllib
+    else:
+        info["mtl"] = None
+    return info
+
+
+# -----------------------------------------------------------
+# Vigía de la cola de modelado: un solo hilo para todas las conexiones
+# (en vez de un polling HTTP por estudiante)
+# -----------------------------------------------------------
+class VigiaModelos:
+    def __init__(self, intervalo_s: float, timeout_s: float):
+        self.intervalo_s = intervalo_s
+        self.timeout_s = timeout_s
+        self._lock = threading.Lock()
+        self._seguidos: Dict[str, List[Tuple[Canal, Optional[int], float]]] = {}
+        self._hilo: Optional[threading.Thread] = None
+
+    def seguir(self, job_id: str, canal: Canal, id: Optional[int]) -> None:
+        with self._lock:
+            self._seguidos.setdefault(job_id, []).append((canal, id, time.monotonic() + self.timeout_s))
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._loop, name="vigia-modelos", daemon=True)
+                self._hilo.start()
+
+    def _loop(self) -> None:
+        while True:
+            time.sleep(self.intervalo_s)
+            with self._lock:
+                ids = list(self._seguidos)
+            for job_id in ids:
+                try:
+                    self._revisar(job_id)
+                except Exception as e:
+                    print(f"⚠ Vigía de modelos: {job_id}: {e}")
+
+    def _revisar(self, job_id: str) -> None:
+        job = obtener_cola().obtener(job_id)
+        ahora = time.monotonic()
+        with self._lock:
+            destinos = [x for x in self._seguidos.get(job_id, []) if x[0].abierto and x[2] > ahora]
+            terminado = job is None or job["estado"] in (LISTO, ERROR)
+            if terminado or not destinos:
+                self._seguidos.pop(job_id, None)
+            else:
+                self._seguidos[job_id] = destinos
+        if not terminado:
+            return
+        if job is not None and job["estado"] == LISTO:
+            modelo_url = (job["resultado"] or {}).get("modelo_url")
+            registrar_referencia(modelo_url)
+            datos = info_modelo(modelo_url)
+        else:
+            datos = {"error": (job or {}).get("error") or "Trabajo inexistente"}
+        for canal, id, _ in destinos:
+            canal.enviar("modelo", id, datos)
+
+
+vigia_modelos = VigiaModelos(settings.ws_vigia_s, settings.modelado_timeout_s)
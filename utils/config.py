@@ -1,6 +1,6 @@
 # utils/config.py
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 
 # Carga .env o api.env si existen (sin romper si falta dotenv)
@@ -24,12 +24,92 @@ class Settings:
     base_url:    str = os.getenv("BASE_URL", "https://api.groq.com/openai/v1")
     llm_model:   str = os.getenv("LLM_MODEL", "llama-3.1-8b-instant")
 
+    # Sesiones de conversación (ver api_client/sesiones.py)
+    sesiones_ttl_s:          float = float(os.getenv("SESIONES_TTL_S", "3600"))
+    sesiones_max:            int   = int(os.getenv("SESIONES_MAX", "1000"))
+    sesiones_db:             str   = os.getenv("SESIONES_DB", "")   # vacío = solo memoria
+    sesiones_db_dias:        float = float(os.getenv("SESIONES_DB_DIAS", "7"))
+    llm_presupuesto_historial: int = int(os.getenv("LLM_PRESUPUESTO_HISTORIAL", "1500"))
+    llm_presupuesto_resumen:   int = int(os.getenv("LLM_PRESUPUESTO_RESUMEN", "300"))
+
+    # Recuperación sobre el temario (ver api_client/recuperacion.py)
+    rag_habilitado: bool = os.getenv("RAG_HABILITADO", "1") not in ("0", "false", "False", "")
+    rag_top_k:      int  = int(os.getenv("RAG_TOP_K", "3"))
+
+    # Admisión / backpressure (ver utils/admision.py)
+    rate_tasa:               float = float(os.getenv("RATE_TASA", "1.0"))      # fichas por segundo y cliente
+    rate_rafaga:             float = float(os.getenv("RATE_RAFAGA", "10"))
+    confiar_proxy:           bool  = os.getenv("CONFIAR_PROXY", "0") in ("1", "true", "True")
+    vision_max_concurrentes: int   = int(os.getenv("VISION_MAX_CONCURRENTES", "2"))
+    vision_max_cola:         int   = int(os.getenv("VISION_MAX_COLA", "4"))
+    llm_max_concurrentes:    int   = int(os.getenv("LLM_MAX_CONCURRENTES", "8"))
+    llm_max_cola:            int   = int(os.getenv("LLM_MAX_COLA", "16"))
+    tts_max_concurrentes:    int   = int(os.getenv("TTS_MAX_CONCURRENTES", "1"))
+    cola_espera_max_s:       float = float(os.getenv("COLA_ESPERA_MAX_S", "10"))
+
+    # Inferencia por teselas (ver api_client/teselado.py)
+    yolo_teselas:       bool  = os.getenv("YOLO_TESELAS", "0") in ("1", "true", "True")
+    yolo_tesela_tam:    int   = int(os.getenv("YOLO_TESELA_TAM", "640"))
+    yolo_tesela_solape: float = float(os.getenv("YOLO_TESELA_SOLAPE", "0.2"))
+    yolo_nms_umbral:    float = float(os.getenv("YOLO_NMS_UMBRAL", "0.6"))
+    yolo_max_teselas:   int   = int(os.getenv("YOLO_MAX_TESELAS", "12"))   # por imagen (+1 completa); 0 = sin tope
+
+    # Calidad adaptativa de YOLO (ver api_client/adaptativo.py)
+    yolo_adaptativo:      bool  = os.getenv("YOLO_ADAPTATIVO", "0") in ("1", "true", "True")
+    yolo_slo_p95_s:       float = float(os.getenv("YOLO_SLO_P95_S", "1.5"))
+    yolo_niveles:         list  = field(default_factory=lambda: [
+        int(x) for x in os.getenv("YOLO_NIVELES", "640,480,320").split(",") if x.strip()
+    ])
+    yolo_weights_liviano: str   = os.getenv("YOLO_WEIGHTS_LIVIANO", "")   # ej: yolov5nu.pt
+
+    # Canal WebSocket /ws (ver utils/canal.py; requiere flask-sock)
+    ws_habilitado:   bool  = os.getenv("WS_HABILITADO", "1") not in ("0", "false", "False", "")
+    ws_max_mb:       int   = int(os.getenv("WS_MAX_MB", "10"))        # tamaño máximo de una imagen por el canal
+    ws_ping_s:       float = float(os.getenv("WS_PING_S", "25"))
+    ws_vigia_s:      float = float(os.getenv("WS_VIGIA_S", "0.5"))    # cada cuánto se revisan los modelos en cola
+    ws_max_en_vuelo: int   = int(os.getenv("WS_MAX_EN_VUELO", "4"))   # pedidos atendidos a la vez por conexión
+
+    # Perfilado por muestreo (ver utils/perfilado.py)
+    admin_token:                str   = os.getenv("ADMIN_TOKEN", "")   # vacío = endpoints de admin deshabilitados (403)
+    perfil_intervalo_s:         float = float(os.getenv("PERFIL_INTERVALO_S", "0.1"))   # continuo; 0 = apagado
+    perfil_max_pilas:           int   = int(os.getenv("PERFIL_MAX_PILAS", "5000"))
+    perfil_request_intervalo_s: float = float(os.getenv("PERFIL_REQUEST_INTERVALO_S", "0.005"))
+    perfil_request_max_s:       float = float(os.getenv("PERFIL_REQUEST_MAX_S", "120"))
+    perfil_max_capturas:        int   = int(os.getenv("PERFIL_MAX_CAPTURAS", "2"))
+    perfil_guardados:           int   = int(os.getenv("PERFIL_GUARDADOS", "50"))
+
     # Rutas útiles
     root: Path = Path(__file__).resolve().parents[1]
     uploads_dir: Path = root / "data" / "uploads"
     modelos_dir: Path = root / "data" / "modelos3d"
     pedidos_dir: Path = root / "data" / "pedidos_modelado"
     yolo_weights: Path = root / "yolov5su.pt"
+    curriculo_dir: Path = root / "assets" / "curriculo"            # temario (.md): fuente única
+    indice_curriculo_dir: Path = root / "data" / "indice_curriculo"
+    historial_db: Path = root / "data" / "historial.sqlite3"
+    alias_path: Path = Path(os.getenv("ALIAS_PATH", str(root / "config" / "alias.yaml")))
+
+    # Almacén / caché compartidos entre nodos (ver utils/almacen.py)
+    almacen_url:      str   = os.getenv("ALMACEN_URL", "")             # vacío = SQLite local; redis://host:6379/0
+    almacen_prefijo:  str   = os.getenv("ALMACEN_PREFIJO", "syntaxia:")
+    cache_db:         Path  = root / "data" / "cache.sqlite3"
+    cache_llm_ttl_s:  float = float(os.getenv("CACHE_LLM_TTL_S", "86400"))   # 0 = sin caché
+    cache_det_ttl_s:  float = float(os.getenv("CACHE_DET_TTL_S", "86400"))
+    calentar_n:       int   = int(os.getenv("CALENTAR_N", "50"))             # claves/carpetas a precargar al arrancar
+    nodo_id:          str   = os.getenv("NODO_ID", "")                       # vacío = hostname
+
+    # Retención de archivos generados (ver utils/limpieza.py)
+    modelos_max_mb:       int   = int(os.getenv("MODELOS_MAX_MB", "512"))
+    uploads_max_mb:       int   = int(os.getenv("UPLOADS_MAX_MB", "256"))
+    retencion_horas:      float = float(os.getenv("RETENCION_HORAS", "24"))
+    limpieza_intervalo_s: float = float(os.getenv("LIMPIEZA_INTERVALO_S", "300"))
+    referencia_viva_s:    float = float(os.getenv("REFERENCIA_VIVA_S", "900"))
+
+    # Cola de modelado 3D (ver modelado_3d/cola.py)
+    modelado_db:        Path  = root / "data" / "modelado.sqlite3"
+    modelado_workers:   int   = int(os.getenv("MODELADO_WORKERS", "1"))
+    modelado_espera_s:  float = float(os.getenv("MODELADO_ESPERA_S", "0.5"))
+    modelado_timeout_s: float = float(os.getenv("MODELADO_TIMEOUT_S", "600"))
 
     def ensure_dirs(self):
         self.uploads_dir.mkdir(parents=True, exist_ok=True)
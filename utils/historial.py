@@ -0,0 +1,165 @@
+# utils/historial.py
+"""
+Historial de detecciones (append-only, SQLite).
+
+- registrar() nunca bloquea la request: mete las filas en una cola acotada y un hilo
+  escritor las inserta por lotes (executemany en una sola transacción).
+  Si la cola se llena, se descartan filas y se cuentan en 'historial.descartadas'.
+- Además de la tabla de detecciones se mantiene un resumen diario (dia, clase) -> cantidad,
+  actualizado en el mismo lote. Las consultas tipo "qué dispositivos se fotografiaron más
+  esta semana" leen el resumen y no recorren millones de filas.
+"""
+from __future__ import annotations
+
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.config import settings
+from utils.metricas import metricas
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS detecciones (
+    ts        REAL NOT NULL,
+    dia       INTEGER NOT NULL,          -- días desde epoch (UTC)
+    sesion    TEXT,
+    clase     TEXT NOT NULL,
+    confianza REAL NOT NULL,
+    imagen    TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_det_ts ON detecciones(ts);
+CREATE INDEX IF NOT EXISTS ix_det_clase_ts ON detecciones(clase, ts);
+CREATE INDEX IF NOT EXISTS ix_det_sesion_ts ON detecciones(sesion, ts);
+
+CREATE TABLE IF NOT EXISTS detecciones_diarias (
+    dia      INTEGER NOT NULL,
+    clase    TEXT NOT NULL,
+    cantidad INTEGER NOT NULL,
+    PRIMARY KEY (dia, clase)
+) WITHOUT ROWID;
+"""
+
+Fila = Tuple[float, int, Optional[str], str, float, Optional[str]]
+
+
+class HistorialDetecciones:
+    def __init__(self, db_path: Path, lote: int = 500, intervalo_s: float = 1.0, max_cola: int = 50000):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.lote = lote
+        self.intervalo_s = intervalo_s
+        self._cola: "queue.Queue[Fila]" = queue.Queue(maxsize=max_cola)
+        self._local = threading.local()
+        self._conn().executescript(_SCHEMA)
+        self._hilo = threading.Thread(target=self._escritor, name="historial", daemon=True)
+        self._hilo.start()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ---------- escritura ----------
+    def registrar(self, objetos: List[Dict[str, Any]], sesion: Optional[str] = None,
+                  imagen: Optional[str] = None) -> None:
+        """Encola las detecciones de una imagen. No bloquea."""
+        ts = time.time()
+        dia = int(ts // 86400)
+        for o in objetos:
+            try:
+                self._cola.put_nowait((ts, dia, sesion, o["clase"], float(o.get("confianza", 0.0)), imagen))
+            except queue.Full:
+                metricas.incrementar("historial.descartadas")
+
+    def _escritor(self) -> None:
+        while True:
+            filas = [self._cola.get()]
+            # juntamos lo que llegue durante intervalo_s (o hasta completar el lote)
+            limite = time.monotonic() + self.intervalo_s
+            while len(filas) < self.lote:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    filas.append(self._cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+            try:
+                self._insertar(filas)
+                metricas.incrementar("historial.escritas", len(filas))
+            except sqlite3.Error as e:
+                print(f"⚠ Historial: no se pudo escribir un lote de {len(filas)}: {e}")
+                metricas.incrementar("historial.descartadas", len(filas))
+
+    def _insertar(self, filas: List[Fila]) -> None:
+        resumen: Dict[Tuple[int, str], int] = {}
+        for f in filas:
+            resumen[(f[1], f[3])] = resumen.get((f[1], f[3]), 0) + 1
+        c = self._conn()
+        c.execute("BEGIN")
+        try:
+            c.executemany(
+                "INSERT INTO detecciones (ts, dia, sesion, clase, confianza, imagen) VALUES (?,?,?,?,?,?)", filas
+            )
+            c.executemany(
+                "INSERT INTO detecciones_diarias (dia, clase, cantidad) VALUES (?,?,?) "
+                "ON CONFLICT(dia, clase) DO UPDATE SET cantidad = cantidad + excluded.cantidad",
+                [(dia, clase, n) for (dia, clase), n in resumen.items()],
+            )
+            c.execute("COMMIT")
+        except Exception:
+            c.execute("ROLLBACK")
+            raise
+
+    # ---------- consultas ----------
+    def top_clases(self, dias: int = 7, limite: int = 10) -> List[Dict[str, Any]]:
+        """Clases más detectadas en los últimos `dias` días (usa el resumen diario)."""
+        desde = int(time.time() // 86400) - max(0, dias - 1)
+        rows = self._conn().execute(
+            "SELECT clase, SUM(cantidad) AS cantidad FROM detecciones_diarias "
+            "WHERE dia >= ? GROUP BY clase ORDER BY cantidad DESC LIMIT ?",
+            (desde, limite),
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+    def serie_diaria(self, clase: Optional[str] = None, dias: int = 30) -> List[Dict[str, Any]]:
+        """Cantidad por día (de una clase o de todas)."""
+        desde = int(time.time() // 86400) - max(0, dias - 1)
+        if clase:
+            sql = ("SELECT dia, SUM(cantidad) AS cantidad FROM detecciones_diarias "
+                   "WHERE clase = ? AND dia >= ? GROUP BY dia ORDER BY dia")
+            params: Tuple[Any, ...] = (clase, desde)
+        else:
+            sql = ("SELECT dia, SUM(cantidad) AS cantidad FROM detecciones_diarias "
+                   "WHERE dia >= ? GROUP BY dia ORDER BY dia")
+            params = (desde,)
+        rows = self._conn().execute(sql, params).fetchall()
+        return [{"fecha": time.strftime("%Y-%m-%d", time.gmtime(r["dia"] * 86400)), "cantidad": r["cantidad"]}
+                for r in rows]
+
+    def por_sesion(self, sesion: str, limite: int = 100) -> List[Dict[str, Any]]:
+        """Últimas detecciones de una sesión (usa el índice (sesion, ts))."""
+        rows = self._conn().execute(
+            "SELECT ts, clase, confianza, imagen FROM detecciones WHERE sesion = ? ORDER BY ts DESC LIMIT ?",
+            (sesion, limite),
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+
+_historial: Optional[HistorialDetecciones] = None
+_historial_lock = threading.Lock()
+
+def obtener_historial() -> HistorialDetecciones:
+    global _historial
+    with _historial_lock:
+        if _historial is None:
+            _historial = HistorialDetecciones(settings.historial_db)
+        return _historial
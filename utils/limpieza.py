@@ -0,0 +1,229 @@
+# utils/limpieza.py
+"""
+Conserje de archivos generados (data/modelos3d, data/uploads).
+
+- Cada copia de modelo vive en su propia carpeta con un id único por construcción
+  (timestamp + pid + contador), así no hay que "probar" nombres con exists().
+- Un hilo en segundo plano borra carpetas/archivos viejos (cuota de edad) y,
+  si el directorio supera su cuota de tamaño, los más antiguos primero.
+- Las URLs devueltas hace poco a un cliente quedan protegidas (referencias vivas), y también lo
+  que otro módulo declare en uso (ej. las imágenes de trabajos de modelado todavía sin terminar).
+"""
+from __future__ import annotations
+
+import itertools
+import hashlib
+import os
+import shutil
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from utils.config import settings
+from utils.almacen import publicar_carpeta
+
+
+# -----------------------------------------------------------
+# Nombres únicos por construcción
+# -----------------------------------------------------------
+_contador = itertools.count()
+_contador_lock = threading.Lock()
+# con varios nodos compartiendo almacén, el pid solo no alcanza: se suma un id corto del host
+_NODO = hashlib.sha1((settings.nodo_id or socket.gethostname()).encode("utf-8")).hexdigest()[:6]
+
+def nuevo_id() -> str:
+    """Id único entre nodos: milisegundos + nodo + pid + contador del proceso."""
+    with _contador_lock:
+        n = next(_contador)
+    return f"{int(time.time() * 1000):x}-{_NODO}-{os.getpid():x}-{n:x}"
+
+def nueva_carpeta(base_dir: Path) -> Path:
+    """Crea y devuelve base_dir/<id>. Nunca reutiliza una carpeta existente."""
+    base_dir.mkdir(parents=True, exist_ok=True)
+    carpeta = base_dir / nuevo_id()
+    carpeta.mkdir()
+    return carpeta
+
+
+# -----------------------------------------------------------
+# Referencias vivas (URLs entregadas a clientes)
+# -----------------------------------------------------------
+_refs: Dict[str, float] = {}
+_refs_lock = threading.Lock()
+
+def _clave_ref(nombre: str) -> str:
+    # "/modelos/<id>/Laptop.obj" -> "<id>" ; "entrada_x.jpg" -> "entrada_x.jpg"
+    rel = nombre.split("/modelos/", 1)[-1].lstrip("/")
+    return rel.split("/", 1)[0]
+
+def registrar_referencia(nombre: Optional[str]) -> None:
+    """Marca una URL/archivo como recién usado para que el conserje no lo borre."""
+    if not nombre:
+        return
+    with _refs_lock:
+        _refs[_clave_ref(nombre)] = time.time()
+
+def url_modelo(path: Path) -> str:
+    """
+    URL pública (/modelos/...) de un archivo dentro de modelos_dir; queda registrada como referencia viva.
+    Con almacén compartido la carpeta se publica para que cualquier nodo pueda servirla.
+    """
+    url = "/modelos/" + path.resolve().relative_to(settings.modelos_dir.resolve()).as_posix()
+    registrar_referencia(url)
+    publicar_carpeta(settings.modelos_dir / _clave_ref(url))
+    return url
+
+def _referencia_viva(clave: str, ahora: float) -> bool:
+    with _refs_lock:
+        ts = _refs.get(clave)
+    return ts is not None and ahora - ts < settings.referencia_viva_s
+
+def _purgar_refs(ahora: float) -> None:
+    with _refs_lock:
+        for k in [k for k, ts in _refs.items() if ahora - ts >= settings.referencia_viva_s]:
+            del _refs[k]
+
+
+# Nombres en uso según otros módulos; se consultan una vez por pasada
+_protecciones: List[Callable[[], Set[str]]] = []
+
+def registrar_proteccion(fn: Callable[[], Set[str]]) -> None:
+    """`fn()` devuelve nombres de entradas (archivo o carpeta de primer nivel) que no se deben borrar."""
+    _protecciones.append(fn)
+
+def _protegidas() -> Set[str]:
+    nombres: Set[str] = set()
+    for fn in _protecciones:
+        try:
+            nombres |= fn()
+        except Exception as e:
+            print(f"⚠ Conserje: no pude consultar entradas en uso: {e}")
+    return nombres
+
+
+# -----------------------------------------------------------
+# Conserje
+# -----------------------------------------------------------
+@dataclass
+class Cuota:
+    directorio: Path
+    max_bytes: int
+    max_edad_s: float
+
+def _medir(entry: Path) -> Tuple[int, float]:
+    """(bytes, mtime) de un archivo o carpeta. En carpetas vale el mtime de la carpeta:
+    copy2 conserva el mtime del asset original, que puede ser muy viejo."""
+    try:
+        st = entry.stat()
+    except OSError:
+        return 0, 0.0
+    if not entry.is_dir():
+        return st.st_size, st.st_mtime
+    total = 0
+    for root, _dirs, files in os.walk(entry):
+        for f in files:
+            try:
+                total += os.stat(os.path.join(root, f)).st_size
+            except OSError:
+                continue
+    return total, st.st_mtime
+
+def _borrar(entry: Path) -> bool:
+    try:
+        if entry.is_dir():
+            shutil.rmtree(entry)
+        else:
+            entry.unlink()
+        return True
+    except FileNotFoundError:
+        return True
+    except Exception as e:
+        print(f"⚠ Conserje: no pude borrar {entry}: {e}")
+        return False
+
+def limpiar_directorio(cuota: Cuota, ahora: Optional[float] = None, protegidas: Optional[Set[str]] = None) -> int:
+    """Una pasada sobre un directorio. Devuelve cuántas entradas borró."""
+    ahora = ahora or time.time()
+    protegidas = protegidas or set()
+    if not cuota.directorio.exists():
+        return 0
+
+    entradas: List[Tuple[float, int, Path]] = []
+    for entry in cuota.directorio.iterdir():
+        if entry.name.startswith("."):
+            continue
+        size, mtime = _medir(entry)
+        entradas.append((mtime, size, entry))
+
+    borradas = 0
+    total = sum(size for _, size, _ in entradas)
+    # de la más vieja a la más nueva
+    entradas.sort(key=lambda t: t[0])
+    for mtime, size, entry in entradas:
+        vencida = ahora - mtime > cuota.max_edad_s
+        excedida = total > cuota.max_bytes
+        if not (vencida or excedida):
+            # ordenadas por edad: si esta no vence y no hay exceso, ninguna siguiente vence
+            break
+        if entry.name in protegidas or _referencia_viva(entry.name, ahora):
+            continue
+        if _borrar(entry):
+            borradas += 1
+            total -= size
+    return borradas
+
+class Conserje:
+    def __init__(self, cuotas: List[Cuota], intervalo_s: float):
+        self.cuotas = cuotas
+        self.intervalo_s = intervalo_s
+        self._hilo: Optional[threading.Thread] = None
+        self._parar = threading.Event()
+
+    def pasada(self) -> int:
+        ahora = time.time()
+        _purgar_refs(ahora)
+        protegidas = _protegidas()
+        total = 0
+        for c in self.cuotas:
+            try:
+                total += limpiar_directorio(c, ahora, protegidas)
+            except Exception as e:
+                print(f"⚠ Conserje: error limpiando {c.directorio}: {e}")
+        if total:
+            print(f"🧹 Conserje: {total} entradas eliminadas")
+        return total
+
+    def _loop(self):
+        while not self._parar.wait(self.intervalo_s):
+            self.pasada()
+
+    def iniciar(self):
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._parar.clear()
+        self._hilo = threading.Thread(target=self._loop, name="conserje", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._parar.set()
+
+
+_conserje: Optional[Conserje] = None
+
+def iniciar_conserje() -> Conserje:
+    """Arranca (una sola vez) el conserje con las cuotas de settings."""
+    global _conserje
+    if _conserje is None:
+        edad = settings.retencion_horas * 3600
+        _conserje = Conserje(
+            [
+                Cuota(settings.modelos_dir, settings.modelos_max_mb * 1024 * 1024, edad),
+                Cuota(settings.uploads_dir, settings.uploads_max_mb * 1024 * 1024, edad),
+            ],
+            settings.limpieza_intervalo_s,
+        )
+    _conserje.iniciar()
+    return _conserje
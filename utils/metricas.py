@@ -0,0 +1,61 @@
+# utils/metricas.py
+"""
+Métricas en memoria del proceso: contadores y ventanas de latencia con percentiles.
+Se exponen en /api/metricas.
+"""
+from __future__ import annotations
+
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+
+def percentil(valores, p: float) -> Optional[float]:
+    if not valores:
+        return None
+    orden = sorted(valores)
+    return orden[min(len(orden) - 1, int(p / 100 * len(orden)))]
+
+
+class Metricas:
+    def __init__(self, ventana: int = 500):
+        self.ventana = ventana
+        self._lock = threading.Lock()
+        self._contadores: Dict[str, int] = {}
+        self._latencias: Dict[str, Deque[float]] = {}
+
+    def incrementar(self, nombre: str, n: int = 1) -> None:
+        with self._lock:
+            self._contadores[nombre] = self._contadores.get(nombre, 0) + n
+
+    def observar(self, nombre: str, segundos: float) -> None:
+        with self._lock:
+            d = self._latencias.get(nombre)
+            if d is None:
+                d = self._latencias[nombre] = deque(maxlen=self.ventana)
+            d.append(segundos)
+
+    def p(self, nombre: str, pct: float) -> Optional[float]:
+        with self._lock:
+            valores = list(self._latencias.get(nombre, ()))
+        return percentil(valores, pct)
+
+    def resumen(self) -> Dict[str, Any]:
+        with self._lock:
+            contadores = dict(self._contadores)
+            latencias = {k: list(v) for k, v in self._latencias.items()}
+        return {
+            "contadores": contadores,
+            "latencias_ms": {
+                k: {
+                    "n": len(v),
+                    "p50": round(percentil(v, 50) * 1000, 1),
+                    "p95": round(percentil(v, 95) * 1000, 1),
+                    "p99": round(percentil(v, 99) * 1000, 1),
+                }
+                for k, v in latencias.items() if v
+            },
+        }
+
+
+metricas = Metricas()
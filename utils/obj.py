@@ -0,0 +1,42 @@
+# utils/obj.py
+"""
+Lectura liviana de la cabecera de un OBJ (lo que va antes de la geometría).
+
+La usan la copia de assets de biblioteca (api_client/yolo_client.py) y el aviso de "modelo listo"
+del canal en vivo (utils/canal.py); vive acá para que el canal no cargue YOLO al importarla.
+"""
+from __future__ import annotations
+
+import re
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+# patrón de mtllib en obj
+OBJ_MTL_LIB = re.compile(r'^\s*mtllib\s+(.+?)\s*$', re.IGNORECASE | re.MULTILINE)
+
+# Líneas que marcan el fin de la cabecera de un OBJ (empieza la geometría)
+OBJ_GEOMETRIA = (b"v ", b"v\t", b"vt", b"vn", b"vp", b"f ", b"f\t", b"l ", b"p ")
+
+def dec(linea: bytes) -> str:
+    # surrogateescape: cualquier byte vuelve a escribirse idéntico
+    return linea.decode("utf-8", errors="surrogateescape")
+
+def escanear_cabecera_obj(src_obj: Path) -> Tuple[Optional[str], List[bytes], int]:
+    """
+    Lee solo la cabecera del OBJ (hasta la primera línea de geometría).
+    Devuelve (mtllib_rel, líneas_de_cabecera, offset donde empieza la geometría).
+    """
+    cabecera: List[bytes] = []
+    mtllib: Optional[str] = None
+    offset = 0
+    with open(src_obj, "rb") as f:
+        for linea in f:
+            if linea.lstrip().startswith(OBJ_GEOMETRIA):
+                break
+            cabecera.append(linea)
+            offset += len(linea)
+            if mtllib is None:
+                m = OBJ_MTL_LIB.match(dec(linea))
+                if m:
+                    mtllib = m.group(1).strip()
+    return mtllib, cabecera, offset
@@ -0,0 +1,207 @@
+# utils/perfilado.py
+"""
+Perfilado por muestreo (sin dependencias): se leen las pilas de los hilos con sys._current_frames()
+y se acumulan en formato "colapsado" (una línea por pila: marco;marco;marco cantidad), el que
+entienden flamegraph.pl, speedscope e inferno.
+
+- Perfilador: siempre encendido y de baja frecuencia (PERFIL_INTERVALO_S). Solo muestrea los hilos
+  que están atendiendo una request y agrupa por endpoint.
+- CapturaRequest: muestreo fino (PERFIL_REQUEST_INTERVALO_S) de UN hilo durante una request
+  marcada con X-Perfil: 1 o ?perfil=1. El resultado se guarda y se baja por el endpoint de admin.
+
+El muestreo solo ve marcos de Python: el tiempo dentro de torch/OpenCV aparece en la línea de
+Python que los llamó (ej. predecir_simple -> predict), que es lo que hace falta para repartir culpas.
+"""
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from utils.config import settings
+from utils.limpieza import nuevo_id
+
+_ROOT = str(settings.root)
+
+
+@lru_cache(maxsize=8192)
+def _etiqueta(archivo: str, funcion: str, linea: int) -> str:
+    if archivo.startswith(_ROOT):
+        corto = archivo[len(_ROOT):].lstrip("/\\")
+    else:
+        # site-packages/torch/nn/modules/module.py -> torch/nn/modules/module.py (últimos 3 tramos)
+        corto = "/".join(archivo.replace("\\", "/").split("/")[-3:])
+    return f"{funcion} ({corto}:{linea})".replace(";", ",")
+
+
+def colapsar(frame: Any, max_prof: int = 128) -> str:
+    """Pila de un frame en formato colapsado, de la raíz a la hoja (un marco por línea en ejecución)."""
+    marcos: List[str] = []
+    while frame is not None and len(marcos) < max_prof:
+        co = frame.f_code
+        # f_lineno: la línea que se está ejecutando (no la del def), así el tiempo nativo queda
+        # en la llamada concreta que lo provocó
+        marcos.append(_etiqueta(co.co_filename, co.co_name, frame.f_lineno))
+        frame = frame.f_back
+    marcos.reverse()
+    return ";".join(marcos)
+
+
+def a_texto(pilas: Counter) -> str:
+    return "".join(f"{pila} {n}\n" for pila, n in pilas.most_common())
+
+
+# -----------------------------------------------------------
+# Muestreo continuo por endpoint
+# -----------------------------------------------------------
+class Perfilador:
+    def __init__(self, intervalo_s: float, max_pilas: int):
+        self.intervalo_s = intervalo_s
+        self.max_pilas = max_pilas   # pilas distintas por endpoint (el resto va a "[otras]")
+        self._activos: Dict[int, str] = {}
+        self._pilas: Dict[str, Counter] = {}
+        self._muestras: Dict[str, int] = {}
+        self._desde = time.time()
+        self._lock = threading.Lock()
+        self._hilo: Optional[threading.Thread] = None
+
+    def marcar(self, endpoint: str) -> None:
+        """El hilo actual empieza a atender `endpoint`."""
+        self._activos[threading.get_ident()] = endpoint
+
+    def desmarcar(self) -> None:
+        self._activos.pop(threading.get_ident(), None)
+
+    def iniciar(self) -> None:
+        if self._hilo is None and self.intervalo_s > 0:
+            self._hilo = threading.Thread(target=self._loop, name="perfilador", daemon=True)
+            self._hilo.start()
+
+    def _loop(self) -> None:
+        while True:
+            time.sleep(self.intervalo_s)
+            activos = list(self._activos.items())
+            if not activos:
+                continue
+            frames = sys._current_frames()
+            with self._lock:
+                for tid, endpoint in activos:
+                    frame = frames.get(tid)
+                    if frame is None:
+                        continue
+                    pilas = self._pilas.setdefault(endpoint, Counter())
+                    pila = colapsar(frame)
+                    if pila not in pilas and len(pilas) >= self.max_pilas:
+                        pila = "[otras]"
+                    pilas[pila] += 1
+                    self._muestras[endpoint] = self._muestras.get(endpoint, 0) + 1
+            del frames
+
+    def colapsadas(self, endpoint: Optional[str] = None) -> str:
+        """Pilas colapsadas de un endpoint, o de todos (con el endpoint como marco raíz)."""
+        with self._lock:
+            if endpoint is not None:
+                return a_texto(Counter(self._pilas.get(endpoint, {})))
+            todas: Counter = Counter()
+            for ep, pilas in self._pilas.items():
+                for pila, n in pilas.items():
+                    todas[f"{ep};{pila}"] += n
+        return a_texto(todas)
+
+    def resumen(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "desde": self._desde,
+                "intervalo_s": self.intervalo_s,
+                "endpoints": {ep: {"muestras": self._muestras.get(ep, 0), "pilas": len(p)}
+                              for ep, p in self._pilas.items()},
+            }
+
+    def reiniciar(self) -> None:
+        with self._lock:
+            self._pilas.clear()
+            self._muestras.clear()
+            self._desde = time.time()
+
+
+# -----------------------------------------------------------
+# Captura de una sola request
+# -----------------------------------------------------------
+class CapturaRequest:
+    def __init__(self, endpoint: str, intervalo_s: float, max_s: float):
+        self.id = nuevo_id()
+        self.endpoint = endpoint
+        self.intervalo_s = intervalo_s
+        self.max_s = max_s
+        self.tid = threading.get_ident()
+        self.pilas: Counter = Counter()
+        self._parar = threading.Event()
+        self._inicio = time.perf_counter()
+        self._hilo = threading.Thread(target=self._loop, name=f"perfil-{self.id}", daemon=True)
+        self._hilo.start()
+
+    def _loop(self) -> None:
+        limite = time.monotonic() + self.max_s
+        while not self._parar.wait(self.intervalo_s) and time.monotonic() < limite:
+            frame = sys._current_frames().get(self.tid)
+            if frame is not None:
+                self.pilas[colapsar(frame)] += 1
+            del frame
+
+    def detener(self) -> Dict[str, Any]:
+        self._parar.set()
+        self._hilo.join()
+        return {
+            "id": self.id,
+            "endpoint": self.endpoint,
+            "ts": time.time(),
+            "duracion_s": round(time.perf_counter() - self._inicio, 4),
+            "intervalo_s": self.intervalo_s,
+            "muestras": sum(self.pilas.values()),
+            "pilas": a_texto(self.pilas),
+        }
+
+
+class RegistroCapturas:
+    """Últimas N capturas en memoria + cupo de capturas simultáneas (cada una es un hilo más)."""
+
+    def __init__(self, max_guardadas: int, max_simultaneas: int):
+        self.max_guardadas = max_guardadas
+        self._cupo = threading.BoundedSemaphore(max(1, max_simultaneas))
+        self._guardadas: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def iniciar(self, endpoint: str) -> Optional[CapturaRequest]:
+        if not self._cupo.acquire(blocking=False):
+            return None
+        try:
+            return CapturaRequest(endpoint, settings.perfil_request_intervalo_s, settings.perfil_request_max_s)
+        except Exception:
+            self._cupo.release()
+            raise
+
+    def terminar(self, captura: CapturaRequest) -> Dict[str, Any]:
+        try:
+            datos = captura.detener()
+        finally:
+            self._cupo.release()
+        with self._lock:
+            self._guardadas[datos["id"]] = datos
+            while len(self._guardadas) > self.max_guardadas:
+                self._guardadas.popitem(last=False)
+        return datos
+
+    def obtener(self, captura_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._guardadas.get(captura_id)
+
+    def listar(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{k: v for k, v in d.items() if k != "pilas"} for d in reversed(self._guardadas.values())]
+
+
+perfilador = Perfilador(settings.perfil_intervalo_s, settings.perfil_max_pilas)
+capturas = RegistroCapturas(settings.perfil_guardados, settings.perfil_max_capturas)
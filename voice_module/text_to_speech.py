@@ -1,17 +1,38 @@
 # utils/text_to_speech.py
 import pyttsx3
 import threading
+from typing import Callable, Optional
+
+from utils.config import settings
+
+# Cupo global de hilos TTS: si está lleno, se descarta la lectura (no se encola)
+_cupo_tts = threading.BoundedSemaphore(max(1, settings.tts_max_concurrentes))
+
+def hablar(texto: str, al_terminar: Optional[Callable[[bool], None]] = None):
+    """
+    Lee un texto con pyttsx3 en un thread separado para no bloquear.
+    al_terminar(leido) se llama al final (False si se omitió o falló): lo usa el canal WebSocket.
+    """
+    if not _cupo_tts.acquire(blocking=False):
+        print("🔇 TTS ocupado, se omite la lectura")
+        if al_terminar:
+            al_terminar(False)
+        return
 
-def hablar(texto: str):
-    """Lee un texto con pyttsx3 en un thread separado para no bloquear."""
     def _leer():
+        leido = False
         try:
             engine = pyttsx3.init()
             engine.say(texto)
             engine.runAndWait()
             engine.stop()
+            leido = True
         except RuntimeError:
             pass  # ignorar si hay un loop en marcha
+        finally:
+            _cupo_tts.release()
+            if al_terminar:
+                al_terminar(leido)
 
     # Lanzamos en un thread para no bloquear el servidor Flask
     hilo = threading.Thread(target=_leer, daemon=True)